@@ -0,0 +1,219 @@
+"""
+ANIMATION EXPORT
+Blitted trajectory and therapy animations streamed frame by frame to GIF, video or PNGs
+"""
+
+import os
+import shutil
+import subprocess
+import time
+
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+from batch_render import FrameRenderer
+from instrumentation import count, timed
+
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.mov', '.mkv', '.webm', '.avi')
+
+
+class GifWriter:
+    """
+    Animated GIF written one frame at a time
+
+    The palette is fitted to the first frame and reused for every later
+    frame, so each frame is quantized, encoded and written immediately
+    and nothing is buffered.
+    """
+
+    def __init__(self, path, fps, loop=0):
+        self.path = path
+        self.duration = int(round(1000 / fps))
+        self.loop = loop
+        self._file = None
+        self._palette = None
+
+    def write(self, rgba):
+        image = Image.fromarray(np.ascontiguousarray(rgba[..., :3]))
+        if self._file is None:
+            self._palette = image.quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+            self._file = open(self.path, 'wb')
+            header, _ = GifImagePlugin.getheader(self._palette, info={'loop': self.loop})
+            self._file.write(b''.join(header))
+        frame = image.quantize(palette=self._palette, dither=Image.Dither.NONE)
+        self._file.write(b''.join(GifImagePlugin.getdata(frame, duration=self.duration)))
+
+    def close(self):
+        if self._file is not None:
+            self._file.write(b';')
+            self._file.close()
+            self._file = None
+
+
+class FFmpegWriter:
+    """Raw RGBA frames piped into an `ffmpeg` process that encodes the video"""
+
+    def __init__(self, path, fps, codec='libx264', ffmpeg='ffmpeg'):
+        self.path = path
+        self.fps = fps
+        self.codec = codec
+        self.executable = shutil.which(ffmpeg)
+        if self.executable is None:
+            raise RuntimeError(f"{ffmpeg!r} was not found; export to .gif or a PNG directory instead")
+        self._process = None
+
+    def write(self, rgba):
+        if self._process is None:
+            height, width = rgba.shape[:2]
+            command = [self.executable, '-y', '-loglevel', 'error',
+                       '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}',
+                       '-r', str(self.fps), '-i', '-',
+                       # yuv420p needs even dimensions
+                       '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                       '-c:v', self.codec, '-pix_fmt', 'yuv420p', self.path]
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        self._process.stdin.write(np.ascontiguousarray(rgba).tobytes())
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdin.close()
+            if self._process.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed writing {self.path}")
+            self._process = None
+
+
+class PngSequenceWriter:
+    """Numbered PNG files in a directory, one per frame"""
+
+    def __init__(self, directory, prefix='frame'):
+        self.directory = directory
+        self.prefix = prefix
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, rgba):
+        path = os.path.join(self.directory, f'{self.prefix}_{self.count:06d}.png')
+        Image.fromarray(np.ascontiguousarray(rgba)).save(path, compress_level=1)
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+def writer_for(path, fps):
+    """Pick a writer from the output path: .gif, a video extension, or a directory for PNGs"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.gif':
+        return GifWriter(path, fps)
+    if extension in VIDEO_EXTENSIONS:
+        return FFmpegWriter(path, fps)
+    if extension:
+        raise ValueError(f"Unsupported animation format {extension!r}")
+    return PngSequenceWriter(path)
+
+
+class TrajectoryAnimation(FrameRenderer):
+    """
+    A thought moving along a geodesic through emotion space
+
+    Concepts, the straight reference path and the full curved path (faint)
+    are part of the cached background; each frame only redraws the trail
+    travelled so far and the moving head. Frame i shows the first i + 1
+    path points, so there are `len(curved)` frames.
+    """
+
+    def __init__(self, concepts, straight, curved, title='', bounds=(-1, 1, -1, 1),
+                 figsize=(6, 5), dpi=100):
+        super().__init__(figsize, dpi)
+        self.curved = np.asarray(curved, dtype=float)
+        ax = self.figure.add_subplot(1, 1, 1)
+        names = list(concepts)
+        points = np.array([concepts[name] for name in names], dtype=float).reshape(-1, 2)
+        ax.scatter(points[:, 0], points[:, 1], s=60, alpha=0.7)
+        for name, (x, y) in zip(names, points):
+            ax.text(x + 0.05, y + 0.05, name, fontsize=9)
+        ax.plot(*np.asarray(straight).T, 'r--', alpha=0.7, label='Straight path (Euclidean)')
+        ax.plot(*self.curved.T, 'b-', alpha=0.15)
+        self.trail = self.dynamic(ax.plot([], [], 'b-', linewidth=2,
+                                          label='Curved path (Geodesic)')[0])
+        self.head = self.dynamic(ax.plot([], [], 'bo', markersize=8)[0])
+        ax.axis(bounds)
+        ax.set_xlabel('Valence (Negative to Positive)')
+        ax.set_ylabel('Arousal (Low to High)')
+        ax.set_title(title)
+        ax.grid(True, alpha=0.3)
+        ax.legend(loc='lower right')
+
+    @property
+    def n_frames(self):
+        return len(self.curved)
+
+    def update(self, frame):
+        self.trail.set_data(*self.curved[:frame + 1].T)
+        self.head.set_data(self.curved[frame:frame + 1].T)
+
+
+class TherapyAnimation(FrameRenderer):
+    """
+    Depression and anxiety levels evolving session by session for one patient
+
+    The axes and healthy baseline are cached; each frame extends both
+    progress curves to the next time step and updates the session counter.
+    """
+
+    def __init__(self, simulation, start, n_sessions=12, frames_per_session=10,
+                 figsize=(6, 4), dpi=100):
+        super().__init__(figsize, dpi)
+        self.sessions = np.linspace(0, n_sessions, n_sessions * frames_per_session + 1)
+        self.depression, self.anxiety = simulation.therapeutic_improvement(*start, self.sessions)
+        ax = self.figure.add_subplot(1, 1, 1)
+        self.depression_line = self.dynamic(ax.plot([], [], 'b-', linewidth=2,
+                                                    label='Depression curvature')[0])
+        self.anxiety_line = self.dynamic(ax.plot([], [], 'r-', linewidth=2,
+                                                 label='Anxiety torsion')[0])
+        ax.axhline(y=0, color='k', linestyle='--', alpha=0.5, label='Healthy baseline')
+        values = np.concatenate([self.depression, self.anxiety, [0.0]])
+        margin = 0.05 * (values.max() - values.min() or 1.0)
+        ax.set_xlim(0, n_sessions)
+        ax.set_ylim(values.min() - margin, values.max() + margin)
+        ax.set_xlabel('Therapy Sessions')
+        ax.set_ylabel('Pathology Level')
+        ax.set_title('Therapeutic Progress Over Time')
+        ax.legend(loc='upper left')
+        ax.grid(True, alpha=0.3)
+        self.counter = self.dynamic(ax.text(0.98, 0.04, '', transform=ax.transAxes,
+                                            ha='right', fontsize=10))
+
+    @property
+    def n_frames(self):
+        return len(self.sessions)
+
+    def update(self, frame):
+        shown = slice(0, frame + 1)
+        self.depression_line.set_data(self.sessions[shown], self.depression[shown])
+        self.anxiety_line.set_data(self.sessions[shown], self.anxiety[shown])
+        self.counter.set_text(f'Session {self.sessions[frame]:.1f}')
+
+
+@timed('rendering')
+def export_animation(animation, path, fps=30, frames=None):
+    """
+    Render `animation` frame by frame straight into the writer for `path`
+
+    Only one frame is held in memory at a time. `frames` defaults to
+    every frame of the animation. Returns (n_frames, frames_per_second),
+    where the rate counts rendering and encoding together.
+    """
+    frames = range(animation.n_frames) if frames is None else frames
+    writer = writer_for(path, fps)
+    start = time.perf_counter()
+    n_frames = 0
+    try:
+        for frame in frames:
+            writer.write(animation.render(frame))
+            n_frames += 1
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    count('frames', n_frames)
+    return n_frames, n_frames / elapsed if elapsed > 0 else float('inf')
@@ -0,0 +1,268 @@
+"""
+BATCH RENDERING
+Reusable Agg figures for rendering thousands of emotion-space and patient frames
+"""
+
+import argparse
+import functools
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
+
+from instrumentation import count, timed
+from precision import seed_sequence
+
+CONSCIOUS_COLOR = (0.0, 0.5, 0.0, 1.0)
+SUBCONSCIOUS_COLOR = (1.0, 0.0, 0.0, 1.0)
+NEUTRAL_COLOR = (0.12, 0.47, 0.71, 0.7)
+
+
+class FrameRenderer(ABC):
+    """
+    Base for renderers that build their figure once and only update artists
+
+    Figures are drawn on a private Agg canvas (no pyplot, no GUI), so a
+    renderer is cheap to keep alive for a whole batch and safe to use in
+    worker processes. Subclasses create their artists in `__init__`,
+    register the ones that change per frame with `dynamic`, and update
+    them in `update(frame)`. Axes, ticks, labels and images are drawn
+    once into a cached background; each frame restores that background
+    and redraws only the dynamic artists.
+    """
+
+    def __init__(self, figsize, dpi):
+        self.dpi = dpi
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self._dynamic = []
+        self._background = None
+
+    def dynamic(self, artist):
+        """Mark `artist` as changing per frame (excluded from the cached background)"""
+        artist.set_animated(True)
+        self._dynamic.append(artist)
+        return artist
+
+    @abstractmethod
+    def update(self, frame):
+        """Set the dynamic artists' data for `frame`"""
+
+    def invalidate(self):
+        """Drop the cached background, e.g. after changing static artists"""
+        self._background = None
+
+    def render(self, frame):
+        """Draw `frame` and return the RGBA pixels as an (h, w, 4) uint8 array"""
+        if self._background is None:
+            self.canvas.draw()
+            self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.update(frame)
+        self.canvas.restore_region(self._background)
+        for artist in self._dynamic:
+            self.figure.draw_artist(artist)
+        return np.asarray(self.canvas.buffer_rgba())
+
+    def save(self, frame, path):
+        """Draw `frame` and write it as a PNG (fast, lightly compressed)"""
+        imsave(path, self.render(frame), pil_kwargs={'compress_level': 1})
+        return path
+
+
+class EmotionSpaceRenderer(FrameRenderer):
+    """
+    Concepts in 2D emotion space, drawn as a single scatter collection per panel
+
+    A frame is a dict with 'points' of shape (n, 2) and optionally
+    'conscious' (bool mask, colors the points green/red), 'labels' (at
+    most `max_labels` are drawn, from a reused pool of text artists),
+    'path' of shape (m, 2) with its endpoints marked, 'reference' of
+    shape (m, 2) drawn dashed for comparison, and 'title'. With `panels`
+    above one the emotion spaces sit side by side and a frame is a
+    sequence of such dicts, one per panel.
+    """
+
+    def __init__(self, bounds=(-1, 1, -1, 1), figsize=(6, 5), dpi=100, max_labels=64, panels=1):
+        super().__init__(figsize, dpi)
+        theta = np.linspace(0, 2*np.pi, 100)
+        self.panels = []
+        for i in range(panels):
+            ax = self.figure.add_subplot(1, panels, i + 1)
+            ax.axis(bounds)
+            ax.set_xlabel('Valence (Negative to Positive)')
+            ax.set_ylabel('Arousal (Low to High)')
+            ax.grid(True, alpha=0.3)
+            ax.plot(np.cos(theta) * 0.8, np.sin(theta) * 0.8, 'k--', alpha=0.5)
+            self.panels.append({
+                'ax': ax,
+                'scatter': self.dynamic(ax.scatter([], [], s=80)),
+                'reference': self.dynamic(ax.plot([], [], 'r--', alpha=0.7)[0]),
+                'path': self.dynamic(ax.plot([], [], 'b-', linewidth=2, marker='o',
+                                             markevery=[0, -1], markersize=8,
+                                             markerfacecolor='g', markeredgecolor='g')[0]),
+                'labels': [self.dynamic(ax.text(0, 0, '', fontsize=9, visible=False))
+                           for _ in range(max_labels)],
+                'title': self.dynamic(ax.set_title('')),
+            })
+        self.figure.tight_layout()
+        # Leave room for two-line titles, which are drawn per frame
+        self.figure.subplots_adjust(top=0.86)
+
+    def update(self, frame):
+        frames = [frame] if isinstance(frame, dict) else list(frame)
+        if len(frames) != len(self.panels):
+            raise ValueError(f"Expected {len(self.panels)} panel frame(s), got {len(frames)}")
+        for panel, frame in zip(self.panels, frames):
+            self._update_panel(panel, frame)
+
+    @staticmethod
+    def _update_panel(panel, frame):
+        points = np.asarray(frame['points'], dtype=float).reshape(-1, 2)
+        panel['scatter'].set_offsets(points)
+        conscious = frame.get('conscious')
+        if conscious is None:
+            panel['scatter'].set_facecolors([NEUTRAL_COLOR])
+        else:
+            panel['scatter'].set_facecolors(np.where(np.asarray(conscious)[:, None],
+                                                     CONSCIOUS_COLOR, SUBCONSCIOUS_COLOR))
+
+        for key in ('path', 'reference'):
+            path = frame.get(key)
+            panel[key].set_data(*(np.asarray(path).T if path is not None else ([], [])))
+
+        labels = panel['labels']
+        names = list(frame.get('labels') or ())[:len(labels)]
+        for text, name, (x, y) in zip(labels, names, points):
+            text.set_text(name)
+            text.set_position((x + 0.05, y + 0.05))
+            text.set_visible(True)
+        for text in labels[len(names):]:
+            text.set_visible(False)
+        panel['title'].set_text(frame.get('title', ''))
+
+
+class PatientRenderer(FrameRenderer):
+    """
+    One figure per patient: start state on the depression field and therapy progress
+
+    The field image is computed and drawn once; a frame is a dict with
+    'start' (the patient's emotion-space point) and optionally 'title'.
+    """
+
+    def __init__(self, simulation, n_sessions=12, grid=100, figsize=(10, 4), dpi=100):
+        super().__init__(figsize, dpi)
+        self.simulation = simulation
+        self.sessions = np.arange(n_sessions + 1)
+
+        axis = np.linspace(-1, 1, grid)
+        X, Y = np.meshgrid(axis, axis)
+        depression = simulation.evaluate_fields(X, Y)['depression']
+        self.field_ax = self.figure.add_subplot(1, 2, 1)
+        self.field_ax.imshow(depression, extent=(-1, 1, -1, 1), origin='lower', cmap='RdBu_r')
+        self.field_ax.set_xlabel('Valence')
+        self.field_ax.set_ylabel('Arousal')
+        self.marker = self.dynamic(self.field_ax.plot([], [], 'kx', markersize=10,
+                                                      markeredgewidth=2)[0])
+
+        self.progress_ax = self.figure.add_subplot(1, 2, 2)
+        self.depression_line = self.dynamic(self.progress_ax.plot(
+            [], [], 'b-', linewidth=2, label='Depression curvature')[0])
+        self.anxiety_line = self.dynamic(self.progress_ax.plot(
+            [], [], 'r-', linewidth=2, label='Anxiety torsion')[0])
+        self.progress_ax.axhline(y=0, color='k', linestyle='--', alpha=0.5)
+        self.progress_ax.set_xlim(0, n_sessions)
+        self.progress_ax.set_ylim(-0.7, 0.2 + 0.1 * n_sessions)
+        self.progress_ax.set_xlabel('Therapy Sessions')
+        self.progress_ax.set_ylabel('Pathology Level')
+        self.progress_ax.legend(loc='upper left')
+        self.title = self.dynamic(self.figure.suptitle(''))
+
+    def update(self, frame):
+        start = frame['start']
+        self.marker.set_data([start[0]], [start[1]])
+        depression, anxiety = self.simulation.therapeutic_improvement(*start, self.sessions)
+        self.depression_line.set_data(self.sessions, depression)
+        self.anxiety_line.set_data(self.sessions, anxiety)
+        self.title.set_text(frame.get('title', ''))
+
+
+# One renderer per worker process, built by the pool initializer
+_worker_renderer = None
+
+
+def _init_worker(renderer_factory):
+    global _worker_renderer
+    _worker_renderer = renderer_factory()
+
+
+def _render_chunk(task):
+    frames, paths = task
+    if paths is None:
+        for frame in frames:
+            _worker_renderer.render(frame)
+        return []
+    return [_worker_renderer.save(frame, path) for frame, path in zip(frames, paths)]
+
+
+@timed('rendering')
+def render_batch(renderer_factory, frames, output_dir=None, workers=1, chunk_size=32,
+                 prefix='frame'):
+    """
+    Render every frame with one reused renderer per process
+
+    `renderer_factory` is a picklable zero-argument callable (for example
+    a class or `functools.partial`) that builds the renderer. Frames are
+    written to `output_dir` as `<prefix>_<index>.png`, or only rendered
+    when `output_dir` is None. Returns (paths, figures_per_second).
+    """
+    frames = list(frames)
+    paths = None
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        paths = [os.path.join(output_dir, f'{prefix}_{i:06d}.png') for i in range(len(frames))]
+    tasks = [(frames[i:i + chunk_size], paths[i:i + chunk_size] if paths else None)
+             for i in range(0, len(frames), chunk_size)]
+
+    start = time.perf_counter()
+    written = []
+    if workers <= 1:
+        _init_worker(renderer_factory)
+        for task in tasks:
+            written.extend(_render_chunk(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(renderer_factory,)) as pool:
+            for chunk in pool.map(_render_chunk, tasks):
+                written.extend(chunk)
+    elapsed = time.perf_counter() - start
+    count('figures', len(frames))
+    return written, len(frames) / elapsed if elapsed > 0 else float('inf')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render per-patient figures and report throughput")
+    parser.add_argument('--patients', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', default=None, help="directory for PNGs (default: render only)")
+    args = parser.parse_args(argv)
+
+    from depression_basin import DepressionSimulation
+
+    rng = np.random.default_rng(seed_sequence('patients'))
+    frames = [{'start': tuple(start), 'title': f'Patient {i}'}
+              for i, start in enumerate(rng.uniform(-1, 1, (args.patients, 2)).tolist())]
+    factory = functools.partial(PatientRenderer, DepressionSimulation())
+    paths, throughput = render_batch(factory, frames, args.output, workers=args.workers)
+    print(f"🖼️  Rendered {len(frames)} patient figures with {args.workers} worker(s): "
+          f"{throughput:.1f} figures/s")
+    if paths:
+        print(f"📁 Written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+"""
+CDG BENCHMARK SUITE
+Times every simulation hot path across scaling sizes and guards against regressions
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmarks must run without a display
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import numpy as np
+
+SIMULATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+if SIMULATIONS_DIR not in sys.path:
+    sys.path.insert(0, SIMULATIONS_DIR)
+
+BENCHMARKS = []
+
+
+def benchmark(name, sizes, quick_sizes=None, self_timed=False):
+    """
+    Register `func(size)` as a benchmark; it returns a zero-argument callable to time
+
+    With `self_timed=True` the callable returns its own measurement in
+    seconds instead of being timed from the outside.
+    """
+    def register(func):
+        BENCHMARKS.append((name, func, sizes, quick_sizes or sizes[:1], self_timed))
+        return func
+    return register
+
+
+def _random_concepts(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {f'c{i}': tuple(xy) for i, xy in enumerate(rng.uniform(-1, 1, (n, 2)))}
+
+
+@benchmark('fields.pointwise', sizes=[25, 50, 100], quick_sizes=[25])
+def bench_fields_pointwise(grid):
+    from depression_basin import DepressionSimulation
+
+    sim = DepressionSimulation()
+    X, Y = np.meshgrid(np.linspace(-1, 1, grid), np.linspace(-1, 1, grid))
+
+    def run():
+        for x, y in zip(X.ravel(), Y.ravel()):
+            sim.depression_curvature_field(x, y)
+            sim.anxiety_torsion_field(x, y)
+    return run
+
+
+@benchmark('fields.batched', sizes=[50, 200, 1000], quick_sizes=[200])
+def bench_fields_batched(grid):
+    from depression_basin import DepressionSimulation
+
+    sim = DepressionSimulation()
+    X, Y = np.meshgrid(np.linspace(-1, 1, grid), np.linspace(-1, 1, grid))
+    return lambda: sim.evaluate_fields(X, Y, therapy_sessions=12)
+
+
+@benchmark('fields.store_lookup', sizes=[10_000, 1_000_000], quick_sizes=[10_000],
+           self_timed=True)
+def bench_fields_store_lookup(n_points):
+    from depression_basin import DepressionSimulation
+
+    sim = DepressionSimulation()
+    points = np.random.default_rng(0).uniform(-1, 1, (n_points, 2))
+
+    def run():
+        # Only the lookups are timed; the store lives as long as the run
+        with tempfile.TemporaryDirectory() as tmp:
+            store = sim.field_store(os.path.join(tmp, 'store'), resolution=512,
+                                    therapy_sessions=(12,))
+            start = time.perf_counter()
+            store.lookup_fields(points, therapy_sessions=12)
+            elapsed = time.perf_counter() - start
+            del store
+        return elapsed
+    return run
+
+
+@benchmark('fields.cohort', sizes=[1_000, 100_000], quick_sizes=[1_000])
+def bench_fields_cohort(n_patients):
+    from depression_basin import DepressionSimulation
+
+    rng = np.random.default_rng(0)
+    cohort = DepressionSimulation().cohort(rng.uniform(-1, 1, (n_patients, 2)))
+
+    def run():
+        for _ in cohort.iter_summaries(100):
+            pass
+    return run
+
+
+@benchmark('geodesic.single', sizes=[50, 500, 5000], quick_sizes=[50])
+def bench_geodesic_single(points):
+    from minimal_cdg import MinimalCDG
+
+    cdg = MinimalCDG()
+    return lambda: cdg.compute_geodesic_path('sadness', 'joy', points=points)
+
+
+@benchmark('geodesic.all_pairs', sizes=[100, 300, 1000], quick_sizes=[100])
+def bench_geodesic_all_pairs(n_concepts):
+    from minimal_cdg import MinimalCDG
+
+    cdg = MinimalCDG()
+    cdg.concepts = _random_concepts(n_concepts)
+
+    def run():
+        for _ in cdg.iter_all_geodesic_paths(block_size=8192):
+            pass
+    return run
+
+
+@benchmark('geodesic.metric', sizes=[10, 100, 1000], quick_sizes=[10])
+def bench_geodesic_metric(n_paths):
+    from geodesic_solver import ConformalMetric, GeodesicSolver
+    from minimal_cdg import MinimalCDG
+
+    rng = np.random.default_rng(0)
+    starts, ends = rng.uniform(-1, 1, (2, n_paths, 2))
+    solver = GeodesicSolver(ConformalMetric(MinimalCDG().compute_simple_curvature))
+    return lambda: solver.solve(starts, ends)
+
+
+@benchmark('concept_space.nearest', sizes=[2, 64, 768], quick_sizes=[64])
+def bench_concept_space_nearest(dim):
+    from concept_space import ConceptSpace
+
+    rng = np.random.default_rng(0)
+    space = ConceptSpace(zip((f'c{i}' for i in range(10_000)), rng.normal(size=(10_000, dim))),
+                         dtype=np.float32)
+    queries = rng.normal(size=(100, dim))
+
+    def run():
+        for query in queries:
+            space.nearest_concepts(query, k=10)
+    return run
+
+
+@benchmark('insight.trials', sizes=[1_000, 100_000, 1_000_000], quick_sizes=[1_000])
+def bench_insight_trials(n_trials):
+    from insight_simulation import InsightSimulation
+
+    sim = InsightSimulation()
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim.simulate_insight_process(n_trials=n_trials, seed=0)
+    return run
+
+
+@benchmark('insight.concept_graph', sizes=[1_000, 10_000, 100_000], quick_sizes=[1_000])
+def bench_insight_concept_graph(n_concepts):
+    from concept_graph import ConceptGraph, ConceptInterner
+
+    rng = np.random.default_rng(0)
+    n_edges = 4 * n_concepts
+    interner = ConceptInterner(f'c{i}' for i in range(n_concepts))
+    graph = ConceptGraph.from_id_edges(interner, rng.integers(0, n_concepts, n_edges),
+                                       rng.integers(0, n_concepts, n_edges),
+                                       rng.uniform(0.5, 5.0, n_edges))
+    return lambda: graph.shortest_path('c0', f'c{n_concepts - 1}')
+
+
+@benchmark('insight.edge_sweep', sizes=[200, 1_000], quick_sizes=[200])
+def bench_insight_edge_sweep(n_concepts):
+    from concept_graph import ConceptGraph, ConceptInterner
+    from edge_sweep import EdgeSweep
+
+    rng = np.random.default_rng(0)
+    n_edges = 4 * n_concepts
+    interner = ConceptInterner(f'c{i}' for i in range(n_concepts))
+    graph = ConceptGraph.from_id_edges(interner, rng.integers(0, n_concepts, n_edges),
+                                       rng.integers(0, n_concepts, n_edges),
+                                       rng.uniform(0.5, 5.0, n_edges))
+    sweep = EdgeSweep.from_graph(graph)
+    return lambda: sweep.sweep(weight=1.0, top=10, sample=5_000, seed=0)
+
+
+def import_time(module_name):
+    """Cumulative import time of `module_name` in a fresh interpreter (`-X importtime`)"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+                               cwd=SIMULATIONS_DIR, capture_output=True, text=True, check=True)
+    for line in reversed(completed.stderr.splitlines()):
+        _, cumulative, name = (part.strip() for part in line.split('|'))
+        if name == module_name:
+            return int(cumulative) * 1e-6
+    raise RuntimeError(f"No import time reported for {module_name}")
+
+
+@benchmark('import', sizes=['minimal_cdg', 'depression_basin', 'insight_simulation', 'plotting'],
+           quick_sizes=['minimal_cdg', 'depression_basin', 'insight_simulation'], self_timed=True)
+def bench_import(module_name):
+    return lambda: import_time(module_name)
+
+
+def _plotting_benchmark(make_demo, method):
+    def run():
+        demo = make_demo()
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                getattr(demo, method)()
+            finally:
+                os.chdir(cwd)
+    return run
+
+
+@benchmark('plot.emotion_space', sizes=[1])
+def bench_plot_emotion_space(_):
+    from minimal_cdg import MinimalCDG
+    return _plotting_benchmark(MinimalCDG, 'visualize_emotion_space')
+
+
+@benchmark('plot.curvature_fields', sizes=[1])
+def bench_plot_curvature_fields(_):
+    from depression_basin import DepressionSimulation
+    return _plotting_benchmark(DepressionSimulation, 'visualize_curvature_fields')
+
+
+@benchmark('plot.insight_network', sizes=[1])
+def bench_plot_insight_network(_):
+    from insight_simulation import InsightSimulation
+    return _plotting_benchmark(InsightSimulation, 'visualize_insight_network')
+
+
+@benchmark('render.patient_figures', sizes=[50, 500], quick_sizes=[50])
+def bench_render_patient_figures(n_figures):
+    import functools
+
+    from batch_render import PatientRenderer, render_batch
+    from depression_basin import DepressionSimulation
+
+    rng = np.random.default_rng(0)
+    frames = [{'start': tuple(start)} for start in rng.uniform(-1, 1, (n_figures, 2)).tolist()]
+    factory = functools.partial(PatientRenderer, DepressionSimulation())
+
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            render_batch(factory, frames, tmp)
+    return run
+
+
+@benchmark('render.emotion_space_figures', sizes=[50, 500], quick_sizes=[50])
+def bench_render_emotion_space_figures(n_figures):
+    from batch_render import EmotionSpaceRenderer, render_batch
+    from minimal_cdg import MinimalCDG
+
+    cdg = MinimalCDG()
+    names = list(cdg.concepts)
+    points = np.array([cdg.concepts[name] for name in names])
+    conscious = [cdg.is_conscious_region(name) for name in names]
+    _, _, curved_x, curved_y = cdg.compute_geodesic_path('sadness', 'joy')
+    path = np.column_stack([curved_x, curved_y])
+    frames = [{'points': points + offset, 'conscious': conscious, 'labels': names, 'path': path}
+              for offset in np.random.default_rng(0).normal(0, 0.05, (n_figures, 1, 2))]
+
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            render_batch(EmotionSpaceRenderer, frames, tmp)
+    return run
+
+
+@benchmark('render.geodesic_animation', sizes=[100, 1000], quick_sizes=[100])
+def bench_render_geodesic_animation(n_frames):
+    from minimal_cdg import MinimalCDG
+
+    cdg = MinimalCDG()
+
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            cdg.animate_geodesic('sadness', 'joy', os.path.join(tmp, 'geodesic.gif'),
+                                 points=n_frames)
+    return run
+
+
+@benchmark('curvature.forman', sizes=[100_000, 1_000_000], quick_sizes=[100_000])
+def bench_curvature_forman(n_edges):
+    from concept_graph import ConceptGraph, ConceptInterner
+    from ricci_curvature import FormanCurvature
+
+    rng = np.random.default_rng(0)
+    n_concepts = n_edges // 5
+    interner = ConceptInterner(f'c{i}' for i in range(n_concepts))
+    graph = ConceptGraph.from_id_edges(interner, rng.integers(0, n_concepts, n_edges),
+                                       rng.integers(0, n_concepts, n_edges),
+                                       rng.uniform(0.5, 5.0, n_edges))
+    return lambda: FormanCurvature(graph).node_curvature()
+
+
+@benchmark('flow.therapy_grid', sizes=[128, 512], quick_sizes=[128])
+def bench_flow_therapy_grid(resolution):
+    from depression_basin import DepressionSimulation
+
+    simulation = DepressionSimulation()
+
+    def run():
+        simulation.therapy_flow(resolution=resolution, dt=0.05).run(10)
+    return run
+
+
+@benchmark('manifold.construct', sizes=[10_000, 100_000], quick_sizes=[10_000])
+def bench_manifold_construct(n_concepts):
+    from scipy import sparse
+
+    from manifold_construction import construct_manifold_from_similarity
+
+    rng = np.random.default_rng(0)
+    n_pairs = 20 * n_concepts
+    similarity = sparse.csr_matrix((rng.uniform(0, 1, n_pairs).astype(np.float32),
+                                    (rng.integers(0, n_concepts, n_pairs),
+                                     rng.integers(0, n_concepts, n_pairs))),
+                                   shape=(n_concepts, n_concepts))
+    similarity = similarity.maximum(similarity.T)
+    return lambda: construct_manifold_from_similarity(similarity, k=10)
+
+
+@benchmark('service.batched_queries', sizes=[1, 16], quick_sizes=[16])
+def bench_service_batched_queries(n_clients):
+    from service import SimulationService, load_test
+
+    service = SimulationService()
+
+    async def serve_and_load():
+        server = await service.serve('127.0.0.1', 0)
+        try:
+            await load_test('127.0.0.1', server.sockets[0].getsockname()[1],
+                            clients=n_clients, requests=800 // n_clients)
+        finally:
+            server.close()
+            await server.wait_closed()
+    return lambda: asyncio.run(serve_and_load())
+
+
+@benchmark('results.export_trials', sizes=[1_000_000, 10_000_000], quick_sizes=[1_000_000])
+def bench_results_export_trials(n_trials):
+    from insight_simulation import InsightSimulation
+
+    simulation = InsightSimulation()
+
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            simulation.export_trials(os.path.join(tmp, 'trials.npz'), n_trials=n_trials)
+    return run
+
+
+def time_callable(run, repeat=3, max_seconds=10.0, self_timed=False):
+    """Best-of-`repeat` wall time in seconds (stops early once `max_seconds` is spent)"""
+    timings = []
+    budget_start = time.perf_counter()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        measured = run()
+        timings.append(measured if self_timed else time.perf_counter() - start)
+        if time.perf_counter() - budget_start > max_seconds:
+            break
+    return min(timings)
+
+
+def run_benchmarks(quick=False, name_filter=None, repeat=3):
+    """Run the registered benchmarks; returns {case_name: seconds}"""
+    results = {}
+    for name, factory, sizes, quick_sizes, self_timed in BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+        for size in (quick_sizes if quick else sizes):
+            case = f"{name}[{size}]"
+            results[case] = time_callable(factory(size), repeat=repeat, self_timed=self_timed)
+            print(f"  {case:40} {results[case] * 1e3:12.3f} ms")
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Cases slower than baseline by more than `threshold` (fractional)"""
+    regressions = []
+    for case, seconds in results.items():
+        reference = baseline.get(case)
+        if reference and seconds > reference * (1 + threshold):
+            regressions.append((case, reference, seconds))
+    return regressions
+
+
+def append_history(path, record):
+    history = []
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            history = json.load(f)
+    history.append(record)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CDG simulation hot paths")
+    parser.add_argument('--quick', action='store_true', help="smallest sizes only")
+    parser.add_argument('--filter', default=None, help="only run benchmarks containing this text")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--history',
+                        default=os.path.join(SIMULATIONS_DIR, 'benchmark_history.json'),
+                        help="JSON file that every run is appended to (not committed)")
+    parser.add_argument('--baseline',
+                        default=os.path.join(SIMULATIONS_DIR, 'benchmark_baseline.json'),
+                        help="stored baseline to compare against (commit this one)")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store this run as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown vs baseline before failing (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    print("⏱️  CDG Benchmark Suite")
+    print("=" * 60)
+    results = run_benchmarks(quick=args.quick, name_filter=args.filter, repeat=args.repeat)
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    append_history(args.history, record)
+    print(f"\n📁 Results appended to {args.history}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for case, reference, seconds in regressions:
+            print(f"  {case:40} {reference * 1e3:10.3f} ms -> {seconds * 1e3:10.3f} ms "
+                  f"({seconds / reference - 1:+.0%})")
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+COHORT SIMULATOR
+Streams therapy trajectories for whole patient cohorts session by session
+"""
+
+import numpy as np
+
+from field_engine import therapy_adjusted
+
+
+class CohortSimulator:
+    """
+    Therapy trajectories for many patients at once
+
+    `start_states` holds one emotion-space point per patient, shape
+    (n_patients, dim). `schedule` gives the sessions each patient attends
+    per step: a scalar, a per-patient array of shape (n_patients,), or a
+    callable `schedule(step)` returning either (for irregular or random
+    attendance). Only the initial fields and the running session count
+    are kept per patient, so memory does not depend on the horizon.
+    """
+
+    def __init__(self, simulation, start_states, schedule=1.0, block_size=65536):
+        start_states = np.asarray(start_states, dtype=simulation.precision.dtype)
+        if start_states.ndim != 2:
+            raise ValueError("start_states must have shape (n_patients, dim)")
+        self.simulation = simulation
+        self.start_states = start_states
+        self.schedule = schedule
+        self.block_size = block_size
+
+        initial = simulation.evaluate_points(start_states)
+        self.initial_depression = initial['depression']
+        self.initial_anxiety = initial['anxiety']
+
+    @property
+    def n_patients(self):
+        return len(self.start_states)
+
+    def _sessions_at(self, step):
+        sessions = self.schedule(step) if callable(self.schedule) else self.schedule
+        return np.broadcast_to(np.asarray(sessions, dtype=self.start_states.dtype),
+                               (self.n_patients,))
+
+    def iter_sessions(self, n_steps):
+        """
+        Yield `(step, attended)` for steps 0..n_steps
+
+        `attended` is the cumulative session count per patient; step 0 is
+        the untreated state. The array is updated in place between yields.
+        """
+        attended = np.zeros(self.n_patients, dtype=self.start_states.dtype)
+        for step in range(n_steps + 1):
+            if step:
+                attended += self._sessions_at(step)
+            yield step, attended
+
+    def iter_blocks(self, n_steps):
+        """
+        Yield `(step, rows, fields)` blocks of at most `block_size` patients
+
+        `rows` is a slice into the cohort and `fields` maps 'sessions',
+        'depression' and 'anxiety' to arrays for those patients.
+        """
+        for step, attended in self.iter_sessions(n_steps):
+            for start in range(0, self.n_patients, self.block_size):
+                rows = slice(start, min(start + self.block_size, self.n_patients))
+                depression, anxiety = therapy_adjusted(self.initial_depression[rows],
+                                                       self.initial_anxiety[rows],
+                                                       attended[rows])
+                yield step, rows, {'sessions': attended[rows].copy(),
+                                   'depression': depression, 'anxiety': anxiety}
+
+    def iter_summaries(self, n_steps, percentiles=(5, 50, 95)):
+        """
+        Yield one cohort summary per step without keeping any trajectories
+
+        Each summary holds the step, the mean session count, depression and
+        anxiety and, when `percentiles` is given, the depression and anxiety
+        percentiles across patients. Means are accumulated block by block;
+        percentiles reuse one per-patient buffer for every step.
+        """
+        names = ('depression', 'anxiety')
+        buffers = {name: np.empty(self.n_patients) for name in names} if percentiles else None
+        totals, current = None, None
+        for step, rows, fields in self.iter_blocks(n_steps):
+            if step != current:
+                if current is not None:
+                    yield self._summary(current, totals, buffers, percentiles)
+                totals, current = dict.fromkeys(('sessions',) + names, 0.0), step
+            for name in totals:
+                totals[name] += float(np.sum(fields[name]))
+            if buffers is not None:
+                for name in names:
+                    buffers[name][rows] = fields[name]
+        if current is not None:
+            yield self._summary(current, totals, buffers, percentiles)
+
+    def _summary(self, step, totals, buffers, percentiles):
+        summary = {'step': step}
+        for name, total in totals.items():
+            summary[f'mean_{name}'] = total / self.n_patients
+        if buffers is not None:
+            for name, values in buffers.items():
+                summary[f'{name}_percentiles'] = np.percentile(values, percentiles)
+        return summary
+
+    def summarize(self, n_steps, percentiles=(5, 50, 95)):
+        """
+        Cohort summaries for steps 0..n_steps stacked into arrays
+
+        Returns a dict with 'step', 'mean_sessions', 'mean_depression' and
+        'mean_anxiety' of shape (n_steps + 1,) and, with `percentiles`,
+        'depression_percentiles' and 'anxiety_percentiles' of shape
+        (n_steps + 1, len(percentiles)).
+        """
+        summaries = list(self.iter_summaries(n_steps, percentiles))
+        return {key: np.array([summary[key] for summary in summaries])
+                for key in summaries[0]}
+
+    def export(self, path, n_steps, format=None):
+        """Stream all trajectories to an NPZ/Arrow/Parquet file (see results.export_cohort)"""
+        from results import export_cohort
+        return export_cohort(self, path, n_steps, format)
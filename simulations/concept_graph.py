@@ -0,0 +1,212 @@
+"""
+COMPACT CONCEPT GRAPH
+Integer-indexed CSR concept network for large semantic graphs
+"""
+
+import numpy as np
+
+from instrumentation import count, timed
+
+# scipy and networkx are imported on first use so that importing this module
+# stays as cheap as importing numpy
+
+
+class ConceptInterner:
+    """Two-way mapping between concept names and dense integer ids"""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def intern(self, name):
+        """Id of `name`, assigning the next free id if it is new"""
+        concept_id = self.ids.get(name)
+        if concept_id is None:
+            concept_id = len(self.names)
+            self.ids[name] = concept_id
+            self.names.append(name)
+        return concept_id
+
+    def id_of(self, name):
+        return self.ids[name]
+
+    def name_of(self, concept_id):
+        return self.names[concept_id]
+
+    def intern_many(self, names):
+        """Ids for a sequence of names as an int64 array"""
+        return np.fromiter((self.intern(name) for name in names), dtype=np.int64,
+                           count=len(names))
+
+
+class ConceptGraph:
+    """
+    Undirected weighted concept graph stored as symmetric CSR arrays
+
+    Nodes are dense integer ids with names kept in a ConceptInterner; edge
+    weights are float32 unless built with another `dtype`. Each undirected
+    edge is stored in both directions, sorted by neighbor id within a row,
+    so neighbor lookups are a single slice of `indices`/`weights`.
+    `indptr` and `indices` share one index dtype (int32 until it would
+    overflow), so scipy wraps them without conversion.
+    """
+
+    def __init__(self, interner, indptr, indices, weights):
+        self.interner = interner
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @classmethod
+    def from_id_edges(cls, interner, sources, targets, weights, dtype=np.float32):
+        """
+        Build from parallel id/weight arrays
+
+        Self-loops are dropped and, as with networkx, a repeated edge keeps
+        the weight it was given last.
+        """
+        n = len(interner)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=dtype)
+
+        keep = sources != targets
+        sources, targets, weights = sources[keep], targets[keep], weights[keep]
+        low = np.minimum(sources, targets)
+        high = np.maximum(sources, targets)
+
+        # Keep the last occurrence of each undirected edge
+        keys = low * n + high
+        _, last = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last
+        low, high, weights = low[last], high[last], weights[last]
+
+        rows = np.concatenate([low, high])
+        cols = np.concatenate([high, low])
+        data = np.concatenate([weights, weights])
+        order = np.lexsort((cols, rows))
+        rows, cols, data = rows[order], cols[order], data[order]
+
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        # scipy wants one index dtype for both arrays; int32 unless too small
+        index_dtype = np.int32 if max(n, len(cols)) < 2**31 else np.int64
+        return cls(interner, indptr.astype(index_dtype), cols.astype(index_dtype), data)
+
+    @classmethod
+    def from_edges(cls, weighted_edges, nodes=(), dtype=np.float32):
+        """Build from (name, name, weight) tuples; `nodes` fixes id order first"""
+        interner = ConceptInterner(nodes)
+        sources, targets, weights = [], [], []
+        for u, v, weight in weighted_edges:
+            sources.append(interner.intern(u))
+            targets.append(interner.intern(v))
+            weights.append(weight)
+        return cls.from_id_edges(interner, sources, targets, weights, dtype)
+
+    def astype(self, dtype):
+        """Copy of this graph with `dtype` edge weights and its own arrays"""
+        return ConceptGraph(self.interner, self.indptr.copy(), self.indices.copy(),
+                            self.weights.astype(dtype))
+
+    @property
+    def n_nodes(self):
+        return len(self.interner)
+
+    @property
+    def n_edges(self):
+        return len(self.indices) // 2
+
+    @property
+    def names(self):
+        return self.interner.names
+
+    def degree(self, name):
+        i = self.interner.id_of(name)
+        return int(self.indptr[i + 1] - self.indptr[i])
+
+    def neighbors(self, name):
+        """Mapping of neighbor name to edge weight"""
+        i = self.interner.id_of(name)
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return {self.interner.name_of(j): float(w)
+                for j, w in zip(self.indices[lo:hi], self.weights[lo:hi])}
+
+    def edge_arrays(self):
+        """Each undirected edge once, as (sources, targets, weights) id arrays"""
+        rows = np.repeat(np.arange(self.n_nodes), np.diff(self.indptr))
+        upper = rows < self.indices
+        return rows[upper], self.indices[upper].astype(np.int64), self.weights[upper]
+
+    def iter_edges(self):
+        """Each undirected edge once, as (name, name, weight)"""
+        names = self.interner.names
+        for i, j, w in zip(*self.edge_arrays()):
+            yield names[i], names[j], float(w)
+
+    def with_edges(self, weighted_edges):
+        """New graph with (name, name, weight) edges added or re-weighted"""
+        interner = ConceptInterner(self.interner.names)
+        sources, targets, weights = self.edge_arrays()
+        extra = [(interner.intern(u), interner.intern(v), w) for u, v, w in weighted_edges]
+        if extra:
+            extra_sources, extra_targets, extra_weights = zip(*extra)
+            sources = np.concatenate([sources, extra_sources])
+            targets = np.concatenate([targets, extra_targets])
+            weights = np.concatenate([weights, np.asarray(extra_weights,
+                                                          dtype=self.weights.dtype)])
+        return ConceptGraph.from_id_edges(interner, sources, targets, weights,
+                                          self.weights.dtype)
+
+    def to_csr(self):
+        """scipy CSR view over the graph arrays (no copy of the edge data or indices)"""
+        from scipy.sparse import csr_matrix
+
+        n = self.n_nodes
+        return csr_matrix((self.weights, self.indices, self.indptr), shape=(n, n))
+
+    @timed('path_search')
+    def distances_from(self, name, limit=np.inf):
+        """Shortest path lengths from `name` to every node (inf if unreachable)"""
+        from scipy.sparse.csgraph import dijkstra
+
+        source = self.interner.id_of(name)
+        count('path_queries')
+        return dijkstra(self.to_csr(), directed=False, indices=source, limit=limit)
+
+    def shortest_path_length(self, u, v):
+        """Shortest path length between two concepts (inf when disconnected)"""
+        return float(self.distances_from(u)[self.interner.id_of(v)])
+
+    @timed('path_search')
+    def shortest_path(self, u, v):
+        """One shortest path from u to v as a list of concept names"""
+        from scipy.sparse.csgraph import dijkstra
+
+        source, target = self.interner.id_of(u), self.interner.id_of(v)
+        count('path_queries')
+        distances, predecessors = dijkstra(self.to_csr(), directed=False, indices=source,
+                                           return_predecessors=True)
+        if not np.isfinite(distances[target]):
+            raise ValueError(f"No path between {u!r} and {v!r}")
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]])
+        return [self.interner.name_of(i) for i in reversed(path)]
+
+    def to_networkx(self):
+        """networkx.Graph copy of this graph, intended for plotting only"""
+        import networkx as nx
+
+        G = nx.Graph()
+        G.add_nodes_from(self.interner.names)
+        G.add_weighted_edges_from(self.iter_edges())
+        return G
@@ -0,0 +1,226 @@
+"""
+N-DIMENSIONAL CONCEPT SPACE
+Concept manifold core shared by the 2D emotion-space demo and high-dimensional embeddings
+"""
+
+import numpy as np
+
+from concept_store import ConceptStore
+from curvature_cache import CurvatureCache
+from geodesic_solver import ConformalMetric, GeodesicSolver
+from geodesics import batch_geodesic_paths, iter_all_pair_paths, path_lengths
+from instrumentation import count, span, timed
+from spatial_index import GridIndex, ScoreIndex
+
+# Above this dimensionality grid buckets stop paying off and neighbor
+# queries scan the coordinate matrix instead
+GRID_INDEX_MAX_DIM = 3
+
+
+class ConceptSpace:
+    """
+    Concepts as points of an N-dimensional meaning space
+
+    Coordinates live in a contiguous (n, dim) matrix (see ConceptStore) and
+    the scalar curvature 1 + sum_k w_k |x_k| is evaluated over whole point
+    arrays. Per-concept curvature is memoized, and spatial and curvature
+    indexes follow every change to `concepts`.
+    """
+
+    def __init__(self, concepts=(), dim=None, curvature_weights=None,
+                 consciousness_threshold=2.0, dtype=np.float64, cache_size=4096):
+        # Memoized curvature/consciousness per (concept, coordinates)
+        self._curvature_cache = CurvatureCache(cache_size)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._curvature_weights = curvature_weights
+        self.concepts = concepts
+        self.consciousness_threshold = consciousness_threshold
+
+    @property
+    def curvature_weights(self):
+        """Per-axis curvature weights (default: 0.8 spread evenly over the axes)"""
+        if self._curvature_weights is None:
+            return np.full(self.dim, 0.8 / self.dim)
+        return np.asarray(self._curvature_weights, dtype=float)
+
+    @property
+    def concepts(self):
+        return self._concepts
+
+    @concepts.setter
+    def concepts(self, concepts):
+        # Wrap in a ConceptStore so in-place edits also reach the cache and
+        # the spatial/curvature indexes
+        self._concepts = ConceptStore(concepts, dim=self.dim, dtype=self.dtype)
+        self._concepts.add_listener(self._on_concept_changed)
+        self.dim = self._concepts.dim
+        self._curvature_cache.clear()
+
+        names = self._concepts.row_names
+        matrix = self._concepts.matrix
+        self._spatial_index = None
+        self._row_norms = None
+        if self.dim is not None and self.dim <= GRID_INDEX_MAX_DIM:
+            self._spatial_index = GridIndex()
+            self._spatial_index.bulk_load(names, matrix)
+        curvature = self.curvature(matrix) if len(names) else np.empty(0)
+        self._curvature_index = ScoreIndex(names, curvature.tolist())
+
+    def _on_concept_changed(self, concept, old_coords, new_coords):
+        if self.dim is None:
+            self.dim = self._concepts.dim
+        if old_coords is not None:
+            self._curvature_cache.discard((concept, old_coords))
+            self._curvature_index.remove(concept)
+            if self._spatial_index is not None:
+                self._spatial_index.remove(concept)
+        if new_coords is not None:
+            self._curvature_index.insert(concept, float(self.curvature(new_coords)))
+            if self._spatial_index is None and self.dim <= GRID_INDEX_MAX_DIM:
+                self._spatial_index = GridIndex()
+            if self._spatial_index is not None:
+                self._spatial_index.insert(concept, new_coords)
+
+    @property
+    def consciousness_threshold(self):
+        return self._consciousness_threshold
+
+    @consciousness_threshold.setter
+    def consciousness_threshold(self, threshold):
+        self._consciousness_threshold = threshold
+        self._curvature_cache.clear()
+
+    def cache_info(self):
+        """Hit/miss counters and occupancy of the curvature cache"""
+        return self._curvature_cache.info()
+
+    def resize_cache(self, cache_size):
+        self._curvature_cache.resize(cache_size)
+
+    def curvature(self, points):
+        """Scalar curvature at points of shape (..., dim)"""
+        points = np.asarray(points, dtype=self.dtype)
+        weights = self.curvature_weights.astype(self.dtype)
+        if points.shape[-1] <= GRID_INDEX_MAX_DIM:
+            # Accumulate axis by axis so low-dimensional results are exact
+            curvature = 1.0
+            for k in range(points.shape[-1]):
+                curvature = curvature + weights[k] * np.abs(points[..., k])
+            return curvature
+        return 1.0 + np.abs(points) @ weights
+
+    def curvature_field(self, *coords):
+        """Curvature with one coordinate array per axis (the field signature)"""
+        return self.curvature(np.stack(np.broadcast_arrays(*coords), axis=-1))
+
+    def concept_curvature(self, concept):
+        """Curvature of a concept and whether it is conscious, memoized"""
+        coords = self.concepts[concept]
+        key = (concept, coords)
+        count('curvature_queries')
+        cached = self._curvature_cache.get(key)
+        if cached is None:
+            curvature = float(self.curvature(coords))
+            cached = (curvature, curvature > self.consciousness_threshold)
+            self._curvature_cache.put(key, cached)
+        return cached
+
+    def is_conscious_region(self, concept):
+        """Check if a concept is in a conscious region"""
+        return self.concept_curvature(concept)[1]
+
+    def conscious_concepts(self):
+        """All concepts in a conscious region, from the sorted curvature index"""
+        return self._curvature_index.above(self.consciousness_threshold)
+
+    def _scan(self, point):
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2, with the row norms cached until
+        # the store changes, so a query is a single matrix-vector product
+        matrix = self._concepts.matrix
+        if self._row_norms is None or self._row_norms[0] != self._concepts.version:
+            self._row_norms = (self._concepts.version, np.einsum('ij,ij->i', matrix, matrix))
+        point = np.asarray(point, dtype=self.dtype)
+        squared = self._row_norms[1] - 2 * (matrix @ point) + point @ point
+        return np.sqrt(np.maximum(squared, 0))
+
+    def _named(self, rows, point):
+        # Re-rank the selected rows with exact distances
+        rows = np.asarray(rows, dtype=np.int64)
+        offsets = self._concepts.matrix[rows] - np.asarray(point, dtype=self.dtype)
+        distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+        order = np.argsort(distances, kind='stable')
+        names = self._concepts.row_names
+        return [(names[rows[i]], float(distances[i])) for i in order]
+
+    def nearest_concepts(self, point, k=1):
+        """The k concepts nearest to a point, as (concept, distance) pairs"""
+        if self._spatial_index is not None:
+            return self._spatial_index.nearest(point, k, scan=self._scan_nearest)
+        return self._scan_nearest(point, k)
+
+    def _scan_nearest(self, point, k):
+        distances = self._scan(point)
+        k = min(k, len(distances))
+        if k <= 0:
+            return []
+        return self._named(np.argpartition(distances, k - 1)[:k], point)
+
+    def concepts_within(self, point, radius):
+        """Concepts within `radius` of a point, nearest first"""
+        if self._spatial_index is not None:
+            return self._spatial_index.within(point, radius)
+        return [(name, distance) for name, distance
+                in self._named(np.flatnonzero(self._scan(point) <= radius * (1 + 1e-6)), point)
+                if distance <= radius]
+
+    def _endpoints(self, pairs):
+        matrix = self._concepts.matrix
+        rows = np.array([[self._concepts.row_of(start), self._concepts.row_of(end)]
+                         for start, end in pairs], dtype=np.int64).reshape(-1, 2)
+        return matrix[rows[:, 0]], matrix[rows[:, 1]]
+
+    @timed('path_search')
+    def compute_geodesic_paths(self, pairs, points=50):
+        """
+        Compute paths for many (start_concept, end_concept) pairs in one call
+
+        Returns (straight, curved, straight_lengths, curved_lengths) where the
+        paths have shape (n_pairs, points, dim).
+        """
+        straight, curved = batch_geodesic_paths(*self._endpoints(pairs), points, self.dtype)
+        count('path_queries', len(straight))
+        return straight, curved, path_lengths(straight), path_lengths(curved)
+
+    def iter_all_geodesic_paths(self, points=50, block_size=4096):
+        """
+        Stream paths for every ordered pair of concepts in bounded-size blocks
+
+        Yields (pair_names, straight, curved, straight_lengths, curved_lengths)
+        with at most `block_size` pairs per block.
+        """
+        names = list(self._concepts.row_names)
+        for pairs, straight, curved, straight_len, curved_len in iter_all_pair_paths(
+                self._concepts.matrix, points, block_size, self.dtype):
+            count('path_queries', len(pairs))
+            pair_names = [(names[i], names[j]) for i, j in pairs]
+            yield pair_names, straight, curved, straight_len, curved_len
+
+    def export_paths(self, path, points=50, block_size=4096, format=None):
+        """Stream all-pairs path lengths to an NPZ/Arrow/Parquet file (see results.export_paths)"""
+        from results import export_paths
+        return export_paths(self, path, points, block_size, format)
+
+    def compute_metric_geodesics(self, pairs, field=None, strength=0.5, points=50):
+        """
+        Solve true geodesics of the conformal metric built from a curvature field
+
+        `field` defaults to this space's own curvature; any vectorized field
+        such as `DepressionSimulation.depression_curvature_field` also works.
+        Returns a GeodesicResult whose `throughput` is in geodesics per second.
+        """
+        metric = ConformalMetric(field or self.curvature_field, strength=strength)
+        with span('geodesic_solve'):
+            result = GeodesicSolver(metric, points=points).solve(*self._endpoints(pairs))
+        count('path_queries', len(pairs))
+        return result
@@ -0,0 +1,111 @@
+"""
+CONCEPT STORE
+Concept-coordinate mapping backed by a contiguous coordinate matrix
+"""
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+
+class ConceptStore(MutableMapping):
+    """
+    Dict-like mapping of concept name to coordinates
+
+    Behaves like the plain dict of tuples it replaces (including iteration
+    in insertion order), but coordinates live in one contiguous
+    (n, dim) matrix of `dtype` so whole-space routines can work on
+    `matrix` directly; `row_names[i]` names row i. Removing a concept moves
+    the last row into its slot.
+
+    Every insertion, update or removal bumps `version` and calls each
+    registered listener as `listener(name, old_coords, new_coords)` (None
+    for a missing side). Caches and indexes built on the concepts subscribe
+    to stay current.
+    """
+
+    def __init__(self, concepts=(), dim=None, dtype=np.float64):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._rows = {}
+        self.row_names = []
+        self._matrix = np.empty((0, dim or 0), dtype=self.dtype)
+        self._listeners = []
+        self.version = 0
+
+        if isinstance(concepts, ConceptStore):
+            concepts = concepts.items()
+        elif hasattr(concepts, 'items'):
+            concepts = concepts.items()
+        for name, coords in concepts:
+            self._store(name, coords)
+
+    @property
+    def matrix(self):
+        """(n, dim) coordinate matrix; row i belongs to `row_names[i]`"""
+        return self._matrix[:len(self.row_names)]
+
+    def row_of(self, name):
+        return self._rows[name]
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def _notify(self, name, old, new):
+        self.version += 1
+        for listener in self._listeners:
+            listener(name, old, new)
+
+    def _store(self, name, coords):
+        coords = np.asarray(coords, dtype=self.dtype).ravel()
+        if self.dim is None:
+            self.dim = coords.size
+            self._matrix = np.empty((0, self.dim), dtype=self.dtype)
+        if coords.size != self.dim:
+            raise ValueError(f"Concept {name!r} has {coords.size} coordinates, expected {self.dim}")
+
+        row = self._rows.get(name)
+        if row is None:
+            row = len(self.row_names)
+            if row == len(self._matrix):
+                grown = np.empty((max(8, 2 * row), self.dim), dtype=self.dtype)
+                grown[:row] = self._matrix[:row]
+                self._matrix = grown
+            self._rows[name] = row
+            self.row_names.append(name)
+        self._matrix[row] = coords
+
+    def __getitem__(self, name):
+        return tuple(self._matrix[self._rows[name]].tolist())
+
+    def __setitem__(self, name, coords):
+        old = self[name] if name in self._rows else None
+        self._store(name, coords)
+        self._notify(name, old, self[name])
+
+    def __delitem__(self, name):
+        old = self[name]
+        row = self._rows.pop(name)
+        last = len(self.row_names) - 1
+        if row != last:
+            moved = self.row_names[last]
+            self._matrix[row] = self._matrix[last]
+            self.row_names[row] = moved
+            self._rows[moved] = row
+        self.row_names.pop()
+        self._notify(name, old, None)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def __repr__(self):
+        return f"ConceptStore({dict(self.items())!r})"
@@ -0,0 +1,59 @@
+"""
+CURVATURE CACHE
+Bounded LRU cache for per-concept curvature and consciousness classification
+"""
+
+from collections import OrderedDict
+
+
+class CurvatureCache:
+    """
+    LRU cache of (curvature, conscious) keyed on (concept, coordinates)
+
+    Keying on the coordinates as well as the name means a moved concept can
+    never be served a stale value; `clear` is still called whenever the
+    concepts or the consciousness threshold change so that no dead entries
+    linger. Hit and miss counters survive clearing.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached value for `key`, or None (counted as a miss)"""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def discard(self, key):
+        self._entries.pop(key, None)
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        while len(self._entries) > max(maxsize, 0):
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def info(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries), 'maxsize': self.maxsize}
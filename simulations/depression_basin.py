@@ -4,39 +4,40 @@ Demonstrates depression as curvature and therapy as geometric healing
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
+
+from field_engine import FieldEngine, anxiety_torsion, depression_curvature, therapy_adjusted
+from instrumentation import count
+from precision import resolve
+from results import DepressionResult
 
 class DepressionSimulation:
     """Demonstrates depression and therapeutic healing in CDG"""
     
-    def __init__(self):
-        self.depression_center = (-0.7, -0.6)
-        self.anxiety_center = (-0.3, 0.8)
+    def __init__(self, depression_center=(-0.7, -0.6), anxiety_center=(-0.3, 0.8),
+                 precision=None):
+        # Centers may have any dimensionality; the demo uses 2D emotion space
+        self.depression_center = tuple(depression_center)
+        self.anxiety_center = tuple(anxiety_center)
+        # float32 ('fast') or float64 ('reference') fields, grids and cohorts
+        self.precision = resolve(precision)
+    
+    def field_engine(self, chunk_size=1_000_000):
+        """Batched evaluator bound to the current field centers"""
+        return FieldEngine(self.depression_center, self.anxiety_center,
+                           chunk_size=chunk_size, dtype=self.precision.dtype)
     
-    def depression_curvature_field(self, x, y):
+    def depression_curvature_field(self, *coords):
         """Negative curvature field representing depression"""
-        dx = x - self.depression_center[0]
-        dy = y - self.depression_center[1]
-        distance = np.sqrt(dx**2 + dy**2)
-        
-        # Depression creates negative curvature basin
-        depression_strength = -0.8 * np.exp(-distance**2 / 0.3)
-        
-        # Healthy baseline
-        baseline = 0.2
-        
-        return depression_strength + baseline
+        # Depression creates negative curvature basin on a healthy baseline
+        count('field_evaluations')
+        return depression_curvature([self.precision.asarray(c) for c in coords],
+                                    self.depression_center)
     
-    def anxiety_torsion_field(self, x, y):
+    def anxiety_torsion_field(self, *coords):
         """Torsion field representing anxiety"""
-        dx = x - self.anxiety_center[0]
-        dy = y - self.anxiety_center[1]
-        distance = np.sqrt(dx**2 + dy**2)
-        
         # Anxiety creates torsion (asymmetry)
-        torsion = 0.6 * np.exp(-distance**2 / 0.4)
-        
-        return torsion
+        count('field_evaluations')
+        return anxiety_torsion([self.precision.asarray(c) for c in coords], self.anxiety_center)
     
     def therapeutic_improvement(self, x, y, therapy_sessions):
         """Simulate therapeutic improvement"""
@@ -44,80 +45,59 @@ class DepressionSimulation:
         initial_anxiety = self.anxiety_torsion_field(x, y)
         
         # Therapy reduces pathology
-        therapy_effect = 0.1 * therapy_sessions
-        improved_depression = initial_depression + therapy_effect
-        improved_anxiety = initial_anxiety * (1 - therapy_effect)
-        
-        return improved_depression, improved_anxiety
+        return therapy_adjusted(initial_depression, initial_anxiety, therapy_sessions)
+    
+    def evaluate_fields(self, *coords, therapy_sessions=None):
+        """Evaluate all fields over whole coordinate arrays in one pass"""
+        return self.field_engine().evaluate(*coords, therapy_sessions=therapy_sessions)
+    
+    def evaluate_points(self, points, therapy_sessions=None):
+        """Evaluate all fields at points of shape (..., dim) in one pass"""
+        return self.field_engine().evaluate_points(points, therapy_sessions=therapy_sessions)
+    
+    def field_store(self, directory, **build_options):
+        """Memory-mapped precomputed fields for this simulation, built on first use"""
+        from field_store import FieldStore
+        return FieldStore.ensure(directory, self.field_engine(), **build_options)
+    
+    def therapy_flow(self, bounds=(-1, 1, -1, 1), resolution=128, dt=0.01, diffusivity=1.0,
+                     theta=1.0):
+        """
+        Therapy as curvature smoothing: heat flow of both fields over a grid
+        
+        Returns a ricci_flow.HeatFlow over 'depression' and 'anxiety' on a
+        `resolution`-point-per-axis grid spanning `bounds`; call its
+        `run(n_steps, checkpoint=...)` to evolve it.
+        """
+        from ricci_flow import HeatFlow, grid_laplacian
+        axes = [np.linspace(low, high, resolution) for low, high in zip(bounds[::2], bounds[1::2])]
+        fields = self.field_engine().evaluate_grid(axes)
+        spacing = [axis[1] - axis[0] for axis in axes]
+        return HeatFlow(grid_laplacian(fields['depression'].shape, spacing), fields, dt,
+                        diffusivity=diffusivity, theta=theta)
+    
+    def export_fields(self, path, **options):
+        """Stream the field grid to an NPZ/Arrow/Parquet file (see results.export_fields)"""
+        from results import export_fields
+        return export_fields(self.field_engine(), path, **options)
+    
+    def cohort(self, start_states, schedule=1.0, block_size=65536):
+        """Cohort simulator for many patients starting at `start_states`"""
+        from cohort import CohortSimulator
+        return CohortSimulator(self, start_states, schedule, block_size)
+    
+    def animate_therapy(self, start=(-0.6, -0.5), path='therapy.gif', n_sessions=12, fps=30):
+        """Export an animation of therapeutic progress from `start`; returns (frames, fps)"""
+        from animation_export import TherapyAnimation, export_animation
+        return export_animation(TherapyAnimation(self, start, n_sessions), path, fps=fps)
     
     def visualize_curvature_fields(self):
-        """Visualize the curvature and torsion fields"""
-        # Create grid
-        x = np.linspace(-1, 1, 50)
-        y = np.linspace(-1, 1, 50)
-        X, Y = np.meshgrid(x, y)
-        
-        # Compute fields
-        depression_Z = np.zeros_like(X)
-        anxiety_Z = np.zeros_like(X)
-        
-        for i in range(len(x)):
-            for j in range(len(y)):
-                depression_Z[i, j] = self.depression_curvature_field(X[i, j], Y[i, j])
-                anxiety_Z[i, j] = self.anxiety_torsion_field(X[i, j], Y[i, j])
-        
-        # Create visualization
-        fig = plt.figure(figsize=(15, 5))
-        
-        # Depression curvature
-        ax1 = fig.add_subplot(131)
-        contour1 = ax1.contourf(X, Y, depression_Z, levels=20, cmap='RdYlBu')
-        plt.colorbar(contour1, ax=ax1, label='Curvature')
-        ax1.scatter(*self.depression_center, color='red', s=100, marker='x', linewidth=2)
-        ax1.set_title('Depression: Negative Curvature Basin')
-        ax1.set_xlabel('Valence')
-        ax1.set_ylabel('Arousal')
-        ax1.grid(True, alpha=0.3)
-        
-        # Anxiety torsion  
-        ax2 = fig.add_subplot(132)
-        contour2 = ax2.contourf(X, Y, anxiety_Z, levels=20, cmap='YlOrRd')
-        plt.colorbar(contour2, ax=ax2, label='Torsion Magnitude')
-        ax2.scatter(*self.anxiety_center, color='orange', s=100, marker='x', linewidth=2)
-        ax2.set_title('Anxiety: High Torsion Region')
-        ax2.set_xlabel('Valence')
-        ax2.set_ylabel('Arousal')
-        ax2.grid(True, alpha=0.3)
-        
-        # Therapeutic progress
-        ax3 = fig.add_subplot(133)
-        sessions = range(0, 13)  # 12 weeks of therapy
-        depression_progress = []
-        anxiety_progress = []
-        
-        test_point = (-0.6, -0.5)  # Starting in depression
-        
-        for session in sessions:
-            dep, anx = self.therapeutic_improvement(*test_point, session)
-            depression_progress.append(dep)
-            anxiety_progress.append(anx)
-        
-        ax3.plot(sessions, depression_progress, 'b-', linewidth=2, label='Depression curvature')
-        ax3.plot(sessions, anxiety_progress, 'r-', linewidth=2, label='Anxiety torsion')
-        ax3.axhline(y=0, color='k', linestyle='--', alpha=0.5, label='Healthy baseline')
-        
-        ax3.set_xlabel('Therapy Sessions')
-        ax3.set_ylabel('Pathology Level')
-        ax3.set_title('Therapeutic Progress Over Time')
-        ax3.legend()
-        ax3.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        plt.savefig('depression_demo.png', dpi=150, bbox_inches='tight')
-        plt.show()
+        """Visualize the curvature and torsion fields; returns the PNG path"""
+        from plotting import plot_curvature_fields
+        return plot_curvature_fields(self)
     
     def run_demo(self):
-        """Run the depression demonstration"""
+        """Run the depression demonstration and return its DepressionResult"""
         print("📊 CDG Depression and Anxiety Demo")
         print("=" * 40)
         
@@ -145,6 +125,8 @@ class DepressionSimulation:
         print(f"  ✓ Anxiety as high torsion regions") 
         print(f"  ✓ Therapy as curvature smoothing")
         print(f"  ✓ Healing as geometric optimization")
+        return DepressionResult(test_point, 12, initial_depression, initial_anxiety,
+                                final_depression, final_anxiety)
 
 if __name__ == "__main__":
     demo = DepressionSimulation()
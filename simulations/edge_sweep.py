@@ -0,0 +1,173 @@
+"""
+INSIGHT EDGE SWEEP
+Scores every candidate shortcut edge by how much it shortens all concept paths
+"""
+
+import heapq
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import count, timed
+from precision import rng
+
+
+def edge_gain(distances, a, b, weight):
+    """
+    Total shortest-path reduction from adding undirected edge (a, b)
+
+    Returns (gain, newly_connected): the summed length reduction over all
+    unordered pairs that stay connected, and the number of pairs the edge
+    connects for the first time. A pair {i, j} can only improve through
+    a then b when D[i,a] + w < D[i,b] and w + D[b,j] < D[a,j]; those row
+    and column sets are disjoint from the b-then-a case, so one min-plus
+    pass over that submatrix is exact.
+    """
+    D = distances
+    # D is symmetric, so contiguous rows stand in for columns
+    row_a, row_b = D[a], D[b]
+    rows = np.flatnonzero(row_a + weight < row_b)
+    if rows.size == 0:
+        return 0.0, 0
+    cols = np.flatnonzero(row_b + weight < row_a)
+    if cols.size == 0:
+        return 0.0, 0
+    current = D[np.ix_(rows, cols)]
+    reduction = current - (row_a[rows, None] + weight)
+    reduction -= row_b[None, cols]
+    connected = 0
+    if not np.isfinite(current).all():
+        disconnected = np.isinf(current)
+        connected = int(np.count_nonzero(disconnected))
+        reduction[disconnected] = 0.0
+    np.maximum(reduction, 0.0, out=reduction)
+    return float(reduction.sum()), connected
+
+
+# All-pairs matrix held by each worker process, set by the pool initializer
+_worker_distances = None
+
+
+def _init_worker(distances):
+    global _worker_distances
+    _worker_distances = distances
+
+
+def _score_chunk(task):
+    sources, targets, weights, top = task
+    D = _worker_distances
+    scored = []
+    for a, b, w in zip(sources.tolist(), targets.tolist(), weights.tolist()):
+        gain, connected = edge_gain(D, a, b, w)
+        if gain > 0 or connected:
+            scored.append((connected, gain, a, b, w))
+    return heapq.nlargest(top, scored) if top else scored
+
+
+class EdgeSweep:
+    """
+    Ranks candidate edges by total path-length gain over an all-pairs matrix
+
+    The distance matrix is computed once (or taken from a ShortestPathEngine)
+    and every candidate is scored by a vectorized min-plus update restricted
+    to the node pairs it can actually shorten, with no per-candidate
+    Dijkstra runs. Candidates are scored in chunks, optionally across
+    worker processes.
+    """
+
+    def __init__(self, distances, nodes=None):
+        self.distances = np.asarray(distances, dtype=float)
+        n = len(self.distances)
+        self.nodes = list(nodes) if nodes is not None else list(range(n))
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Sweep over a ConceptGraph (all-pairs distances via scipy)"""
+        from scipy.sparse.csgraph import shortest_path
+
+        return cls(shortest_path(graph.to_csr(), method='D', directed=False), graph.names)
+
+    @classmethod
+    def from_engine(cls, engine):
+        """Sweep over a ShortestPathEngine, reusing its maintained distance matrix"""
+        return cls(engine.distances, engine.nodes)
+
+    @property
+    def n_nodes(self):
+        return len(self.nodes)
+
+    def gain(self, u, v, weight=1.0):
+        """(gain, newly_connected) for one candidate edge between named nodes"""
+        count('edge_candidates')
+        return edge_gain(self.distances, self.index[u], self.index[v], float(weight))
+
+    def iter_candidate_chunks(self, sample=None, seed=None, chunk_size=4096):
+        """
+        Yield (sources, targets) id arrays of candidate edges
+
+        Every unordered pair i < j by default, generated row block by row
+        block so the full pair list is never materialized; with `sample`,
+        that many distinct random pairs drawn from the precision policy's
+        'edge_sweep' stream for `seed`.
+        """
+        n = self.n_nodes
+        if sample is not None:
+            total = n * (n - 1) // 2
+            picks = np.sort(rng('edge_sweep', seed).choice(total, size=min(sample, total), replace=False))
+            # Invert the row-major index of the strict upper triangle
+            row_starts = np.cumsum(np.r_[0, np.arange(n - 1, 0, -1)])
+            rows = np.searchsorted(row_starts, picks, side='right') - 1
+            cols = picks - row_starts[rows] + rows + 1
+            for start in range(0, len(picks), chunk_size):
+                yield rows[start:start + chunk_size], cols[start:start + chunk_size]
+            return
+
+        sources, targets = [], []
+        pending = 0
+        for i in range(n - 1):
+            sources.append(np.full(n - 1 - i, i))
+            targets.append(np.arange(i + 1, n))
+            pending += n - 1 - i
+            if pending >= chunk_size:
+                yield np.concatenate(sources), np.concatenate(targets)
+                sources, targets, pending = [], [], 0
+        if pending:
+            yield np.concatenate(sources), np.concatenate(targets)
+
+    @timed('edge_sweep')
+    def sweep(self, weight=1.0, top=10, sample=None, seed=None, workers=1, chunk_size=4096):
+        """
+        Best `top` new edges as (u, v, gain, newly_connected) tuples
+
+        Edges that connect previously disconnected pairs rank first (by the
+        number of such pairs), then by total gain. `weight` is the length of
+        the new edge; `top=None` returns every improving candidate.
+        """
+        def tasks():
+            for sources, targets in self.iter_candidate_chunks(sample, seed, chunk_size):
+                count('edge_candidates', len(sources))
+                yield sources, targets, np.full(len(sources), float(weight)), top
+
+        scored = []
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.distances,)) as pool:
+                # Keep a bounded window of chunks in flight; Executor.map would
+                # submit the whole candidate stream up front
+                pending = deque()
+                for task in tasks():
+                    pending.append(pool.submit(_score_chunk, task))
+                    if len(pending) >= 2 * workers:
+                        scored.extend(pending.popleft().result())
+                while pending:
+                    scored.extend(pending.popleft().result())
+        else:
+            _init_worker(self.distances)
+            for task in tasks():
+                scored.extend(_score_chunk(task))
+
+        best = heapq.nlargest(top, scored) if top else sorted(scored, reverse=True)
+        return [(self.nodes[a], self.nodes[b], gain, connected)
+                for connected, gain, a, b, _ in best]
@@ -0,0 +1,178 @@
+"""
+FIELD ENGINE
+Batched evaluation of the depression, anxiety and therapy fields
+"""
+
+import itertools
+
+import numpy as np
+
+from instrumentation import count, timed
+
+# Field constants shared by every evaluation path
+DEPRESSION_DEPTH = -0.8
+DEPRESSION_WIDTH = 0.3
+HEALTHY_BASELINE = 0.2
+ANXIETY_STRENGTH = 0.6
+ANXIETY_WIDTH = 0.4
+THERAPY_RATE = 0.1
+
+
+def _distance(coords, center):
+    """Euclidean distance from every point in `coords` to `center`"""
+    if len(coords) != len(center):
+        raise ValueError(
+            f"Expected {len(center)} coordinate arrays, got {len(coords)}"
+        )
+    squared = None
+    for axis, c in zip(coords, center):
+        d = np.asarray(axis) - c
+        squared = d**2 if squared is None else squared + d**2
+    return np.sqrt(squared)
+
+
+def _point_distance(points, center):
+    """Euclidean distance from points of shape (..., dim) to `center`"""
+    points = np.asarray(points)
+    if points.shape[-1] != len(center):
+        raise ValueError(f"Expected points with {len(center)} coordinates, got {points.shape[-1]}")
+    return np.sqrt(np.sum((points - np.asarray(center, dtype=points.dtype))**2, axis=-1))
+
+
+def _depression_from_distance(distance):
+    depression_strength = DEPRESSION_DEPTH * np.exp(-distance**2 / DEPRESSION_WIDTH)
+    return depression_strength + HEALTHY_BASELINE
+
+
+def _anxiety_from_distance(distance):
+    return ANXIETY_STRENGTH * np.exp(-distance**2 / ANXIETY_WIDTH)
+
+
+def depression_curvature(coords, center):
+    """Negative curvature basin around `center`, for arrays of any shape"""
+    return _depression_from_distance(_distance(coords, center))
+
+
+def anxiety_torsion(coords, center):
+    """Torsion bump around `center`, for arrays of any shape"""
+    return _anxiety_from_distance(_distance(coords, center))
+
+
+def therapy_adjusted(depression, anxiety, therapy_sessions):
+    """Apply `therapy_sessions` (scalar or broadcastable array) to both fields"""
+    # Session counts take the fields' precision instead of promoting them
+    therapy_effect = THERAPY_RATE * np.asarray(therapy_sessions,
+                                               dtype=np.result_type(depression, np.float32))
+    improved_depression = depression + therapy_effect
+    improved_anxiety = anxiety * (1 - therapy_effect)
+    return improved_depression, improved_anxiety
+
+
+class FieldEngine:
+    """Evaluates all pathology fields over whole coordinate arrays at once
+
+    Coordinates are passed as one array per axis (as returned by
+    `np.meshgrid`); the arrays may have any shape and the number of axes
+    must match the dimensionality of the field centers. Coordinates are
+    cast to `dtype` and every field comes back in it, so float32 halves
+    the memory of large grids.
+    """
+
+    FIELDS = ('depression', 'anxiety')
+
+    def __init__(self, depression_center, anxiety_center, chunk_size=1_000_000,
+                 dtype=np.float64):
+        if len(depression_center) != len(anxiety_center):
+            raise ValueError("Field centers must have the same dimensionality")
+        self.depression_center = tuple(depression_center)
+        self.anxiety_center = tuple(anxiety_center)
+        self.chunk_size = chunk_size
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def ndim(self):
+        return len(self.depression_center)
+
+    def field_names(self, therapy_sessions=None):
+        """Names of the fields returned by `evaluate`"""
+        if therapy_sessions is None:
+            return self.FIELDS
+        return self.FIELDS + ('therapy_depression', 'therapy_anxiety')
+
+    @timed('field_evaluation')
+    def evaluate(self, *coords, therapy_sessions=None):
+        """Compute every field in one pass
+
+        Returns a dict with 'depression' and 'anxiety' arrays, plus
+        'therapy_depression' and 'therapy_anxiety' when `therapy_sessions`
+        is given.
+        """
+        coords = [np.asarray(axis, dtype=self.dtype) for axis in coords]
+        depression = depression_curvature(coords, self.depression_center)
+        anxiety = anxiety_torsion(coords, self.anxiety_center)
+        count('field_evaluations', np.size(depression))
+        return self._collect(depression, anxiety, therapy_sessions)
+
+    @timed('field_evaluation')
+    def evaluate_points(self, points, therapy_sessions=None):
+        """
+        Like `evaluate`, for a point matrix of shape (..., dim)
+
+        Distances are reduced over the last axis in one call, which suits
+        high-dimensional spaces better than one array per axis.
+        """
+        points = np.asarray(points, dtype=self.dtype)
+        depression = _depression_from_distance(_point_distance(points, self.depression_center))
+        anxiety = _anxiety_from_distance(_point_distance(points, self.anxiety_center))
+        count('field_evaluations', np.size(depression))
+        return self._collect(depression, anxiety, therapy_sessions)
+
+    def _collect(self, depression, anxiety, therapy_sessions):
+        fields = {'depression': depression, 'anxiety': anxiety}
+        if therapy_sessions is not None:
+            improved = therapy_adjusted(depression, anxiety, therapy_sessions)
+            fields['therapy_depression'], fields['therapy_anxiety'] = improved
+        return fields
+
+    def _tile_shape(self, shape):
+        """Largest leading-axis tile whose size stays within `chunk_size`"""
+        tile = list(shape)
+        for axis in range(len(tile)):
+            while tile[axis] > 1 and int(np.prod(tile)) > self.chunk_size:
+                tile[axis] = (tile[axis] + 1) // 2
+        return tuple(tile)
+
+    def iter_grid_tiles(self, axes, therapy_sessions=None, tile_shape=None):
+        """Yield `(index, fields)` tiles covering the grid spanned by `axes`
+
+        `axes` holds one 1D coordinate vector per dimension and the grid
+        uses 'ij' indexing, so `index` is a tuple of slices into an array of
+        shape `tuple(len(a) for a in axes)`. Only one tile is held in memory
+        at a time.
+        """
+        axes = [np.asarray(a) for a in axes]
+        shape = tuple(len(a) for a in axes)
+        tile_shape = tile_shape or self._tile_shape(shape)
+        starts = [range(0, n, t) for n, t in zip(shape, tile_shape)]
+        for corner in itertools.product(*starts):
+            index = tuple(slice(s, min(s + t, n))
+                          for s, t, n in zip(corner, tile_shape, shape))
+            tile_coords = np.meshgrid(*(a[i] for a, i in zip(axes, index)),
+                                      indexing='ij')
+            yield index, self.evaluate(*tile_coords, therapy_sessions=therapy_sessions)
+
+    def evaluate_grid(self, axes, therapy_sessions=None, out=None, tile_shape=None):
+        """Fill full-grid field arrays tile by tile
+
+        `out` may map field names to preallocated arrays (for example
+        `np.memmap` or `np.lib.format.open_memmap` arrays) so that grids
+        larger than RAM can be written straight to disk.
+        """
+        shape = tuple(len(a) for a in axes)
+        names = self.field_names(therapy_sessions)
+        if out is None:
+            out = {name: np.empty(shape, dtype=self.dtype) for name in names}
+        for index, fields in self.iter_grid_tiles(axes, therapy_sessions, tile_shape):
+            for name in names:
+                out[name][index] = fields[name]
+        return out
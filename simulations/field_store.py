@@ -0,0 +1,285 @@
+"""
+FIELD STORE
+Precomputed field grids on disk, memory-mapped for interpolated lookups
+"""
+
+import errno
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import field_engine
+from field_engine import therapy_adjusted
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+# Retries of `FieldStore.open` while a concurrent build replaces the store
+OPEN_ATTEMPTS = 5
+
+
+def field_parameters(engine):
+    """Everything the field values depend on, as a JSON-serializable dict"""
+    return {
+        'depression_center': [float(c) for c in engine.depression_center],
+        'anxiety_center': [float(c) for c in engine.anxiety_center],
+        'dtype': engine.dtype.name,
+        'constants': {name: getattr(field_engine, name) for name in (
+            'DEPRESSION_DEPTH', 'DEPRESSION_WIDTH', 'HEALTHY_BASELINE',
+            'ANXIETY_STRENGTH', 'ANXIETY_WIDTH', 'THERAPY_RATE')},
+    }
+
+
+def parameters_checksum(engine):
+    """SHA-256 of the field parameters; stored files are only valid for a matching engine"""
+    encoded = json.dumps(field_parameters(engine), sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _field_file(name, therapy_sessions=None):
+    if therapy_sessions is None:
+        return f'{name}.npy'
+    return f'{name}_therapy_{therapy_sessions:g}.npy'
+
+
+def _grid_axes(engine, bounds=None, resolution=256):
+    ndim = engine.ndim
+    bounds = bounds or [(-1.0, 1.0)] * ndim
+    resolution = np.broadcast_to(resolution, (ndim,))
+    if any(size < 2 for size in resolution):
+        raise ValueError("Every axis needs at least 2 grid points")
+    return [np.linspace(low, high, int(size)) for (low, high), size in zip(bounds, resolution)]
+
+
+def _axes_manifest(axes):
+    return [{'low': float(axis[0]), 'high': float(axis[-1]), 'size': len(axis)} for axis in axes]
+
+
+def _publish(staging, directory):
+    """Move a fully built store into place, retiring any store already there"""
+    parent = os.path.dirname(os.path.abspath(directory))
+    while True:
+        try:
+            os.rename(staging, directory)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                raise
+        # Another store is in the way: move it aside (a concurrent build may
+        # have done so already) and retry. Open memory maps of the retired
+        # files stay valid until their readers close them.
+        retired = tempfile.mkdtemp(prefix='.retired-', dir=parent)
+        os.rmdir(retired)
+        try:
+            os.rename(directory, retired)
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+class FieldStore:
+    """
+    Read-only view of field grids written by `FieldStore.build`
+
+    Each field is one `.npy` file opened with `mmap_mode='r'`, so any
+    number of worker processes can open the same store and share its
+    pages through the OS cache without copying. `manifest.json` records
+    the grid and a checksum of the field parameters; `open` refuses a
+    store whose checksum does not match the expected engine. Stores are
+    built in a staging directory and moved into place whole, so readers
+    never see a partially written or mixed store.
+    """
+
+    def __init__(self, directory, manifest, arrays):
+        self.directory = directory
+        self.manifest = manifest
+        self.arrays = arrays
+        self.low = np.array([axis['low'] for axis in manifest['axes']])
+        self.high = np.array([axis['high'] for axis in manifest['axes']])
+        self.shape = tuple(axis['size'] for axis in manifest['axes'])
+        self.step = (self.high - self.low) / (np.array(self.shape) - 1)
+
+    @property
+    def checksum(self):
+        return self.manifest['checksum']
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def therapy_sessions(self):
+        return tuple(self.manifest['therapy_sessions'])
+
+    @classmethod
+    def build(cls, directory, engine, bounds=None, resolution=256, therapy_sessions=(),
+              tile_shape=None):
+        """
+        Evaluate `engine` on a regular grid and write the store to `directory`
+
+        `bounds` is one (low, high) pair per axis (default [-1, 1] on every
+        axis) and `resolution` the number of grid points per axis (an int
+        or one per axis). Therapy-adjusted grids are written for every
+        session count in `therapy_sessions`. The grid is filled tile by tile
+        straight into memory-mapped files in a staging directory next to
+        `directory`, which then replaces any existing store in one rename.
+        Raises FileExistsError if `directory` holds anything but a store.
+        """
+        try:
+            entries = os.listdir(directory)
+        except FileNotFoundError:
+            entries = []
+        if entries and MANIFEST not in entries:
+            raise FileExistsError(f"{directory} is not empty and holds no field store")
+        axes = _grid_axes(engine, bounds, resolution)
+        shape = tuple(len(axis) for axis in axes)
+        therapy_sessions = [float(s) for s in therapy_sessions]
+
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f'.{os.path.basename(directory)}-', dir=parent)
+        try:
+            cls._write(staging, engine, axes, shape, therapy_sessions, tile_shape)
+            _publish(staging, directory)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return cls.open(directory, engine)
+
+    @staticmethod
+    def _write(directory, engine, axes, shape, therapy_sessions, tile_shape):
+        files = {}
+        for name in engine.FIELDS:
+            files[name] = _field_file(name)
+            for sessions in therapy_sessions:
+                files[f'therapy_{name}_{sessions:g}'] = _field_file(name, sessions)
+        out = {key: np.lib.format.open_memmap(os.path.join(directory, filename), mode='w+',
+                                               dtype=engine.dtype, shape=shape)
+               for key, filename in files.items()}
+
+        for index, fields in engine.iter_grid_tiles(axes, tile_shape=tile_shape):
+            for name in engine.FIELDS:
+                out[name][index] = fields[name]
+            for sessions in therapy_sessions:
+                depression, anxiety = therapy_adjusted(fields['depression'], fields['anxiety'],
+                                                       sessions)
+                out[f'therapy_depression_{sessions:g}'][index] = depression
+                out[f'therapy_anxiety_{sessions:g}'][index] = anxiety
+        for array in out.values():
+            array.flush()
+        del out
+
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'checksum': parameters_checksum(engine),
+            'parameters': field_parameters(engine),
+            'axes': _axes_manifest(axes),
+            'therapy_sessions': therapy_sessions,
+            'files': files,
+        }
+        with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def open(cls, directory, engine=None):
+        """
+        Memory-map an existing store
+
+        With `engine`, raises ValueError unless the store was built from the
+        same field parameters.
+        """
+        for attempt in range(OPEN_ATTEMPTS):
+            try:
+                with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('format_version') != FORMAT_VERSION:
+                    raise ValueError(f"Unsupported field store format in {directory}")
+                if engine is not None and manifest['checksum'] != parameters_checksum(engine):
+                    raise ValueError(f"Field store in {directory} was built for different "
+                                     f"field parameters")
+                arrays = {key: np.load(os.path.join(directory, filename), mmap_mode='r')
+                          for key, filename in manifest['files'].items()}
+                return cls(directory, manifest, arrays)
+            except FileNotFoundError:
+                # A concurrent build may have swapped the store mid-open
+                if attempt == OPEN_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.01 * (attempt + 1))
+
+    @classmethod
+    def ensure(cls, directory, engine, bounds=None, resolution=256, therapy_sessions=(),
+               tile_shape=None):
+        """
+        Open the store in `directory`, rebuilding it if missing or stale
+
+        The store is stale unless it was built from the same field parameters
+        (including the dtype) on the same grid bounds and resolution, and
+        holds a therapy-adjusted grid for every requested session count. A
+        store that only lacks session counts is rebuilt with the ones it
+        already held as well.
+        """
+        build_options = dict(bounds=bounds, resolution=resolution, tile_shape=tile_shape)
+        wanted = {float(s) for s in therapy_sessions}
+        try:
+            store = cls.open(directory, engine)
+        except (OSError, ValueError):
+            return cls.build(directory, engine, therapy_sessions=sorted(wanted), **build_options)
+        if (store.manifest['axes'] != _axes_manifest(_grid_axes(engine, bounds, resolution))
+                or any(array.dtype != engine.dtype for array in store.arrays.values())):
+            return cls.build(directory, engine, therapy_sessions=sorted(wanted), **build_options)
+        if not wanted <= set(store.therapy_sessions):
+            sessions = sorted(wanted | set(store.therapy_sessions))
+            del store  # release its memory maps before the old files are retired
+            return cls.build(directory, engine, therapy_sessions=sessions, **build_options)
+        return store
+
+    def _key(self, name, therapy_sessions):
+        if therapy_sessions is None:
+            return name
+        key = f'therapy_{name}_{float(therapy_sessions):g}'
+        if key not in self.arrays:
+            raise KeyError(f"No {name} grid stored for {therapy_sessions} therapy sessions")
+        return key
+
+    def lookup(self, name, points, therapy_sessions=None):
+        """
+        Multilinear interpolation of field `name` at points of shape (..., dim)
+
+        Points outside the grid are clamped to its boundary.
+        """
+        grid = self.arrays[self._key(name, therapy_sessions)]
+        points = np.asarray(points, dtype=float)
+        if points.shape[-1] != self.ndim:
+            raise ValueError(f"Expected points with {self.ndim} coordinates, got {points.shape[-1]}")
+
+        shape = np.array(self.shape)
+        flat_points = points.reshape(-1, self.ndim)
+        position = np.clip((flat_points - self.low) / self.step, 0, shape - 1)
+        lower = np.minimum(position.astype(np.intp), shape - 2)
+        fraction = position - lower
+
+        # Gather the 2**dim surrounding nodes through flat (C-order) offsets
+        strides = np.r_[np.cumprod(shape[:0:-1])[::-1], 1]
+        base = lower @ strides
+        flat_grid = grid.reshape(-1)
+        result = np.zeros(len(flat_points))
+        for corner in itertools.product((0, 1), repeat=self.ndim):
+            weight = None
+            for axis, bit in enumerate(corner):
+                factor = fraction[:, axis] if bit else 1 - fraction[:, axis]
+                weight = factor if weight is None else weight * factor
+            result += weight * flat_grid[base + int(np.dot(corner, strides))]
+        return result.reshape(points.shape[:-1])
+
+    def lookup_fields(self, points, therapy_sessions=None):
+        """Interpolated counterpart of `FieldEngine.evaluate_points`"""
+        fields = {name: self.lookup(name, points) for name in ('depression', 'anxiety')}
+        if therapy_sessions is not None:
+            fields['therapy_depression'] = self.lookup('depression', points, therapy_sessions)
+            fields['therapy_anxiety'] = self.lookup('anxiety', points, therapy_sessions)
+        return fields
@@ -3,14 +3,17 @@ INSIGHT SIMULATION - VERIFIED WORKING
 Demonstrates insight as geodesic formation in concept space
 """
 
-import networkx as nx
-import numpy as np
-import matplotlib.pyplot as plt
+from concept_graph import ConceptGraph
+from instrumentation import timed
+from monte_carlo import TrialStats, run_insight_trials
+from path_engine import ShortestPathEngine
+from precision import resolve
+from results import InsightResult
 
 class InsightSimulation:
     """Demonstrates insight moments as geometric phenomena"""
     
-    def __init__(self):
+    def __init__(self, precision=None):
         self.concepts = ['Problem', 'Frustration', 'Distraction', 'Hint', 'Incubation', 'Solution']
         
         # Initial concept distances (before insight)
@@ -23,135 +26,154 @@ class InsightSimulation:
             ('Distraction', 'Incubation'): 1.5,
             ('Incubation', 'Hint'): 2.0,
         }
-    
-    def create_concept_network(self, insight_occurred=False):
-        """Create a network of concepts"""
-        G = nx.Graph()
         
-        # Add nodes
-        for concept in self.concepts:
-            G.add_node(concept)
+        # Direct connection formed by an insight
+        self.insight_edge = ('Problem', 'Solution')
+        self.insight_weight = 1.0
+        
+        # Demo trial count and seed, fixed so reruns are reproducible; every
+        # random draw derives from the precision policy's seed
+        self.precision = resolve(precision)
+        self.n_trials = 100
+        self.seed = self.precision.seed
         
-        # Add edges with distances
-        for (node1, node2), distance in self.initial_distances.items():
-            G.add_edge(node1, node2, weight=distance)
+        # Insight occurs in 30% of trials
+        self.p_insight = 0.3
+    
+    @classmethod
+    def from_graph(cls, graph, insight_edge=None, insight_weight=1.0, precision=None):
+        """
+        Insight simulation over an existing ConceptGraph
+        
+        For example the k-NN graph of a constructed manifold. The insight
+        edge defaults to the first and last concepts. Path engines keep an
+        all-pairs matrix, so this suits graphs of up to a few thousand
+        concepts; query larger graphs through the ConceptGraph itself.
+        """
+        simulation = cls(precision)
+        simulation.concepts = list(graph.names)
+        simulation.initial_distances = {(u, v): w for u, v, w in graph.iter_edges()}
+        simulation.insight_edge = tuple(insight_edge or (graph.names[0], graph.names[-1]))
+        simulation.insight_weight = insight_weight
+        return simulation
+    
+    @timed('graph_build')
+    def create_concept_network(self, insight_occurred=False, compact=False):
+        """
+        Create a network of concepts
+        
+        With `compact=True` this returns the array-backed ConceptGraph that
+        all path queries run on; otherwise a networkx copy for plotting.
+        """
+        edges = [(u, v, d) for (u, v), d in self.initial_distances.items()]
         
         # Insight creates a direct connection
         if insight_occurred:
-            G.add_edge('Problem', 'Solution', weight=1.0)  # Short path!
+            edges.append((*self.insight_edge, self.insight_weight))  # Short path!
         
-        return G
+        graph = ConceptGraph.from_edges(edges, nodes=self.concepts)
+        return graph if compact else graph.to_networkx()
+    
+    @timed('graph_build')
+    def create_path_engine(self, insight_occurred=False):
+        """Build the concept graph once with precomputed all-pairs distances"""
+        graph = self.create_concept_network(insight_occurred=insight_occurred, compact=True)
+        return ShortestPathEngine.from_graph(graph)
+    
+    def ricci_curvature(self, insight_occurred=False, **options):
+        """Forman-Ricci curvature of the concept network (see ricci_curvature.FormanCurvature)"""
+        from ricci_curvature import FormanCurvature
+        return FormanCurvature(self.create_concept_network(insight_occurred, compact=True),
+                               **options)
     
-    def simulate_insight_process(self, n_trials=100):
-        """Simulate multiple insight scenarios"""
+    def best_insight_edges(self, weight=None, top=5, sample=None, seed=None, workers=1):
+        """
+        Rank every possible new connection by how much it shortens all paths
+        
+        Returns (u, v, gain, newly_connected) tuples; `weight` defaults to
+        the insight edge's length. See edge_sweep.EdgeSweep.sweep.
+        """
+        from edge_sweep import EdgeSweep
+        weight = self.insight_weight if weight is None else weight
+        seed = self.seed if seed is None else seed
+        sweep = EdgeSweep.from_engine(self.create_path_engine())
+        return sweep.sweep(weight=weight, top=top, sample=sample, seed=seed, workers=workers)
+    
+    def insight_distances(self):
+        """Insight-edge distance (before, after) the insight connection forms"""
+        # The graph is the same in every trial: build it once and derive the
+        # post-insight distances by an incremental edge update
+        engine_before = self.create_path_engine(insight_occurred=False)
+        engine_after = engine_before.copy()
+        engine_after.add_edge(*self.insight_edge, self.insight_weight)
+        return engine_before.distance(*self.insight_edge), engine_after.distance(*self.insight_edge)
+    
+    def insight_trials(self, n_trials=100, seed=None, workers=1):
+        """
+        Run insight trials and return an InsightResult
+        
+        Trial outcomes come from a seeded numpy Generator (`seed` defaults
+        to the simulation's) and can be split across `workers` processes
+        without changing the results for a seed.
+        """
+        seed = self.seed if seed is None else seed
+        distance_before, distance_after = self.insight_distances()
+        
+        if distance_before < float('inf') and distance_after < float('inf'):
+            stats = run_insight_trials(n_trials, distance_before, distance_after,
+                                       p_insight=self.p_insight, seed=seed, workers=workers)
+        else:
+            stats = TrialStats(n_trials=n_trials)
+        return InsightResult(stats, distance_before, distance_after, seed)
+    
+    def export_trials(self, path, n_trials=None, seed=None, **options):
+        """Stream every trial outcome to an NPZ/Arrow/Parquet file (see results.export_trials)"""
+        from results import export_trials
+        return export_trials(self, path, n_trials, seed, **options)
+    
+    def _report_trials(self, result):
         print("💡 CDG Insight Simulation")
         print("=" * 40)
         
-        insight_count = 0
-        path_lengths_before = []
-        path_lengths_after = []
-        
-        for i in range(n_trials):
-            # Randomly determine if insight occurs (30% chance)
-            insight_occurred = np.random.random() < 0.3
-            
-            # Network before potential insight
-            G_before = self.create_concept_network(insight_occurred=False)
-            
-            try:
-                path_before = nx.shortest_path(G_before, 'Problem', 'Solution', weight='weight')
-                distance_before = nx.shortest_path_length(G_before, 'Problem', 'Solution', weight='weight')
-            except nx.NetworkXNoPath:
-                distance_before = float('inf')
-            
-            # Network after potential insight
-            G_after = self.create_concept_network(insight_occurred=insight_occurred)
-            
-            try:
-                path_after = nx.shortest_path(G_after, 'Problem', 'Solution', weight='weight')
-                distance_after = nx.shortest_path_length(G_after, 'Problem', 'Solution', weight='weight')
-            except nx.NetworkXNoPath:
-                distance_after = float('inf')
-            
-            if insight_occurred and distance_before < float('inf') and distance_after < float('inf'):
-                insight_count += 1
-                path_lengths_before.append(distance_before)
-                path_lengths_after.append(distance_after)
-        
-        if insight_count > 0:
-            avg_before = np.mean(path_lengths_before)
-            avg_after = np.mean(path_lengths_after)
-            avg_gain = avg_before - avg_after
-            
-            print(f"Results from {n_trials} simulations:")
-            print(f"  Insight occurrences: {insight_count} ({insight_count/n_trials*100:.1f}%)")
-            print(f"  Average path before insight: {avg_before:.2f}")
-            print(f"  Average path after insight: {avg_after:.2f}")
-            print(f"  Average cognitive gain: {avg_gain:.2f} units")
-            
-            return insight_count, avg_gain
+        if result.insight_count > 0:
+            print(f"Results from {result.n_trials} simulations:")
+            print(f"  Insight occurrences: {result.insight_count} ({result.insight_rate*100:.1f}%)")
+            print(f"  Average path before insight: {result.mean_before:.2f}")
+            print(f"  Average path after insight: {result.mean_after:.2f}")
+            print(f"  Average cognitive gain: {result.mean_gain:.2f} units")
         else:
             print("No insight occurrences in simulation")
-            return 0, 0
+    
+    def simulate_insight_process(self, n_trials=100, seed=None, workers=1):
+        """
+        Simulate multiple insight scenarios
+        
+        Prints the trial statistics of `insight_trials` and returns
+        (insight_count, average_gain).
+        """
+        result = self.insight_trials(n_trials, seed, workers)
+        self._report_trials(result)
+        if result.insight_count > 0:
+            return result.insight_count, result.mean_gain
+        return 0, 0
     
     def visualize_insight_network(self):
-        """Visualize the concept network before and after insight"""
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
-        
-        # Before insight
-        G_before = self.create_concept_network(insight_occurred=False)
-        pos = nx.spring_layout(G_before, seed=42)
-        
-        # Draw network before insight
-        nx.draw_networkx_nodes(G_before, pos, node_color='lightblue', 
-                              node_size=1500, ax=ax1)
-        nx.draw_networkx_labels(G_before, pos, ax=ax1)
-        
-        edges_before = G_before.edges(data=True)
-        nx.draw_networkx_edges(G_before, pos, edgelist=edges_before, ax=ax1)
-        
-        edge_labels_before = {(u, v): f"{d['weight']:.1f}" for u, v, d in edges_before}
-        nx.draw_networkx_edge_labels(G_before, pos, edge_labels_before, ax=ax1)
-        
-        ax1.set_title('Before Insight: Indirect Path\n(High Cognitive Load)', fontsize=12)
-        ax1.axis('off')
-        
-        # After insight
-        G_after = self.create_concept_network(insight_occurred=True)
-        
-        # Draw network after insight
-        nx.draw_networkx_nodes(G_after, pos, node_color='lightgreen', 
-                              node_size=1500, ax=ax2)
-        nx.draw_networkx_labels(G_after, pos, ax=ax2)
-        
-        edges_after = G_after.edges(data=True)
-        regular_edges = [(u, v) for u, v, d in edges_after if (u, v) != ('Problem', 'Solution')]
-        insight_edge = [('Problem', 'Solution')]
-        
-        nx.draw_networkx_edges(G_after, pos, edgelist=regular_edges, ax=ax2)
-        nx.draw_networkx_edges(G_after, pos, edgelist=insight_edge, 
-                              edge_color='red', width=3, style='dashed', ax=ax2)
-        
-        edge_labels_after = {(u, v): f"{d['weight']:.1f}" for u, v, d in edges_after}
-        nx.draw_networkx_edge_labels(G_after, pos, edge_labels_after, ax=ax2)
-        
-        ax2.set_title('After Insight: Direct Geodesic\n("Aha!" Moment)', fontsize=12)
-        ax2.axis('off')
-        
-        plt.tight_layout()
-        plt.savefig('insight_demo.png', dpi=150, bbox_inches='tight')
-        plt.show()
+        """Visualize the concept network before and after insight; returns the PNG path"""
+        from plotting import plot_insight_network
+        return plot_insight_network(self)
     
     def run_demo(self):
-        """Run the complete insight demonstration"""
+        """Run the complete insight demonstration and return its InsightResult"""
         # Simulate insight process
-        insight_count, avg_gain = self.simulate_insight_process(n_trials=100)
+        result = self.insight_trials(n_trials=self.n_trials, seed=self.seed)
+        self._report_trials(result)
         
         print(f"\nCDG Explanation of Insight:")
         print(f"  ✓ Insight forms new geodesic between concepts")
         print(f"  ✓ Creates optimal cognitive pathway") 
-        print(f"  ✓ Reduces mental 'distance' by {avg_gain:.1f} units on average")
+        print(f"  ✓ Reduces mental 'distance' by {result.mean_gain:.1f} units on average")
         print(f"  ✓ Explains sudden 'Aha!' moment phenomenology")
+        return result
 
 if __name__ == "__main__":
     demo = InsightSimulation()
@@ -0,0 +1,151 @@
+"""
+INSTRUMENTATION
+Opt-in timing spans, counters and profiler dumps for the simulation hot paths
+"""
+
+import contextlib
+import cProfile
+import functools
+import json
+import threading
+import time
+
+# Checked by every hook; while False a span or counter costs one function
+# call and one global lookup
+_enabled = False
+_state = threading.local()
+_lock = threading.Lock()
+_spans = {}
+_counters = {}
+
+# Shared do-nothing context manager returned by `span` while disabled
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Forget all recorded spans and counters"""
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+class _Span:
+    __slots__ = ('name', 'start', 'child_time')
+
+    def __init__(self, name):
+        self.name = name
+        self.child_time = 0.0
+
+    def __enter__(self):
+        stack = getattr(_state, 'stack', None)
+        if stack is None:
+            stack = _state.stack = []
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        stack = _state.stack
+        path = ';'.join(span.name for span in stack)
+        stack.pop()
+        if stack:
+            stack[-1].child_time += elapsed
+        with _lock:
+            record = _spans.get(path)
+            if record is None:
+                record = _spans[path] = {'calls': 0, 'total_s': 0.0, 'self_s': 0.0,
+                                         'min_s': elapsed, 'max_s': elapsed}
+            record['calls'] += 1
+            record['total_s'] += elapsed
+            record['self_s'] += elapsed - self.child_time
+            record['min_s'] = min(record['min_s'], elapsed)
+            record['max_s'] = max(record['max_s'], elapsed)
+        return False
+
+
+def span(name):
+    """
+    Context manager timing one phase, e.g. `with span('field_evaluation'):`
+
+    Nested spans are recorded under their full path ('run_demo;path_search')
+    with call counts, total, self, min and max seconds.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def count(name, amount=1):
+    """Add `amount` to counter `name` (trials, field evaluations, path queries, ...)"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def timed(name):
+    """Decorator wrapping every call of a function in `span(name)`"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    """Copy of everything recorded so far: {'spans': {...}, 'counters': {...}}"""
+    with _lock:
+        return {'spans': {path: dict(record) for path, record in _spans.items()},
+                'counters': dict(_counters)}
+
+
+def export_json(path):
+    data = snapshot()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    return data
+
+
+def folded_stacks():
+    """Span self-times in folded-stack format ('a;b;c <microseconds>' per line)"""
+    return [f"{path} {int(round(record['self_s'] * 1e6))}"
+            for path, record in sorted(snapshot()['spans'].items())]
+
+
+def export_folded(path):
+    """Write folded stacks for flamegraph.pl, speedscope or inferno"""
+    lines = folded_stacks()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + ('\n' if lines else ''))
+    return lines
+
+
+@contextlib.contextmanager
+def profile(path):
+    """Run the block under cProfile and dump pstats-compatible stats to `path`"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
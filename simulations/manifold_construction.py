@@ -0,0 +1,291 @@
+"""
+MANIFOLD CONSTRUCTION
+Concept coordinates and a concept graph built from (large) similarity matrices
+"""
+
+import warnings
+
+import numpy as np
+
+from concept_graph import ConceptGraph, ConceptInterner
+from instrumentation import span, timed
+from precision import rng
+
+# scipy is imported on first use, like concept_graph
+
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+
+
+def similarity_to_distance(similarity):
+    """Chord distance sqrt(2 (1 - s)) for cosine-like similarities in [-1, 1]"""
+    return np.sqrt(np.maximum(2.0 * (1.0 - np.asarray(similarity, dtype=float)), 0.0))
+
+
+def _rows_per_block(n, itemsize, memory_budget):
+    # A block needs its similarity rows plus argpartition's int64 indices
+    return max(1, int(memory_budget // max(1, n * (itemsize + 8))))
+
+
+def _dense_knn(similarity, k, memory_budget):
+    n = similarity.shape[0]
+    block = _rows_per_block(n, max(similarity.dtype.itemsize, 4), memory_budget)
+    rows, cols, values = [], [], []
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        # Only this row block is ever read from a memory-mapped input
+        chunk = np.array(similarity[start:stop], dtype=np.float32)
+        local = np.arange(stop - start)
+        chunk[local, local + start] = -np.inf
+        top = np.argpartition(chunk, -k, axis=1)[:, -k:]
+        rows.append(np.repeat(np.arange(start, stop), k))
+        cols.append(top.ravel())
+        values.append(np.take_along_axis(chunk, top, axis=1).ravel())
+        del chunk, top
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+
+def _sparse_knn(similarity, k):
+    matrix = similarity.tocoo()
+    off_diagonal = matrix.row != matrix.col
+    rows, cols = matrix.row[off_diagonal], matrix.col[off_diagonal]
+    values = matrix.data[off_diagonal].astype(np.float32)
+    # Rank each row's entries by similarity and keep the first k
+    order = np.lexsort((-values, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+    starts = np.searchsorted(rows, np.arange(similarity.shape[0]))
+    rank = np.arange(len(rows)) - starts[rows]
+    keep = rank < k
+    return rows[keep].astype(np.int64), cols[keep].astype(np.int64), values[keep]
+
+
+@timed('graph_build')
+def knn_sparsify(similarity, k=10, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    Symmetric k-nearest-neighbour similarity graph as a scipy CSR matrix
+
+    `similarity` is a dense array, an `np.memmap` or any scipy sparse
+    matrix. Dense input is read in row blocks sized to `memory_budget`
+    bytes, so a memory-mapped n x n matrix never has to fit in RAM. Each
+    concept keeps its k most similar other concepts; an edge is kept if
+    either endpoint chose it.
+    """
+    from scipy import sparse
+
+    n = similarity.shape[0]
+    if similarity.shape != (n, n):
+        raise ValueError(f"Similarity matrix must be square, got {similarity.shape}")
+    k = min(k, n - 1)
+    if k < 1:
+        # A lone concept (or k=0) has no neighbours to keep
+        return sparse.csr_matrix((n, n), dtype=np.float32)
+    if sparse.issparse(similarity):
+        rows, cols, values = _sparse_knn(similarity, k)
+    else:
+        rows, cols, values = _dense_knn(similarity, k, memory_budget)
+    finite = np.isfinite(values)
+    rows, cols, values = rows[finite], cols[finite], values[finite]
+    # Symmetrize on the union of both sparsity patterns. An element-wise
+    # maximum with the transpose would let the implicit zero of a one-sided
+    # edge win over a stored similarity <= 0 and drop the edge; a pair
+    # chosen from both ends keeps the larger similarity.
+    keys = np.concatenate([rows * n + cols, cols * n + rows])
+    values = np.concatenate([values, values])
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    starts = np.flatnonzero(np.diff(keys, prepend=-1))
+    values, keys = np.maximum.reduceat(values, starts), keys[starts]
+    indptr = np.searchsorted(keys // n, np.arange(n + 1))
+    return sparse.csr_matrix((values, keys % n, indptr), shape=(n, n))
+
+
+def randomized_eigsh(operator, n_components, oversample=10, power_iterations=200, seed=0,
+                     tol=1e-6, max_blocks=8):
+    """
+    Algebraically largest eigenpairs of a symmetric operator
+
+    Randomized block Krylov: a random (n, n_components + oversample) block
+    is expanded into the Krylov space [AΩ, A²Ω, ...], and the Ritz pairs
+    of that space are checked against their residuals |A v - λ v| after
+    every product. Once `max_blocks` blocks are held, the space restarts
+    from its leading Ritz vectors, so memory stays at
+    O(n (n_components + oversample) max_blocks). Stops when every residual
+    is within `tol` times the largest |λ|, or after `power_iterations`
+    products with a RuntimeWarning. The operator is only applied to thin
+    blocks, so a sparse operator costs O(nnz) per product. Returns
+    (eigenvalues, eigenvectors), largest first.
+    """
+    n = operator.shape[0]
+    size = min(n, n_components + oversample)
+    width = min(n, size * max_blocks)
+    # Column-major, so leading column blocks are contiguous for BLAS
+    krylov = np.empty((n, width), order='F')
+    image = np.empty((n, width), order='F')
+    # Rayleigh quotient K' A K and Gram matrix (AK)' AK, grown block by block
+    projected = np.empty((width, width))
+    gram = np.empty((width, width))
+    start = rng('randomized_eigsh', seed).standard_normal((n, size))
+    products, used = 0, 0
+    while True:
+        block = np.linalg.qr(start)[0]
+        used = 0
+        while True:
+            stop = used + block.shape[1]
+            krylov[:, used:stop] = block
+            image[:, used:stop] = operator @ block
+            products += 1
+            projected[:stop, used:stop] = krylov[:, :stop].T @ image[:, used:stop]
+            projected[used:stop, :used] = projected[:used, used:stop].T
+            gram[:stop, used:stop] = image[:, :stop].T @ image[:, used:stop]
+            gram[used:stop, :used] = gram[:used, used:stop].T
+            used = stop
+
+            eigenvalues, ritz = np.linalg.eigh((projected[:used, :used]
+                                                + projected[:used, :used].T) / 2)
+            order = np.argsort(eigenvalues)[::-1]
+            eigenvalues, ritz = eigenvalues[order], ritz[:, order]
+            leading = ritz[:, :n_components]
+            # |A K y - θ K y|^2 = |A K y|^2 - θ^2 for orthonormal K and unit y
+            squared = (np.einsum('ij,ij->j', leading, gram[:used, :used] @ leading)
+                       - eigenvalues[:n_components]**2)
+            residual = np.sqrt(np.maximum(squared, 0.0)).max()
+            scale = max(np.abs(eigenvalues[:n_components]).max(), np.finfo(float).tiny)
+            converged = residual <= tol * scale
+            # A space as large as the operator holds the exact eigenpairs
+            exhausted = used + size > n
+            if converged or exhausted or products >= power_iterations or used + size > width:
+                break
+            # Two Gram-Schmidt passes keep the growing basis orthonormal
+            basis = krylov[:, :used]
+            extension = image[:, used - size:used] - basis @ (basis.T @ image[:, used - size:used])
+            extension -= basis @ (basis.T @ extension)
+            block = np.linalg.qr(extension)[0]
+        if converged or exhausted or products >= power_iterations:
+            break
+        start = krylov[:, :used] @ ritz[:, :size]
+    if not (converged or exhausted):
+        warnings.warn(f"randomized_eigsh stopped after {products} products with residual "
+                      f"{residual / scale:.2e} (tol {tol:g}); raise power_iterations "
+                      f"or use the Lanczos solver", RuntimeWarning, stacklevel=2)
+    return eigenvalues[:n_components], krylov[:, :used] @ leading
+
+
+# Below this many concepts the embedding uses a dense eigensolver
+DENSE_EIGEN_MAX = 1000
+
+
+def _leading_eigenpairs(normalized, n_components, method, oversample, power_iterations, seed):
+    from scipy.sparse.linalg import eigsh
+
+    n = normalized.shape[0]
+    if n <= DENSE_EIGEN_MAX:
+        eigenvalues, vectors = np.linalg.eigh(normalized.toarray())
+        order = np.argsort(eigenvalues)[::-1][:n_components]
+        return eigenvalues[order], vectors[:, order]
+    if method == 'randomized':
+        return randomized_eigsh(normalized, n_components, oversample, power_iterations, seed)
+    if method != 'lanczos':
+        raise ValueError(f"Unknown eigensolver {method!r}; use 'lanczos' or 'randomized'")
+    start = rng('lanczos_start', seed).standard_normal(n)
+    eigenvalues, vectors = eigsh(normalized, k=n_components, which='LA', v0=start)
+    order = np.argsort(eigenvalues)[::-1]
+    return eigenvalues[order], vectors[:, order]
+
+
+@timed('graph_build')
+def spectral_embedding(affinity, dim=2, method='lanczos', oversample=10, power_iterations=200,
+                       seed=0):
+    """
+    Laplacian-eigenmap coordinates of a sparse affinity matrix
+
+    Takes the leading eigenvectors of D^-1/2 W D^-1/2, dropping the
+    constant mode. Only `dim + 1` eigenpairs are computed: by truncated
+    Lanczos (`method='lanczos'`, the default) or by randomized block
+    Krylov (see randomized_eigsh), which warns if `power_iterations`
+    operator products do not bring its residuals within tolerance.
+    Returns (coordinates, eigenvalues).
+    """
+    from scipy import sparse
+
+    affinity = affinity.maximum(0).tocsr()
+    degree = np.asarray(affinity.sum(axis=1)).ravel()
+    # Isolated concepts have no neighbours to be placed near
+    scale = 1.0 / np.sqrt(np.where(degree > 0, degree, 1.0))
+    normalized = (sparse.diags(scale) @ affinity @ sparse.diags(scale)).tocsr()
+    eigenvalues, vectors = _leading_eigenpairs(normalized, dim + 1, method, oversample,
+                                               power_iterations, seed)
+    coordinates = vectors[:, 1:] * scale[:, None]
+    # Eigenvector signs are arbitrary; make each axis's largest entry positive
+    peaks = coordinates[np.argmax(np.abs(coordinates), axis=0), np.arange(dim)]
+    return coordinates * np.where(peaks < 0, -1.0, 1.0), eigenvalues[1:]
+
+
+class ConstructedManifold:
+    """
+    Result of `construct_manifold_from_similarity`
+
+    `coordinates` is an (n, dim) array scaled into [-1, 1] like the
+    hand-written emotion spaces, `affinity` the sparse k-NN similarity
+    graph and `graph` the same graph as a ConceptGraph weighted by chord
+    distance, ready for path queries and InsightSimulation.
+    """
+
+    def __init__(self, names, coordinates, affinity, graph, eigenvalues):
+        self.names = names
+        self.coordinates = coordinates
+        self.affinity = affinity
+        self.graph = graph
+        self.eigenvalues = eigenvalues
+
+    @property
+    def dim(self):
+        return self.coordinates.shape[1]
+
+    @property
+    def concepts(self):
+        """Mapping of concept name to coordinate tuple"""
+        return dict(zip(self.names, map(tuple, self.coordinates.tolist())))
+
+    def concept_space(self, **options):
+        """ConceptSpace over the embedded coordinates"""
+        from concept_space import ConceptSpace
+        return ConceptSpace(zip(self.names, self.coordinates), dim=self.dim, **options)
+
+    def insight_simulation(self, insight_edge=None, insight_weight=1.0):
+        """InsightSimulation running on the k-NN concept graph"""
+        from insight_simulation import InsightSimulation
+        return InsightSimulation.from_graph(self.graph, insight_edge, insight_weight)
+
+
+def construct_manifold_from_similarity(similarity, names=None, dim=2, k=10,
+                                       memory_budget=DEFAULT_MEMORY_BUDGET, method='lanczos',
+                                       oversample=10, power_iterations=200, seed=0):
+    """
+    Build a meaning space from an n x n concept similarity matrix
+
+    The matrix (dense, memory-mapped or sparse) is reduced to a symmetric
+    k-NN graph in row blocks within `memory_budget`, then embedded in `dim`
+    dimensions with a truncated (or randomized) spectral embedding that
+    only touches the sparse graph, so memory is O(n k) after
+    sparsification. Distances follow the chord formula sqrt(2 (1 - s)).
+    Returns a ConstructedManifold.
+    """
+    n = similarity.shape[0]
+    names = list(names) if names is not None else [f'concept_{i}' for i in range(n)]
+    if len(names) != n:
+        raise ValueError(f"Got {len(names)} names for {n} concepts")
+
+    with span('manifold_construction'):
+        affinity = knn_sparsify(similarity, k=k, memory_budget=memory_budget)
+        coordinates, eigenvalues = spectral_embedding(affinity, dim, method, oversample,
+                                                      power_iterations, seed)
+        extent = np.abs(coordinates).max()
+        if extent > 0:
+            coordinates = coordinates / extent
+
+        upper = affinity.tocoo()
+        keep = upper.row < upper.col
+        # Floor the length so identical concepts stay adjacent in the CSR graph
+        lengths = np.maximum(similarity_to_distance(upper.data[keep]), 1e-6)
+        graph = ConceptGraph.from_id_edges(ConceptInterner(names), upper.row[keep],
+                                           upper.col[keep], lengths)
+    return ConstructedManifold(names, coordinates, affinity, graph, eigenvalues)
@@ -4,14 +4,19 @@ Simple, testable implementation of CDG principles
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
 
-class MinimalCDG:
+from concept_space import ConceptSpace
+from geodesics import batch_geodesic_paths
+from instrumentation import count, timed
+from precision import resolve
+from results import EmotionSpaceResult
+
+class MinimalCDG(ConceptSpace):
     """Simple emotion space implementation that ACTUALLY WORKS"""
     
-    def __init__(self):
+    def __init__(self, cache_size=4096, precision=None):
         # Simple 2D emotion space: valence (x) and arousal (y)
-        self.concepts = {
+        concepts = {
             'joy': (0.8, 0.7),
             'sadness': (-0.8, -0.6), 
             'anger': (-0.6, 0.9),
@@ -19,8 +24,14 @@ class MinimalCDG:
             'calm': (0.6, -0.5)
         }
         
-        # Consciousness threshold (simplified)
-        self.consciousness_threshold = 2.0
+        # float32 ('fast') or float64 ('reference') coordinates and paths
+        self.precision = resolve(precision)
+        
+        # 2D specialization of the concept space with a simplified
+        # consciousness threshold
+        super().__init__(concepts, dim=2, curvature_weights=(0.5, 0.3),
+                         consciousness_threshold=2.0, dtype=self.precision.dtype,
+                         cache_size=cache_size)
     
     def compute_simple_curvature(self, x, y):
         """
@@ -28,106 +39,51 @@ class MinimalCDG:
         This is a DEMONSTRATION - not mathematically rigorous
         """
         # Simplified curvature: higher near emotional extremes
-        curvature = 1.0 + 0.5 * abs(x) + 0.3 * abs(y)
-        return curvature
-    
-    def is_conscious_region(self, concept):
-        """Check if a concept is in a conscious region"""
-        x, y = self.concepts[concept]
-        curvature = self.compute_simple_curvature(x, y)
-        return curvature > self.consciousness_threshold
+        return self.curvature_field(x, y)
     
+    @timed('path_search')
     def compute_geodesic_path(self, start_concept, end_concept, points=50):
         """
         Compute a simple curved path between concepts
         This demonstrates the geometric thinking principle
         """
-        start_x, start_y = self.concepts[start_concept]
-        end_x, end_y = self.concepts[end_concept]
-        
-        # Create a curved path (simplified)
-        t = np.linspace(0, 1, points)
-        
-        # Straight line (Euclidean)
-        straight_x = start_x + t * (end_x - start_x)
-        straight_y = start_y + t * (end_y - start_y)
+        straight, curved = batch_geodesic_paths([self.concepts[start_concept]],
+                                                [self.concepts[end_concept]], points,
+                                                self.dtype)
+        count('path_queries')
         
-        # Curved path (geodesic-like)
-        # Add curvature based on emotional distance
-        emotional_curve = 0.3 * np.sin(np.pi * t)  # Simple curve
-        
-        curved_x = straight_x + emotional_curve * (start_y - end_y)
-        curved_y = straight_y + emotional_curve * (end_x - start_x)
+        straight_x, straight_y = straight[0, :, 0], straight[0, :, 1]
+        curved_x, curved_y = curved[0, :, 0], curved[0, :, 1]
         
         return straight_x, straight_y, curved_x, curved_y
     
+    def animate_geodesic(self, start_concept, end_concept, path='geodesic.gif', points=100, fps=30):
+        """Export an animation of a thought travelling the geodesic; returns (frames, fps)"""
+        from animation_export import TrajectoryAnimation, export_animation
+        straight_x, straight_y, curved_x, curved_y = self.compute_geodesic_path(
+            start_concept, end_concept, points=points)
+        animation = TrajectoryAnimation(self.concepts, np.column_stack([straight_x, straight_y]),
+                                        np.column_stack([curved_x, curved_y]),
+                                        title=f'Thought Trajectory: {start_concept} → {end_concept}')
+        return export_animation(animation, path, fps=fps)
+    
     def visualize_emotion_space(self):
-        """Create a visualization of the emotion space"""
-        plt.figure(figsize=(12, 5))
-        
-        # Plot 1: Basic emotion space
-        plt.subplot(1, 2, 1)
-        
-        # Plot concepts
-        for concept, (x, y) in self.concepts.items():
-            conscious = self.is_conscious_region(concept)
-            color = 'green' if conscious else 'red'
-            plt.scatter(x, y, color=color, s=100, label=concept)
-            plt.text(x + 0.05, y + 0.05, concept, fontsize=9)
-        
-        # Plot consciousness threshold boundary
-        theta = np.linspace(0, 2*np.pi, 100)
-        threshold_x = np.cos(theta) * 0.8  # Approximate boundary
-        threshold_y = np.sin(theta) * 0.8
-        plt.plot(threshold_x, threshold_y, 'k--', alpha=0.5, label='Consciousness threshold')
-        
-        plt.xlabel('Valence (Negative to Positive)')
-        plt.ylabel('Arousal (Low to High)')
-        plt.title('CDG Emotion Space\nGreen = Conscious, Red = Sub-conscious')
-        plt.grid(True, alpha=0.3)
-        plt.axis([-1, 1, -1, 1])
-        plt.legend()
-        
-        # Plot 2: Example thought trajectory
-        plt.subplot(1, 2, 2)
-        
-        # Plot concepts again
-        for concept, (x, y) in self.concepts.items():
-            plt.scatter(x, y, s=80, alpha=0.7)
-            plt.text(x + 0.05, y + 0.05, concept, fontsize=9)
-        
-        # Show thought trajectory from sadness to joy
-        straight_x, straight_y, curved_x, curved_y = self.compute_geodesic_path('sadness', 'joy')
-        
-        plt.plot(straight_x, straight_y, 'r--', alpha=0.7, label='Straight path (Euclidean)')
-        plt.plot(curved_x, curved_y, 'b-', linewidth=2, label='Curved path (Geodesic)')
-        
-        plt.plot(curved_x[0], curved_y[0], 'go', markersize=8, label='Start (sadness)')
-        plt.plot(curved_x[-1], curved_y[-1], 'go', markersize=8, label='End (joy)')
-        
-        plt.xlabel('Valence (Negative to Positive)')
-        plt.ylabel('Arousal (Low to High)')
-        plt.title('Thought Trajectories in Emotion Space')
-        plt.grid(True, alpha=0.3)
-        plt.axis([-1, 1, -1, 1])
-        plt.legend()
-        
-        plt.tight_layout()
-        plt.savefig('emotion_space_demo.png', dpi=150, bbox_inches='tight')
-        plt.show()
+        """Create a visualization of the emotion space; returns the PNG path"""
+        from plotting import plot_emotion_space
+        return plot_emotion_space(self)
     
     def run_demo(self):
-        """Run a complete demonstration"""
+        """Run a complete demonstration and return its EmotionSpaceResult"""
         print("🧠 CDG Emotion Space Demo")
         print("=" * 40)
         
         # Show consciousness assessment
         print("Consciousness Assessment:")
+        curvatures, conscious_concepts = {}, {}
         for concept in self.concepts:
-            conscious = self.is_conscious_region(concept)
+            curvature, conscious = self.concept_curvature(concept)
+            curvatures[concept], conscious_concepts[concept] = curvature, conscious
             status = "CONSCIOUS" if conscious else "sub-conscious"
-            x, y = self.concepts[concept]
-            curvature = self.compute_simple_curvature(x, y)
             print(f"  {concept:8}: {status} (curvature: {curvature:.2f})")
         
         # Show geometric properties
@@ -146,6 +102,8 @@ class MinimalCDG:
         print(f"  Straight path length: {straight_length:.3f}")
         print(f"  Curved path length: {curved_length:.3f}")
         print(f"  CDG prediction: Thoughts follow curved geodesics ✓")
+        return EmotionSpaceResult(curvatures, conscious_concepts, self.consciousness_threshold,
+                                  ('sadness', 'joy'), straight_length, curved_length)
 
 # Run the demo
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+"""
+SHORTEST PATH ENGINE
+All-pairs concept distances computed once and updated incrementally
+"""
+
+import numpy as np
+
+from concept_graph import ConceptGraph
+from instrumentation import count
+
+
+class ShortestPathEngine:
+    """
+    Undirected weighted concept graph with a maintained all-pairs distance matrix
+
+    Queries run on the CSR arrays of a ConceptGraph owned by the engine
+    (float64 weights, so shortcut weights are kept exactly). Setting an
+    edge to a shorter weight (e.g. an insight shortcut) is an O(n^2)
+    vectorized relaxation through the new edge. Removing an edge or making
+    it longer only reruns Dijkstra from the sources whose shortest paths
+    actually used it.
+    """
+
+    def __init__(self, nodes, weighted_edges=()):
+        graph = ConceptGraph.from_edges(weighted_edges, nodes=nodes, dtype=np.float64)
+        self._attach(graph)
+
+    def _attach(self, graph, distances=None):
+        from scipy.sparse.csgraph import shortest_path
+
+        self.graph = graph
+        self.nodes = graph.names
+        self.index = graph.interner.ids
+        self.distances = (shortest_path(graph.to_csr(), method='D', directed=False)
+                          if distances is None else distances)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Engine over a float64 copy of a ConceptGraph's arrays"""
+        engine = cls.__new__(cls)
+        engine._attach(graph.astype(np.float64))
+        return engine
+
+    def copy(self):
+        """Independent engine sharing no mutable state with this one"""
+        clone = ShortestPathEngine.__new__(ShortestPathEngine)
+        clone._attach(self.graph.astype(np.float64), self.distances.copy())
+        return clone
+
+    def _slot(self, i, j):
+        """Position of entry (i, j) in the CSR arrays, or where it would be inserted"""
+        lo, hi = self.graph.indptr[i], self.graph.indptr[i + 1]
+        position = lo + int(np.searchsorted(self.graph.indices[lo:hi], j))
+        return position, position < hi and self.graph.indices[position] == j
+
+    def _set_weight(self, i, j, weight):
+        graph = self.graph
+        for a, b in ((i, j), (j, i)):
+            position, found = self._slot(a, b)
+            if found:
+                graph.weights[position] = weight
+            else:
+                graph.indices = np.insert(graph.indices, position, b)
+                graph.weights = np.insert(graph.weights, position, weight)
+                graph.indptr[a + 1:] += 1
+
+    def _delete(self, i, j):
+        graph = self.graph
+        for a, b in ((i, j), (j, i)):
+            position, _ = self._slot(a, b)
+            graph.indices = np.delete(graph.indices, position)
+            graph.weights = np.delete(graph.weights, position)
+            graph.indptr[a + 1:] -= 1
+
+    def _weight(self, i, j):
+        position, found = self._slot(i, j)
+        return float(self.graph.weights[position]) if found else None
+
+    def edge_weight(self, u, v):
+        """Weight of edge (u, v), or None when the edge does not exist"""
+        return self._weight(self.index[u], self.index[v])
+
+    def distance(self, u, v):
+        """Shortest path length between u and v (inf when disconnected)"""
+        count('path_queries')
+        return self.distances[self.index[u], self.index[v]]
+
+    def path(self, u, v):
+        """
+        One shortest path from u to v as a list of nodes
+
+        Reconstructed from the distance matrix by following neighbors that
+        stay on a shortest path, so no predecessor table needs maintaining.
+        """
+        count('path_queries')
+        source, target = self.index[u], self.index[v]
+        to_target = self.distances[:, target]
+        if not np.isfinite(to_target[source]):
+            raise ValueError(f"No path between {u!r} and {v!r}")
+        graph = self.graph
+        path = [source]
+        current = source
+        while current != target:
+            lo, hi = graph.indptr[current], graph.indptr[current + 1]
+            neighbors = graph.indices[lo:hi]
+            current = int(neighbors[np.argmin(graph.weights[lo:hi] + to_target[neighbors])])
+            path.append(current)
+        return [self.nodes[i] for i in path]
+
+    def _sources_using_edge(self, i, j, weight):
+        """Rows of the distance matrix whose shortest paths may use edge (i, j)"""
+        D = self.distances
+        via_ij = D[:, i, None] + weight + D[None, j, :]
+        via_ji = D[:, j, None] + weight + D[None, i, :]
+        finite = np.isfinite(D)
+        uses = finite & (np.isclose(via_ij, D) | np.isclose(via_ji, D))
+        return np.flatnonzero(uses.any(axis=1))
+
+    def _recompute_sources(self, sources):
+        if sources.size == 0:
+            return
+        from scipy.sparse.csgraph import dijkstra
+
+        rows = dijkstra(self.graph.to_csr(), directed=False, indices=sources)
+        self.distances[sources, :] = rows
+        self.distances[:, sources] = rows.T
+
+    def add_edge(self, u, v, weight):
+        """Add edge (u, v) or change its weight, updating distances incrementally"""
+        i, j = self.index[u], self.index[v]
+        weight = float(weight)
+        old = self._weight(i, j)
+        if old is not None and weight > old:
+            affected = self._sources_using_edge(i, j, old)
+            self._set_weight(i, j, weight)
+            self._recompute_sources(affected)
+            return
+
+        self._set_weight(i, j, weight)
+        D = self.distances
+        via_ij = D[:, i, None] + weight + D[None, j, :]
+        via_ji = D[:, j, None] + weight + D[None, i, :]
+        np.minimum(D, np.minimum(via_ij, via_ji), out=D)
+
+    def remove_edge(self, u, v):
+        """Remove edge (u, v), recomputing only the affected sources"""
+        i, j = self.index[u], self.index[v]
+        old = self._weight(i, j)
+        if old is None:
+            raise KeyError(f"No edge between {u!r} and {v!r}")
+        self._delete(i, j)
+        self._recompute_sources(self._sources_using_edge(i, j, old))
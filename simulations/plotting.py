@@ -0,0 +1,150 @@
+"""
+CDG PLOTTING
+Figure builders for the demos on Agg figures, kept apart so the numeric core never imports matplotlib
+"""
+
+import networkx as nx
+import numpy as np
+from matplotlib.figure import Figure
+
+from batch_render import EmotionSpaceRenderer
+from instrumentation import timed
+
+# Built on first use and reused by every later emotion-space figure
+_emotion_space_renderer = None
+
+
+@timed('rendering')
+def plot_emotion_space(cdg, path='emotion_space_demo.png'):
+    """Create a visualization of the emotion space and return the PNG path"""
+    global _emotion_space_renderer
+    if _emotion_space_renderer is None:
+        _emotion_space_renderer = EmotionSpaceRenderer(figsize=(12, 5), dpi=150, panels=2)
+
+    names = list(cdg.concepts)
+    points = np.array([cdg.concepts[name] for name in names], dtype=float).reshape(-1, 2)
+    conscious = [cdg.is_conscious_region(name) for name in names]
+
+    # Show thought trajectory from sadness to joy
+    straight_x, straight_y, curved_x, curved_y = cdg.compute_geodesic_path('sadness', 'joy')
+
+    frame = [
+        {'points': points, 'conscious': conscious, 'labels': names,
+         'title': 'CDG Emotion Space\nGreen = Conscious, Red = Sub-conscious'},
+        {'points': points, 'labels': names,
+         'path': np.column_stack([curved_x, curved_y]),
+         'reference': np.column_stack([straight_x, straight_y]),
+         'title': 'Thought Trajectories in Emotion Space\n'
+                  'Blue = Geodesic (sadness → joy), Dashed = Straight'},
+    ]
+    return _emotion_space_renderer.save(frame, path)
+
+
+@timed('rendering')
+def plot_curvature_fields(sim, path='depression_demo.png'):
+    """Visualize the curvature and torsion fields and return the PNG path"""
+    # Create grid
+    x = np.linspace(-1, 1, 50)
+    y = np.linspace(-1, 1, 50)
+    X, Y = np.meshgrid(x, y)
+
+    # Compute fields
+    fields = sim.evaluate_fields(X, Y)
+    depression_Z = fields['depression']
+    anxiety_Z = fields['anxiety']
+
+    # Create visualization
+    fig = Figure(figsize=(15, 5))
+
+    # Depression curvature
+    ax1 = fig.add_subplot(131)
+    contour1 = ax1.contourf(X, Y, depression_Z, levels=20, cmap='RdYlBu')
+    fig.colorbar(contour1, ax=ax1, label='Curvature')
+    ax1.scatter(*sim.depression_center, color='red', s=100, marker='x', linewidth=2)
+    ax1.set_title('Depression: Negative Curvature Basin')
+    ax1.set_xlabel('Valence')
+    ax1.set_ylabel('Arousal')
+    ax1.grid(True, alpha=0.3)
+
+    # Anxiety torsion  
+    ax2 = fig.add_subplot(132)
+    contour2 = ax2.contourf(X, Y, anxiety_Z, levels=20, cmap='YlOrRd')
+    fig.colorbar(contour2, ax=ax2, label='Torsion Magnitude')
+    ax2.scatter(*sim.anxiety_center, color='orange', s=100, marker='x', linewidth=2)
+    ax2.set_title('Anxiety: High Torsion Region')
+    ax2.set_xlabel('Valence')
+    ax2.set_ylabel('Arousal')
+    ax2.grid(True, alpha=0.3)
+
+    # Therapeutic progress
+    ax3 = fig.add_subplot(133)
+    sessions = np.arange(0, 13)  # 12 weeks of therapy
+    test_point = (-0.6, -0.5)  # Starting in depression
+
+    # One broadcast evaluation covers every session count
+    depression_progress, anxiety_progress = sim.therapeutic_improvement(*test_point, sessions)
+
+    ax3.plot(sessions, depression_progress, 'b-', linewidth=2, label='Depression curvature')
+    ax3.plot(sessions, anxiety_progress, 'r-', linewidth=2, label='Anxiety torsion')
+    ax3.axhline(y=0, color='k', linestyle='--', alpha=0.5, label='Healthy baseline')
+
+    ax3.set_xlabel('Therapy Sessions')
+    ax3.set_ylabel('Pathology Level')
+    ax3.set_title('Therapeutic Progress Over Time')
+    ax3.legend()
+    ax3.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    fig.savefig(path, dpi=150, bbox_inches='tight')
+    return path
+
+
+@timed('rendering')
+def plot_insight_network(sim, path='insight_demo.png'):
+    """Visualize the concept network before and after insight and return the PNG path"""
+    fig = Figure(figsize=(15, 6))
+    ax1, ax2 = fig.subplots(1, 2)
+
+    # Before insight
+    G_before = sim.create_concept_network(insight_occurred=False)
+    pos = nx.spring_layout(G_before, seed=42)
+
+    # Draw network before insight
+    nx.draw_networkx_nodes(G_before, pos, node_color='lightblue', 
+                          node_size=1500, ax=ax1)
+    nx.draw_networkx_labels(G_before, pos, ax=ax1)
+
+    edges_before = G_before.edges(data=True)
+    nx.draw_networkx_edges(G_before, pos, edgelist=edges_before, ax=ax1)
+
+    edge_labels_before = {(u, v): f"{d['weight']:.1f}" for u, v, d in edges_before}
+    nx.draw_networkx_edge_labels(G_before, pos, edge_labels_before, ax=ax1)
+
+    ax1.set_title('Before Insight: Indirect Path\n(High Cognitive Load)', fontsize=12)
+    ax1.axis('off')
+
+    # After insight
+    G_after = sim.create_concept_network(insight_occurred=True)
+
+    # Draw network after insight
+    nx.draw_networkx_nodes(G_after, pos, node_color='lightgreen', 
+                          node_size=1500, ax=ax2)
+    nx.draw_networkx_labels(G_after, pos, ax=ax2)
+
+    edges_after = G_after.edges(data=True)
+    regular_edges = [(u, v) for u, v, d in edges_after if (u, v) != sim.insight_edge]
+    insight_edge = [sim.insight_edge]
+
+    nx.draw_networkx_edges(G_after, pos, edgelist=regular_edges, ax=ax2)
+    nx.draw_networkx_edges(G_after, pos, edgelist=insight_edge, 
+                          edge_color='red', width=3, style='dashed', ax=ax2)
+
+    edge_labels_after = {(u, v): f"{d['weight']:.1f}" for u, v, d in edges_after}
+    nx.draw_networkx_edge_labels(G_after, pos, edge_labels_after, ax=ax2)
+
+    ax2.set_title('After Insight: Direct Geodesic\n("Aha!" Moment)', fontsize=12)
+    ax2.axis('off')
+
+    fig.tight_layout()
+    fig.savefig(path, dpi=150, bbox_inches='tight')
+    return path
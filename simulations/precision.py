@@ -0,0 +1,128 @@
+"""
+PRECISION POLICY
+Float32/float64 modes, seeded random streams and tolerances shared by the simulations
+"""
+
+import zlib
+
+import numpy as np
+
+# Agreement expected between any two runs of the same computation: float64
+# ("reference") leaves room for last-bit libm differences across machines,
+# float32 ("fast") for single-precision rounding through a few
+# exp/sqrt/multiply chains. Checked by test_installation.test_precision_golden.
+TOLERANCES = {
+    'float64': {'rtol': 1e-12, 'atol': 1e-12},
+    'float32': {'rtol': 1e-5, 'atol': 1e-6},
+}
+
+MODES = {'reference': 'float64', 'fast': 'float32'}
+
+
+class PrecisionPolicy:
+    """
+    Floating-point type, random seed and comparison tolerances for a run
+
+    `dtype` is used for coordinate matrices, field grids and cohort
+    arrays, so float32 halves their memory and bandwidth. Random draws
+    always come from `np.random.Generator` streams derived from `seed`
+    (`rng(stream)`, or the module-level `rng`/`seed_sequence` for an
+    explicit seed) and are made in float64 in both modes, so fast and
+    reference runs see identical random outcomes.
+    """
+
+    def __init__(self, dtype=np.float64, seed=0):
+        self.dtype = np.dtype(dtype)
+        if self.dtype.name not in TOLERANCES:
+            raise ValueError(f"Unsupported precision {self.dtype}; use float32 or float64")
+        self.seed = seed
+
+    @property
+    def name(self):
+        return 'fast' if self.dtype == np.float32 else 'reference'
+
+    @property
+    def rtol(self):
+        return TOLERANCES[self.dtype.name]['rtol']
+
+    @property
+    def atol(self):
+        return TOLERANCES[self.dtype.name]['atol']
+
+    def with_seed(self, seed):
+        return PrecisionPolicy(self.dtype, seed)
+
+    def asarray(self, values):
+        return np.asarray(values, dtype=self.dtype)
+
+    def seed_sequence(self, stream=''):
+        """SeedSequence for a named stream; each name gets an independent stream"""
+        return np.random.SeedSequence(self.seed, spawn_key=(zlib.crc32(stream.encode('utf-8')),))
+
+    def rng(self, stream=''):
+        """Fresh Generator for a named stream, identical on every machine"""
+        return np.random.default_rng(self.seed_sequence(stream))
+
+    def allclose(self, actual, expected):
+        """Whether `actual` matches `expected` within this policy's tolerances"""
+        return np.allclose(np.asarray(actual, dtype=np.float64), np.asarray(expected, dtype=np.float64),
+                           rtol=self.rtol, atol=self.atol)
+
+    def __eq__(self, other):
+        return (isinstance(other, PrecisionPolicy) and self.dtype == other.dtype
+                and self.seed == other.seed)
+
+    def __hash__(self):
+        return hash((self.dtype.name, self.seed))
+
+    def __repr__(self):
+        return f"PrecisionPolicy(dtype={self.dtype.name!r}, seed={self.seed!r})"
+
+
+REFERENCE = PrecisionPolicy(np.float64)
+FAST = PrecisionPolicy(np.float32)
+
+_default = REFERENCE
+
+
+def get_default():
+    return _default
+
+
+def set_default(precision):
+    """Policy used by simulations created without an explicit `precision`"""
+    global _default
+    _default = resolve(precision)
+    return _default
+
+
+def seed_sequence(stream, seed=None):
+    """
+    SeedSequence for a named stream of run `seed`
+
+    `seed=None` takes the default policy's seed, so unseeded draws are
+    reproducible too (see PrecisionPolicy.seed_sequence).
+    """
+    policy = _default if seed is None else _default.with_seed(seed)
+    return policy.seed_sequence(stream)
+
+
+def rng(stream, seed=None):
+    """Generator for a named stream of run `seed` (see `seed_sequence`)"""
+    return np.random.default_rng(seed_sequence(stream, seed))
+
+
+def resolve(precision=None):
+    """
+    PrecisionPolicy for `precision`
+
+    Accepts a policy, a mode name ('fast', 'reference'), a dtype
+    (np.float32, 'float64', ...) or None for the current default.
+    """
+    if precision is None:
+        return _default
+    if isinstance(precision, PrecisionPolicy):
+        return precision
+    if isinstance(precision, str) and precision in MODES:
+        return PrecisionPolicy(MODES[precision], _default.seed)
+    return PrecisionPolicy(precision, _default.seed)
@@ -0,0 +1,256 @@
+"""
+RESULT CACHE
+Content-addressed on-disk cache of simulation outputs keyed by parameters and code
+"""
+
+import ast
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+import uuid
+from collections.abc import Mapping
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+RESULT_FILE = 'result.json'
+FILES_DIR = 'files'
+
+
+def canonical(obj, _depth=0):
+    """
+    JSON-serializable, order-independent form of `obj` for hashing
+
+    Handles scalars, strings, mappings, sequences and numpy arrays (by
+    dtype, shape and content hash). Other objects contribute their class
+    name and their attributes, so parameters held in helper objects are
+    covered too; callables contribute only their qualified name.
+    """
+    if obj is None or isinstance(obj, (bool, int, str)):
+        return obj
+    if isinstance(obj, float):
+        return repr(obj)
+    if isinstance(obj, np.generic):
+        return canonical(obj.item(), _depth)
+    if isinstance(obj, np.ndarray):
+        data = np.ascontiguousarray(obj)
+        return {'ndarray': str(data.dtype), 'shape': list(data.shape),
+                'sha256': hashlib.sha256(data.tobytes()).hexdigest()}
+    if isinstance(obj, Mapping):
+        items = [(json.dumps(canonical(k, _depth + 1), sort_keys=True), canonical(v, _depth + 1))
+                 for k, v in obj.items()]
+        return {'mapping': sorted(items)}
+    if isinstance(obj, (list, tuple)):
+        return [canonical(item, _depth + 1) for item in obj]
+    if isinstance(obj, (set, frozenset)):
+        return {'set': sorted(json.dumps(canonical(item, _depth + 1), sort_keys=True)
+                              for item in obj)}
+    if isinstance(obj, type) or inspect.isroutine(obj) or _depth > 8:
+        return {'object': getattr(obj, '__qualname__', type(obj).__qualname__)}
+    state = getattr(obj, '__dict__', None)
+    if state is None and hasattr(type(obj), '__slots__'):
+        state = {name: getattr(obj, name) for name in type(obj).__slots__ if hasattr(obj, name)}
+    return {'object': type(obj).__qualname__, 'state': canonical(state or {}, _depth + 1)}
+
+
+def _local_imports(path, directory):
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split('.')[0])
+    return {name for name in names if os.path.exists(os.path.join(directory, f'{name}.py'))}
+
+
+def source_fingerprint(module_name, directory):
+    """
+    SHA-256 over the source of `module_name` and every local module it imports
+
+    Imports are followed transitively (including imports inside functions)
+    through the modules that live in `directory`, so editing any code a
+    demo can run changes its fingerprint while unrelated edits do not.
+    """
+    seen, pending = set(), [module_name]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        pending.extend(_local_imports(os.path.join(directory, f'{name}.py'), directory) - seen)
+
+    digest = hashlib.sha256()
+    for name in sorted(seen):
+        digest.update(name.encode('utf-8') + b'\0')
+        with open(os.path.join(directory, f'{name}.py'), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def cache_key(*parts):
+    """Hex digest identifying `parts` (anything `canonical` accepts)"""
+    encoded = json.dumps(canonical(parts), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class _DirectoryLock:
+    """Exclusive inter-process lock on a file (flock, or an O_EXCL lock file)"""
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            return self
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL)
+                return self
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Could not lock {self.path}")
+                time.sleep(0.01)
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        else:
+            os.close(self._fd)
+            os.remove(self.path)
+        return False
+
+
+class ResultCache:
+    """
+    Simulation outputs stored under the hash of everything that produced them
+
+    Each entry is a directory holding `result.json` (any JSON-serializable
+    record) and optional output files such as rendered figures. Entries
+    are built in a private temporary directory and published with one
+    atomic rename, so concurrent workers never see a partial entry and
+    racing writers of the same key simply keep the first. Reads refresh
+    the entry's access time; `evict` removes least-recently-used entries
+    under an inter-process lock until the cache fits in `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 2**20):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._entries = os.path.join(self.directory, 'entries')
+        self._tmp = os.path.join(self.directory, 'tmp')
+        os.makedirs(self._entries, exist_ok=True)
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self._entries, key[:2], key)
+
+    def __contains__(self, key):
+        return os.path.exists(os.path.join(self._path(key), RESULT_FILE))
+
+    def get(self, key):
+        """
+        (record, files) for `key`, or None on a miss
+
+        `files` maps each stored file name to its path inside the cache.
+        """
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, RESULT_FILE), encoding='utf-8') as f:
+                record = json.load(f)
+            files_dir = os.path.join(path, FILES_DIR)
+            files = {name: os.path.join(files_dir, name)
+                     for name in sorted(os.listdir(files_dir))} if os.path.isdir(files_dir) else {}
+            os.utime(os.path.join(path, RESULT_FILE))
+        except (OSError, ValueError):
+            # Missing, or evicted by another process while being read
+            return None
+        return record, files
+
+    def put(self, key, record, files=()):
+        """Store `record` and copies of `files` under `key`, then evict if over budget"""
+        staging = os.path.join(self._tmp, uuid.uuid4().hex)
+        os.makedirs(os.path.join(staging, FILES_DIR))
+        try:
+            for source in files:
+                shutil.copy2(source, os.path.join(staging, FILES_DIR, os.path.basename(source)))
+            with open(os.path.join(staging, RESULT_FILE), 'w', encoding='utf-8') as f:
+                json.dump(record, f, indent=2)
+            final = self._path(key)
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            try:
+                os.rename(staging, final)
+            except OSError:
+                # Another process published this key first; its entry is equivalent
+                pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+        return self._path(key)
+
+    def _scan(self):
+        entries = []
+        for shard in os.listdir(self._entries):
+            shard_path = os.path.join(self._entries, shard)
+            for key in os.listdir(shard_path):
+                path = os.path.join(shard_path, key)
+                try:
+                    accessed = os.path.getmtime(os.path.join(path, RESULT_FILE))
+                except OSError:
+                    continue
+                entries.append((accessed, key, path, _tree_size(path)))
+        return entries
+
+    def info(self):
+        entries = self._scan()
+        return {'entries': len(entries), 'bytes': sum(entry[3] for entry in entries),
+                'max_bytes': self.max_bytes, 'directory': self.directory}
+
+    def evict(self, max_bytes=None):
+        """Drop least-recently-used entries until the cache fits; returns evicted keys"""
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        evicted = []
+        with _DirectoryLock(os.path.join(self.directory, '.lock')):
+            entries = sorted(self._scan())
+            total = sum(entry[3] for entry in entries)
+            for _, key, path, size in entries:
+                if total <= budget:
+                    break
+                # Rename first so readers never see a half-deleted entry
+                doomed = os.path.join(self._tmp, f'evict-{uuid.uuid4().hex}')
+                try:
+                    os.rename(path, doomed)
+                except OSError:
+                    continue
+                shutil.rmtree(doomed, ignore_errors=True)
+                total -= size
+                evicted.append(key)
+        return evicted
+
+    def clear(self):
+        return self.evict(max_bytes=0)
@@ -0,0 +1,526 @@
+"""
+SIMULATION RESULTS
+Structured demo results and streaming NPZ/Arrow/Parquet export of bulk outputs
+"""
+
+import json
+import os
+import zipfile
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from instrumentation import count, timed
+from monte_carlo import CHUNK_SIZE, TrialStats, iter_trial_outcomes
+
+# Schema metadata key holding the JSON metadata in Arrow and Parquet files
+ARROW_METADATA_KEY = b'cdg_metadata'
+# NPZ member holding the JSON metadata
+NPZ_METADATA = '_meta'
+
+FORMATS = {'.npz': 'npz', '.arrow': 'arrow', '.feather': 'arrow', '.parquet': 'parquet'}
+
+
+def _plain(value):
+    """JSON-ready copy of numpy scalars and arrays (recursively)"""
+    if isinstance(value, dict):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, TrialStats):
+        return _plain(vars(value))
+    return value
+
+
+class SimulationResult:
+    """
+    Base for the results returned by `run_demo`
+
+    Subclasses list their attributes in `FIELDS` and derived properties in
+    `DERIVED`; `as_dict` gives both as plain JSON-ready values (what
+    run_all records per demo).
+    """
+
+    FIELDS = ()
+    DERIVED = ()
+
+    def as_dict(self):
+        return {name: _plain(getattr(self, name)) for name in self.FIELDS + self.DERIVED}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+
+class EmotionSpaceResult(SimulationResult):
+    """Consciousness assessment and sadness → joy path lengths of MinimalCDG.run_demo"""
+
+    FIELDS = ('curvatures', 'conscious', 'consciousness_threshold', 'path',
+              'straight_length', 'curved_length')
+    DERIVED = ('conscious_count',)
+
+    def __init__(self, curvatures, conscious, consciousness_threshold, path, straight_length,
+                 curved_length):
+        self.curvatures = {name: float(value) for name, value in curvatures.items()}
+        self.conscious = {name: bool(value) for name, value in conscious.items()}
+        self.consciousness_threshold = float(consciousness_threshold)
+        self.path = tuple(path)
+        self.straight_length = float(straight_length)
+        self.curved_length = float(curved_length)
+
+    @property
+    def conscious_count(self):
+        return sum(self.conscious.values())
+
+
+class DepressionResult(SimulationResult):
+    """Fields before and after therapy at the test point of DepressionSimulation.run_demo"""
+
+    FIELDS = ('point', 'sessions', 'initial_depression', 'initial_anxiety',
+              'final_depression', 'final_anxiety')
+    DERIVED = ('depression_improvement', 'anxiety_improvement')
+
+    def __init__(self, point, sessions, initial_depression, initial_anxiety, final_depression,
+                 final_anxiety):
+        self.point = tuple(float(c) for c in point)
+        self.sessions = float(sessions)
+        self.initial_depression = float(initial_depression)
+        self.initial_anxiety = float(initial_anxiety)
+        self.final_depression = float(final_depression)
+        self.final_anxiety = float(final_anxiety)
+
+    @property
+    def depression_improvement(self):
+        return self.final_depression - self.initial_depression
+
+    @property
+    def anxiety_improvement(self):
+        return self.initial_anxiety - self.final_anxiety
+
+
+class InsightResult(SimulationResult):
+    """Merged insight-trial statistics with the distances they were drawn for"""
+
+    FIELDS = ('stats', 'distance_before', 'distance_after', 'seed')
+    DERIVED = ('n_trials', 'insight_count', 'insight_rate', 'mean_before', 'mean_after',
+               'mean_gain')
+
+    def __init__(self, stats, distance_before, distance_after, seed=None):
+        self.stats = stats
+        self.distance_before = float(distance_before)
+        self.distance_after = float(distance_after)
+        self.seed = seed
+
+    @property
+    def n_trials(self):
+        return self.stats.n_trials
+
+    @property
+    def insight_count(self):
+        return self.stats.insight_count
+
+    @property
+    def insight_rate(self):
+        return self.stats.insight_rate
+
+    @property
+    def mean_before(self):
+        return self.stats.mean_before
+
+    @property
+    def mean_after(self):
+        return self.stats.mean_after
+
+    @property
+    def mean_gain(self):
+        return self.stats.mean_gain
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Arrow and Parquet export need pyarrow (pip install pyarrow); "
+                          "NPZ export works without it") from e
+    return pyarrow
+
+
+def _format_of(path, format=None):
+    if format is None:
+        format = FORMATS.get(os.path.splitext(str(path))[1].lower())
+        if format is None:
+            raise ValueError(f"Cannot tell the result format of {path}; "
+                             f"use one of {sorted(FORMATS)} or pass format=")
+    if format not in set(FORMATS.values()):
+        raise ValueError(f"Unknown result format {format!r}; use 'npz', 'arrow' or 'parquet'")
+    return format
+
+
+class ResultWriter(ABC):
+    """
+    Streams batches of columns to a results file
+
+    Each `append` takes a dict of equal-length 1-D or 2-D arrays (one row
+    per entry along the first axis) with the same column names every time
+    and writes them out at once, so a sweep holds one batch in memory
+    however many rows it produces. `metadata` is any JSON-serializable
+    dict stored with the file. Use as a context manager, or call `close`.
+    """
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.columns = None
+        self.rows = 0
+        self.batches = 0
+
+    def append(self, columns):
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError(f"Columns must have equal lengths, got {sorted(lengths)}")
+        if any(values.ndim not in (1, 2) for values in columns.values()):
+            raise ValueError("Result columns must be 1-D or 2-D arrays")
+        if self.columns is None:
+            self.columns = tuple(columns)
+        elif tuple(columns) != self.columns:
+            raise ValueError(f"Expected columns {self.columns}, got {tuple(columns)}")
+        self._write(columns)
+        rows = lengths.pop()
+        self.rows += rows
+        self.batches += 1
+        count('result_rows', rows)
+
+    @abstractmethod
+    def _write(self, columns):
+        """Write one validated batch of columns"""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # Batches written before an error are kept
+        self.close()
+
+
+class NpzResultWriter(ResultWriter):
+    """
+    NPZ results, one `.npy` member per column and batch
+
+    Members are named `<column>/<batch>`, so `np.load` still opens the
+    file and `load_results` concatenates the batches. A new file is built
+    under a temporary name and moved into place on `close`. With `append`,
+    batches are added to an existing file in place (its metadata is kept).
+    """
+
+    def __init__(self, path, metadata=None, append=False, compress=False):
+        super().__init__(path, metadata)
+        compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        if append and os.path.exists(path):
+            self._staging = None
+            self._zip = zipfile.ZipFile(path, 'a', compression=compression, allowZip64=True)
+            existing = [name for name in self._zip.namelist() if '/' in name]
+            self.batches = len({name.rsplit('/', 1)[1] for name in existing})
+            if existing:
+                self.columns = tuple(dict.fromkeys(name.rsplit('/', 1)[0] for name in existing))
+        else:
+            self._staging = f'{path}.tmp'
+            self._zip = zipfile.ZipFile(self._staging, 'w', compression=compression,
+                                        allowZip64=True)
+            self._write_member(NPZ_METADATA, np.array(json.dumps(_plain(self.metadata))))
+
+    def _write_member(self, name, array):
+        with self._zip.open(f'{name}.npy', 'w', force_zip64=True) as f:
+            np.lib.format.write_array(f, array, allow_pickle=False)
+
+    def _write(self, columns):
+        for name, values in columns.items():
+            self._write_member(f'{name}/{self.batches:06d}', values)
+
+    def close(self):
+        if self._zip is None:
+            return
+        self._zip.close()
+        self._zip = None
+        if self._staging is not None:
+            os.replace(self._staging, self.path)
+
+
+def _arrow_batch(pa, columns, schema=None):
+    arrays = []
+    for values in columns.values():
+        if values.ndim == 2:
+            arrays.append(pa.FixedSizeListArray.from_arrays(pa.array(values.reshape(-1)),
+                                                            values.shape[1]))
+        else:
+            arrays.append(pa.array(values))
+    if schema is None:
+        return pa.RecordBatch.from_arrays(arrays, names=list(columns))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _numpy_columns(pa, batch):
+    columns = {}
+    for name, column in zip(batch.schema.names, batch.columns):
+        if pa.types.is_fixed_size_list(column.type):
+            width = column.type.list_size
+            columns[name] = column.flatten().to_numpy(zero_copy_only=False).reshape(-1, width)
+        else:
+            columns[name] = column.to_numpy(zero_copy_only=False)
+    return columns
+
+
+class ArrowResultWriter(ResultWriter):
+    """
+    Arrow IPC file results, one record batch per `append` (needs pyarrow)
+
+    2-D columns become fixed-size lists. The schema, with the metadata, is
+    fixed by the first batch.
+    """
+
+    def __init__(self, path, metadata=None):
+        super().__init__(path, metadata)
+        self._pa = _pyarrow()
+        self._schema = None
+        self._sink = None
+
+    def _open(self, schema):
+        import pyarrow.ipc
+        return pyarrow.ipc.new_file(self.path, schema)
+
+    def _write(self, columns):
+        batch = _arrow_batch(self._pa, columns, self._schema)
+        if self._sink is None:
+            metadata = {ARROW_METADATA_KEY: json.dumps(_plain(self.metadata)).encode('utf-8')}
+            self._schema = batch.schema.with_metadata(metadata)
+            batch = batch.replace_schema_metadata(metadata)
+            self._sink = self._open(self._schema)
+        self._sink.write_batch(batch)
+
+    def close(self):
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+
+class ParquetResultWriter(ArrowResultWriter):
+    """Parquet results, one row group per `append` (needs pyarrow)"""
+
+    def _open(self, schema):
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetWriter(self.path, schema)
+
+
+def open_writer(path, format=None, metadata=None, append=False):
+    """
+    ResultWriter for `path`, by extension (.npz, .arrow/.feather, .parquet)
+
+    NPZ needs nothing beyond numpy and is the only format that can
+    `append` to an existing file; Arrow and Parquet need pyarrow.
+    """
+    format = _format_of(path, format)
+    if format == 'npz':
+        return NpzResultWriter(path, metadata, append=append)
+    if append:
+        raise ValueError(f"Appending to an existing {format} file is not supported; use NPZ")
+    if format == 'arrow':
+        return ArrowResultWriter(path, metadata)
+    return ParquetResultWriter(path, metadata)
+
+
+def _iter_npz(path):
+    with np.load(path, allow_pickle=False) as data:
+        members = [key for key in data.files if '/' in key]
+        names = list(dict.fromkeys(key.rsplit('/', 1)[0] for key in members))
+        batches = sorted({key.rsplit('/', 1)[1] for key in members})
+        for batch in batches:
+            yield {name: data[f'{name}/{batch}'] for name in names}
+
+
+def _iter_arrow(path, format):
+    pa = _pyarrow()
+    if format == 'parquet':
+        import pyarrow.parquet
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches():
+            yield _numpy_columns(pa, batch)
+        return
+    import pyarrow.ipc
+    with pa.memory_map(str(path)) as source:
+        reader = pyarrow.ipc.open_file(source)
+        for k in range(reader.num_record_batches):
+            yield _numpy_columns(pa, reader.get_batch(k))
+
+
+def iter_result_batches(path, format=None):
+    """Yield the stored batches of a results file as dicts of arrays, one at a time"""
+    format = _format_of(path, format)
+    if format == 'npz':
+        yield from _iter_npz(path)
+    else:
+        yield from _iter_arrow(path, format)
+
+
+def read_metadata(path, format=None):
+    """The metadata dict stored with a results file"""
+    format = _format_of(path, format)
+    if format == 'npz':
+        with np.load(path, allow_pickle=False) as data:
+            return json.loads(str(data[NPZ_METADATA]))
+    pa = _pyarrow()
+    if format == 'parquet':
+        import pyarrow.parquet
+        schema = pyarrow.parquet.read_schema(path)
+    else:
+        import pyarrow.ipc
+        with pa.memory_map(str(path)) as source:
+            schema = pyarrow.ipc.open_file(source).schema
+    return json.loads((schema.metadata or {}).get(ARROW_METADATA_KEY, b'{}'))
+
+
+def load_results(path, format=None):
+    """
+    Read a whole results file
+
+    Returns (columns, metadata) with every column's batches concatenated.
+    """
+    format = _format_of(path, format)
+    parts = {}
+    for batch in iter_result_batches(path, format):
+        for name, values in batch.items():
+            parts.setdefault(name, []).append(values)
+    columns = {name: np.concatenate(values) for name, values in parts.items()}
+    return columns, read_metadata(path, format)
+
+
+@timed('result_export')
+def export_trials(simulation, path, n_trials=None, seed=None, chunk_size=CHUNK_SIZE,
+                  format=None):
+    """
+    Write every insight trial of an InsightSimulation, one row per trial
+
+    Columns are 'trial', 'insight' and 'path_length' (the insight-edge
+    distance the trial ended with). Outcomes are the same draws
+    `run_insight_trials` counts for this seed and chunk size, written one
+    chunk at a time. Returns the InsightResult for the exported trials.
+    """
+    n_trials = simulation.n_trials if n_trials is None else n_trials
+    seed = simulation.seed if seed is None else seed
+    distance_before, distance_after = simulation.insight_distances()
+    metadata = {'insight_edge': simulation.insight_edge, 'p_insight': simulation.p_insight,
+                'distance_before': distance_before, 'distance_after': distance_after,
+                'n_trials': n_trials, 'seed': seed, 'chunk_size': chunk_size}
+    stats = TrialStats()
+    with open_writer(path, format, metadata) as writer:
+        for first, insights in iter_trial_outcomes(n_trials, simulation.p_insight, seed,
+                                                   chunk_size):
+            writer.append({'trial': np.arange(first, first + len(insights)),
+                           'insight': insights,
+                           'path_length': np.where(insights, distance_after, distance_before)})
+            hits = int(np.count_nonzero(insights))
+            # Merged chunk by chunk exactly as run_insight_trials does
+            stats = stats.merge(TrialStats(len(insights), hits, hits * distance_before,
+                                           hits * distance_after))
+    return InsightResult(stats, distance_before, distance_after, seed)
+
+
+@timed('result_export')
+def export_paths(space, path, points=50, block_size=4096, format=None):
+    """
+    Write straight and curved path lengths for every ordered concept pair
+
+    Columns are 'source' and 'target' (indexes into the 'concepts' list in
+    the metadata), 'straight_length' and 'curved_length'. Pairs are
+    streamed in blocks of `block_size`. Returns the number of rows.
+    """
+    names = list(space.concepts)
+    index = {name: k for k, name in enumerate(names)}
+    metadata = {'concepts': names, 'points': points, 'dtype': space.dtype.name}
+    with open_writer(path, format, metadata) as writer:
+        for pairs, _, _, straight_len, curved_len in space.iter_all_geodesic_paths(points,
+                                                                                  block_size):
+            rows = np.array([[index[start], index[end]] for start, end in pairs],
+                            dtype=np.int64).reshape(-1, 2)
+            writer.append({'source': rows[:, 0], 'target': rows[:, 1],
+                           'straight_length': straight_len, 'curved_length': curved_len})
+    return writer.rows
+
+
+@timed('result_export')
+def export_fields(engine, path, bounds=None, resolution=256, therapy_sessions=None,
+                  tile_shape=None, format=None):
+    """
+    Write a FieldEngine's field grid tile by tile
+
+    Columns are 'index' (flat C-order grid index), 'coords' (one row of
+    coordinates per grid point) and one column per field; the grid axes
+    and the field-parameter checksum go in the metadata. `load_field_grid`
+    reassembles the grids. Returns the number of rows.
+    """
+    from field_store import parameters_checksum
+
+    ndim = engine.ndim
+    bounds = bounds or [(-1.0, 1.0)] * ndim
+    resolution = np.broadcast_to(resolution, (ndim,))
+    axes = [np.linspace(low, high, int(size)) for (low, high), size in zip(bounds, resolution)]
+    shape = tuple(len(axis) for axis in axes)
+    names = engine.field_names(therapy_sessions)
+    metadata = {'axes': [{'low': float(axis[0]), 'high': float(axis[-1]), 'size': len(axis)}
+                         for axis in axes],
+                'fields': list(names), 'therapy_sessions': therapy_sessions,
+                'checksum': parameters_checksum(engine)}
+    with open_writer(path, format, metadata) as writer:
+        for index, fields in engine.iter_grid_tiles(axes, therapy_sessions, tile_shape):
+            tile = np.meshgrid(*(np.arange(n)[s] for n, s in zip(shape, index)), indexing='ij')
+            flat = np.ravel_multi_index(tile, shape).ravel()
+            coords = np.stack(np.meshgrid(*(axis[s] for axis, s in zip(axes, index)),
+                                          indexing='ij'), axis=-1).reshape(-1, ndim)
+            writer.append({'index': flat, 'coords': coords.astype(engine.dtype),
+                           **{name: fields[name].ravel() for name in names}})
+    return writer.rows
+
+
+def load_field_grid(path, format=None):
+    """
+    Grids written by `export_fields`
+
+    Returns (axes, grids): the 1D coordinate vector of each axis and a
+    dict of field arrays on the 'ij'-indexed grid.
+    """
+    format = _format_of(path, format)
+    metadata = read_metadata(path, format)
+    axes = [np.linspace(axis['low'], axis['high'], axis['size']) for axis in metadata['axes']]
+    shape = tuple(len(axis) for axis in axes)
+    grids = {}
+    for batch in iter_result_batches(path, format):
+        for name in metadata['fields']:
+            if name not in grids:
+                grids[name] = np.empty(shape, dtype=batch[name].dtype)
+            grids[name].reshape(-1)[batch['index']] = batch[name]
+    return axes, grids
+
+
+@timed('result_export')
+def export_cohort(cohort, path, n_steps, format=None):
+    """
+    Write a CohortSimulator's trajectories, one row per patient and step
+
+    Columns are 'step', 'patient', 'sessions', 'depression' and 'anxiety',
+    written block by block from `iter_blocks`, so no trajectory is held
+    in memory. Returns the number of rows.
+    """
+    metadata = {'n_patients': cohort.n_patients, 'n_steps': n_steps,
+                'dim': cohort.start_states.shape[1]}
+    with open_writer(path, format, metadata) as writer:
+        for step, rows, fields in cohort.iter_blocks(n_steps):
+            patients = np.arange(rows.start, rows.stop)
+            writer.append({'step': np.full(len(patients), step), 'patient': patients,
+                           **fields})
+    return writer.rows
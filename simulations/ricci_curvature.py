@@ -0,0 +1,335 @@
+"""
+DISCRETE RICCI CURVATURE
+Forman and Ollivier-Ricci curvature of concept graphs, per edge and per node
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import count, timed
+
+# scipy is imported on first use, like concept_graph
+
+
+@timed('ricci_curvature')
+def triangle_counts(csr, sources, targets, block_size=65536):
+    """
+    Number of triangles through each edge (sources[i], targets[i])
+
+    Computed as (A @ A)[u, v] over row blocks of the 0/1 adjacency matrix
+    A, so only one block of A @ A (restricted to existing edges) is ever
+    held at a time.
+    """
+    adjacency = csr.copy()
+    adjacency.data = np.ones_like(adjacency.data, dtype=np.float64)
+    adjacency.eliminate_zeros()
+    triangles = np.zeros(len(sources), dtype=np.int64)
+    order = np.argsort(sources, kind='stable')
+    sorted_sources = sources[order]
+    n = csr.shape[0]
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        lo, hi = np.searchsorted(sorted_sources, [start, stop])
+        if lo == hi:
+            continue
+        block = adjacency[start:stop]
+        # Paths of length two from the block rows that close an existing edge
+        closing = (block @ adjacency).multiply(block).tocsr()
+        members = order[lo:hi]
+        triangles[members] = np.asarray(
+            closing[sources[members] - start, targets[members]]).ravel().astype(np.int64)
+    return triangles
+
+
+class FormanCurvature:
+    """
+    Forman-Ricci curvature of every edge of a ConceptGraph
+
+    With unit weights (the default) an edge uv has curvature
+    4 - deg(u) - deg(v), plus 3 per triangle through it when `augmented`.
+    With `weighted=True` the graph weights act as edge strengths:
+    F(uv) = 4 - sqrt(w_uv) (S_u + S_v), where S_u sums 1/sqrt(w) over the
+    edges at u. Everything is evaluated as whole-array expressions over
+    the CSR arrays, so graphs with millions of edges take seconds.
+
+    `add_edge` updates the curvature incrementally: only edges touching
+    the two endpoints (and, when augmented, their common neighbours) are
+    recomputed.
+    """
+
+    def __init__(self, graph, weighted=False, augmented=True, block_size=65536):
+        self.graph = graph
+        self.weighted = weighted
+        self.augmented = augmented
+        self.names = list(graph.names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        n = len(self.names)
+
+        sources, targets, weights = graph.edge_arrays()
+        # Edge arrays live in buffers with spare capacity so that `add_edge`
+        # appends in amortized O(1); the public arrays are views of them
+        self._n_edges = len(sources)
+        self._buffers = {'sources': sources.astype(np.int64),
+                         'targets': targets.astype(np.int64),
+                         'weights': (weights.astype(np.float64) if weighted
+                                     else np.ones(len(sources))),
+                         'triangles': np.zeros(len(sources), dtype=np.int64),
+                         'curvature': np.zeros(len(sources))}
+        # Base edges are sorted by (low, high), so ids are found by bisection
+        self._keys = self.sources * n + self.targets
+        self._added = {}
+
+        # Edge id of every CSR entry, for neighbour lookups
+        rows = np.repeat(np.arange(n), np.diff(graph.indptr))
+        cols = graph.indices.astype(np.int64)
+        self._csr_edges = np.searchsorted(self._keys, np.minimum(rows, cols) * n
+                                          + np.maximum(rows, cols))
+        self._extra_neighbors = {}
+
+        inverse_root = 1.0 / np.sqrt(self.weights)
+        self.strength = (np.bincount(self.sources, inverse_root, minlength=n)
+                         + np.bincount(self.targets, inverse_root, minlength=n))
+        if augmented:
+            self.triangles[:] = triangle_counts(graph.to_csr(), self.sources, self.targets,
+                                                block_size)
+        self.edge_curvature[:] = self._formula(np.arange(self._n_edges))
+        self._node_curvature = None
+
+    @classmethod
+    def from_edges(cls, weighted_edges, nodes=(), **options):
+        from concept_graph import ConceptGraph
+        return cls(ConceptGraph.from_edges(weighted_edges, nodes=nodes), **options)
+
+    @property
+    def n_edges(self):
+        return self._n_edges
+
+    @property
+    def sources(self):
+        return self._buffers['sources'][:self._n_edges]
+
+    @property
+    def targets(self):
+        return self._buffers['targets'][:self._n_edges]
+
+    @property
+    def weights(self):
+        return self._buffers['weights'][:self._n_edges]
+
+    @property
+    def triangles(self):
+        """Triangles through each edge (zero unless augmented)"""
+        return self._buffers['triangles'][:self._n_edges]
+
+    @property
+    def edge_curvature(self):
+        return self._buffers['curvature'][:self._n_edges]
+
+    def _append(self, **values):
+        if self._n_edges == len(self._buffers['sources']):
+            capacity = max(16, 2 * self._n_edges)
+            for name, buffer in self._buffers.items():
+                grown = np.zeros(capacity, dtype=buffer.dtype)
+                grown[:self._n_edges] = buffer[:self._n_edges]
+                self._buffers[name] = grown
+        for name, value in values.items():
+            self._buffers[name][self._n_edges] = value
+        self._n_edges += 1
+        return self._n_edges - 1
+
+    def _formula(self, edges):
+        weights = self.weights[edges]
+        curvature = 4.0 - np.sqrt(weights) * (self.strength[self.sources[edges]]
+                                             + self.strength[self.targets[edges]])
+        return curvature + 3.0 * self.triangles[edges]
+
+    def edge_id(self, u, v):
+        """Position of edge {u, v} in the edge arrays, or None if absent"""
+        i, j = sorted((self.index[u], self.index[v]))
+        key = i * len(self.names) + j
+        position = np.searchsorted(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            return int(position)
+        return self._added.get(key)
+
+    def _neighbors(self, i):
+        # (neighbour ids, edge ids) including edges added since construction
+        lo, hi = self.graph.indptr[i], self.graph.indptr[i + 1]
+        neighbors = self.graph.indices[lo:hi].astype(np.int64)
+        edges = self._csr_edges[lo:hi]
+        extra = self._extra_neighbors.get(i)
+        if extra:
+            extra_neighbors, extra_edges = zip(*extra)
+            neighbors = np.concatenate([neighbors, extra_neighbors])
+            edges = np.concatenate([edges, extra_edges])
+        return neighbors, edges
+
+    def curvature(self, u, v):
+        """Curvature of edge {u, v}"""
+        count('curvature_queries')
+        edge = self.edge_id(u, v)
+        if edge is None:
+            raise KeyError(f"No edge between {u!r} and {v!r}")
+        return float(self.edge_curvature[edge])
+
+    def add_edge(self, u, v, weight=1.0):
+        """
+        Add edge {u, v} and update every affected curvature
+
+        Returns the ids of the edges whose curvature changed. Adding an
+        edge that already exists is an error; the graph is only grown.
+        """
+        if self.edge_id(u, v) is not None:
+            raise ValueError(f"Edge between {u!r} and {v!r} already exists")
+        i, j = sorted((self.index[u], self.index[v]))
+        if i == j:
+            raise ValueError("Self-loops carry no curvature")
+        weight = float(weight) if self.weighted else 1.0
+
+        neighbors_i, edges_i = self._neighbors(i)
+        neighbors_j, edges_j = self._neighbors(j)
+        common, at_i, at_j = np.intersect1d(neighbors_i, neighbors_j, return_indices=True)
+
+        edge = self._append(sources=i, targets=j, weights=weight,
+                            triangles=len(common) if self.augmented else 0)
+        self._added[i * len(self.names) + j] = edge
+        self._extra_neighbors.setdefault(i, []).append((j, edge))
+        self._extra_neighbors.setdefault(j, []).append((i, edge))
+        self.strength[[i, j]] += 1.0 / np.sqrt(weight)
+        if self.augmented and len(common):
+            # Each common neighbour c closes a new triangle i-j-c
+            self.triangles[edges_i[at_i]] += 1
+            self.triangles[edges_j[at_j]] += 1
+
+        changed = np.unique(np.concatenate([edges_i, edges_j, [edge]]))
+        self.edge_curvature[changed] = self._formula(changed)
+        self._node_curvature = None
+        return changed
+
+    def node_curvature(self):
+        """Mean curvature of the edges at each node (0 for isolated nodes)"""
+        if self._node_curvature is None:
+            self._node_curvature = node_curvature(len(self.names), self.sources, self.targets,
+                                                  self.edge_curvature)
+        return self._node_curvature
+
+    def conscious_concepts(self, threshold):
+        """Concepts whose node curvature exceeds `threshold`"""
+        curvature = self.node_curvature()
+        return [self.names[i] for i in np.flatnonzero(curvature > threshold)]
+
+    def is_conscious_region(self, concept, threshold):
+        return bool(self.node_curvature()[self.index[concept]] > threshold)
+
+    def edges(self):
+        """(u, v, curvature) for every edge"""
+        names = self.names
+        for i, j, curvature in zip(self.sources.tolist(), self.targets.tolist(),
+                                   self.edge_curvature.tolist()):
+            yield names[i], names[j], curvature
+
+
+def node_curvature(n_nodes, sources, targets, edge_curvature):
+    """Mean of incident edge curvatures per node"""
+    total = (np.bincount(sources, edge_curvature, minlength=n_nodes)
+             + np.bincount(targets, edge_curvature, minlength=n_nodes))
+    degree = np.bincount(sources, minlength=n_nodes) + np.bincount(targets, minlength=n_nodes)
+    return np.divide(total, degree, out=np.zeros(n_nodes), where=degree > 0)
+
+
+def transport_cost(source_mass, target_mass, cost):
+    """Earth mover's distance between two discrete measures (exact, by LP)"""
+    from scipy import sparse
+    from scipy.optimize import linprog
+
+    m, k = cost.shape
+    # Plan entry (a, b) appears in row-sum constraint a and column-sum m + b
+    plan = np.arange(m * k)
+    constraints = sparse.csr_matrix(
+        (np.ones(2 * m * k), (np.concatenate([plan // k, m + plan % k]), np.tile(plan, 2))),
+        shape=(m + k, m * k))
+    result = linprog(cost.ravel(), A_eq=constraints,
+                     b_eq=np.concatenate([source_mass, target_mass]),
+                     bounds=(0, None), method='highs')
+    if not result.success:
+        raise RuntimeError(f"Transport problem failed: {result.message}")
+    return result.fun
+
+
+def _measure(csr, node, alpha):
+    # alpha of the mass stays at the node, the rest spreads evenly over neighbours
+    lo, hi = csr.indptr[node], csr.indptr[node + 1]
+    neighbors = csr.indices[lo:hi].astype(np.int64)
+    if len(neighbors) == 0:
+        return np.array([node]), np.array([1.0])
+    return (np.concatenate([[node], neighbors]),
+            np.concatenate([[alpha], np.full(len(neighbors), (1 - alpha) / len(neighbors))]))
+
+
+def ollivier_edge_curvature(csr, u, v, alpha=0.5):
+    """
+    Ollivier-Ricci curvature 1 - W1(m_u, m_v) / d(u, v) of one edge
+
+    Distances between the two neighbourhoods are found by Dijkstra on the
+    ball of radius max_w(u) + d(u, v) + max_w(v) around u, which contains
+    every shortest path between them, so the result is exact without an
+    all-pairs matrix.
+    """
+    from scipy.sparse.csgraph import dijkstra
+
+    support_u, mass_u = _measure(csr, u, alpha)
+    support_v, mass_v = _measure(csr, v, alpha)
+    reach_u = csr.data[csr.indptr[u]:csr.indptr[u + 1]].max(initial=0.0)
+    reach_v = csr.data[csr.indptr[v]:csr.indptr[v + 1]].max(initial=0.0)
+    # No two support points are further apart than `span`, so no shortest
+    # path between them leaves the ball of radius reach_u + span around u
+    span = reach_u + float(csr[u, v]) + reach_v
+    from_u = dijkstra(csr, directed=False, indices=u, limit=reach_u + span)
+    ball = np.flatnonzero(np.isfinite(from_u))
+    position = np.full(csr.shape[0], -1)
+    position[ball] = np.arange(len(ball))
+    local = csr[ball][:, ball]
+    costs = dijkstra(local, directed=False, indices=position[support_u])[:, position[support_v]]
+    return 1.0 - transport_cost(mass_u, mass_v, costs) / from_u[v]
+
+
+# Graph held by each worker process, set by the pool initializer
+_worker_graph = None
+
+
+def _init_worker(csr, alpha):
+    global _worker_graph
+    _worker_graph = (csr, alpha)
+
+
+def _ollivier_chunk(edges):
+    csr, alpha = _worker_graph
+    return [ollivier_edge_curvature(csr, u, v, alpha) for u, v in edges]
+
+
+@timed('ricci_curvature')
+def ollivier_curvature(graph, alpha=0.5, workers=1, chunk_size=256):
+    """
+    Ollivier-Ricci curvature of every edge as (sources, targets, curvature)
+
+    Each edge needs one small optimal-transport problem, so this is far
+    more expensive than FormanCurvature; edges are split into chunks that
+    run across `workers` processes.
+    """
+    sources, targets, _ = graph.edge_arrays()
+    csr = graph.to_csr().astype(np.float64)
+    edges = list(zip(sources.tolist(), targets.tolist()))
+    chunks = [edges[i:i + chunk_size] for i in range(0, len(edges), chunk_size)]
+    curvature = []
+    if workers <= 1:
+        _init_worker(csr, alpha)
+        for chunk in chunks:
+            curvature.extend(_ollivier_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(csr, alpha)) as pool:
+            for values in pool.map(_ollivier_chunk, chunks):
+                curvature.extend(values)
+    count('curvature_queries', len(edges))
+    return sources, targets, np.asarray(curvature)
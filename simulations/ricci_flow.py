@@ -0,0 +1,310 @@
+"""
+RICCI FLOW THERAPY
+Implicit curvature-smoothing flows on field grids and concept graphs, with checkpoints
+"""
+
+import hashlib
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from instrumentation import count, timed
+from precision import resolve
+
+# scipy is imported on first use, like concept_graph
+
+
+def parameters_checksum(parameters):
+    """SHA-256 of a JSON-serializable parameter dict; checkpoints only load under a matching one"""
+    encoded = json.dumps(parameters, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def array_digest(*arrays):
+    """SHA-256 of the dtypes, shapes and contents of arrays, for use in flow parameters"""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f'{array.dtype.str}{array.shape}'.encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def grid_laplacian(shape, spacing):
+    """
+    Negative Laplacian -Δ on a grid with no-flux (Neumann) boundaries
+
+    Sparse CSR of size prod(shape), for 'ij'-ordered arrays flattened in C
+    order. It is symmetric positive semi-definite and annihilates
+    constants, so flows built on it conserve each field's mean.
+    """
+    from scipy import sparse
+
+    operator = sparse.csr_matrix((int(np.prod(shape)),) * 2)
+    for axis, (n, h) in enumerate(zip(shape, spacing)):
+        second = sparse.diags([-np.ones(n - 1), 2 * np.ones(n), -np.ones(n - 1)], [-1, 0, 1],
+                              format='lil')
+        second[0, 0] = second[n - 1, n - 1] = 1
+        factors = [sparse.identity(m, format='csr') for m in shape]
+        factors[axis] = second.tocsr() / h**2
+        term = factors[0]
+        for factor in factors[1:]:
+            term = sparse.kron(term, factor, format='csr')
+        operator = operator + term
+    return operator.tocsr()
+
+
+def graph_laplacian(graph):
+    """
+    Weighted graph Laplacian D - W of a ConceptGraph
+
+    Edges conduct with weight 1 / length, so concepts that are close in
+    the graph exchange the most.
+    """
+    from scipy import sparse
+
+    conductance = graph.to_csr().astype(np.float64)
+    conductance.data = 1.0 / conductance.data
+    degree = np.asarray(conductance.sum(axis=1)).ravel()
+    return (sparse.diags(degree) - conductance).tocsr()
+
+
+class FlowSolver(ABC):
+    """
+    Time stepping with per-step metrics and resumable checkpoints
+
+    Subclasses hold their state as named arrays and implement `_advance`,
+    which takes one step of size `dt` and returns its metrics. `run`
+    records wall time per step and, with a `checkpoint` path, saves the
+    state every `checkpoint_every` steps (atomically, with a checksum of
+    the parameters) so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, dt):
+        self.dt = float(dt)
+        self.step_count = 0
+        self.time = 0.0
+        self.history = []
+
+    @abstractmethod
+    def state(self):
+        """The named arrays a checkpoint saves"""
+
+    @abstractmethod
+    def set_state(self, state):
+        """Restore the arrays returned by `state`"""
+
+    def parameters(self):
+        """Everything the trajectory depends on (hashed into checkpoints)"""
+        return {'solver': type(self).__name__, 'dt': self.dt}
+
+    @abstractmethod
+    def _advance(self):
+        """Take one step of size `dt` and return its metrics"""
+
+    @timed('ricci_flow')
+    def step(self):
+        """Take one step and return its metrics"""
+        start = time.perf_counter()
+        metrics = self._advance()
+        self.step_count += 1
+        self.time += self.dt
+        metrics = {'step': self.step_count, 'time': self.time,
+                   'seconds': time.perf_counter() - start, **metrics}
+        self.history.append(metrics)
+        count('flow_steps')
+        return metrics
+
+    def save_checkpoint(self, path):
+        meta = {'checksum': parameters_checksum(self.parameters()), 'step': self.step_count,
+                'time': self.time, 'history': self.history}
+        staging = f'{path}.tmp'
+        with open(staging, 'wb') as f:
+            np.savez(f, _meta=np.array(json.dumps(meta)), **self.state())
+        # Replace in one step so a crash never leaves a torn checkpoint
+        os.replace(staging, path)
+
+    def load_checkpoint(self, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['_meta']))
+            if meta['checksum'] != parameters_checksum(self.parameters()):
+                raise ValueError(f"Checkpoint {path} was written with different flow parameters")
+            self.set_state({name: data[name] for name in data.files if name != '_meta'})
+        self.step_count = meta['step']
+        self.time = meta['time']
+        self.history = meta['history']
+
+    def run(self, n_steps, tolerance=None, checkpoint=None, checkpoint_every=10, resume=True,
+            callback=None):
+        """
+        Step until `n_steps` steps have been taken in total
+
+        Stops early once a step's relative `change` drops below
+        `tolerance`. With `resume`, an existing `checkpoint` is loaded
+        first, so calling `run` again continues the same trajectory.
+        Returns the metrics history.
+        """
+        if checkpoint and resume and os.path.exists(checkpoint):
+            self.load_checkpoint(checkpoint)
+        while self.step_count < n_steps:
+            metrics = self.step()
+            if callback is not None:
+                callback(metrics)
+            converged = tolerance is not None and metrics['change'] < tolerance
+            if checkpoint and (converged or self.step_count % checkpoint_every == 0
+                               or self.step_count == n_steps):
+                self.save_checkpoint(checkpoint)
+            if converged:
+                break
+        return self.history
+
+
+class HeatFlow(FlowSolver):
+    """
+    Implicit diffusion u' = -c L u of one or more fields, c = `diffusivity`
+
+    Works for any positive semi-definite operator L: `grid_laplacian` for
+    field grids or `graph_laplacian` for values on concept nodes. Steps
+    use the theta scheme (1 = backward Euler, 0.5 = Crank-Nicolson), so
+    any `dt` is stable. The system matrix is factorized once and every
+    step (for all fields together) is one pair of triangular solves.
+    """
+
+    def __init__(self, operator, fields, dt, diffusivity=1.0, theta=1.0, shape=None):
+        from scipy import sparse
+        from scipy.sparse.linalg import splu
+
+        super().__init__(dt)
+        self.operator = operator.tocsr()
+        self.diffusivity = float(diffusivity)
+        self.theta = float(theta)
+        self.names = list(fields)
+        first = np.asarray(fields[self.names[0]])
+        self.shape = shape or first.shape
+        self.values = np.column_stack([np.asarray(fields[name], dtype=float).ravel()
+                                       for name in self.names])
+        self._initial = array_digest(self.values)
+
+        scaled = self.diffusivity * self.dt * self.operator
+        identity = sparse.identity(self.operator.shape[0], format='csr')
+        self._solver = splu((identity + self.theta * scaled).tocsc())
+        self._explicit = (identity - (1 - self.theta) * scaled).tocsr() if self.theta < 1 else None
+
+    def parameters(self):
+        return {**super().parameters(), 'diffusivity': self.diffusivity, 'theta': self.theta,
+                'operator': array_digest(self.operator.data, self.operator.indices,
+                                         self.operator.indptr),
+                'fields': self.names, 'initial': self._initial}
+
+    def state(self):
+        return {'values': self.values}
+
+    def set_state(self, state):
+        self.values = state['values']
+
+    @property
+    def fields(self):
+        """Current fields by name, in their original shape"""
+        return {name: self.values[:, k].reshape(self.shape) for k, name in enumerate(self.names)}
+
+    def _advance(self):
+        previous = self.values
+        rhs = previous if self._explicit is None else self._explicit @ previous
+        self.values = self._solver.solve(rhs)
+        scale = np.linalg.norm(previous, axis=0)
+        change = np.linalg.norm(self.values - previous, axis=0) / np.where(scale > 0, scale, 1.0)
+        energy = np.einsum('ik,ik->k', self.values, self.operator @ self.values)
+        spread = self.values.max(axis=0) - self.values.min(axis=0)
+        return {'change': float(change.max()),
+                'energy': dict(zip(self.names, energy.tolist())),
+                'spread': dict(zip(self.names, spread.tolist()))}
+
+
+class GraphRicciFlow(FlowSolver):
+    """
+    Normalized discrete Ricci flow of concept-graph edge lengths
+
+    Log-lengths follow dx/dt = -(κ - κ̄), where κ is the Forman curvature
+    of the graph with strengths 1 / length and κ̄ its mean. Edges curved
+    above the mean shrink and those below it stretch, which evens the
+    curvature out; lengths are rescaled to keep their total fixed. Each
+    edge's own contribution to its curvature, a_e = dκ_e/dx_e >= 0, is
+    taken implicitly:
+
+        x <- x - dt (κ - κ̄) / (1 + dt a)
+
+    so a large `dt` approaches the per-edge equilibrium instead of
+    overshooting it, and lengths stay positive.
+
+    Lengths live in the flow's own array in the `precision` policy's
+    dtype, and the curvature is evaluated straight from it (the triangle
+    counts are fixed by the topology and counted once), so steps never
+    round-trip through a float32 ConceptGraph.
+    """
+
+    def __init__(self, graph, dt, augmented=True, precision=None):
+        from ricci_curvature import triangle_counts
+
+        super().__init__(dt)
+        self.graph = graph
+        self.augmented = augmented
+        self.precision = resolve(precision)
+        self.sources, self.targets, lengths = graph.edge_arrays()
+        self.lengths = self.precision.asarray(lengths)
+        self.triangles = np.zeros(len(self.sources), dtype=self.precision.dtype)
+        if augmented:
+            self.triangles[:] = triangle_counts(graph.to_csr(), self.sources, self.targets)
+        self._initial = array_digest(self.sources, self.targets, self.lengths)
+
+    def parameters(self):
+        return {**super().parameters(), 'augmented': self.augmented,
+                'dtype': self.precision.dtype.name, 'initial': self._initial}
+
+    def state(self):
+        return {'lengths': self.lengths}
+
+    def set_state(self, state):
+        self.lengths = self.precision.asarray(state['lengths'])
+
+    def current_graph(self):
+        """ConceptGraph with the current edge lengths"""
+        from concept_graph import ConceptGraph
+        return ConceptGraph.from_id_edges(self.graph.interner, self.sources, self.targets,
+                                          self.lengths, dtype=self.lengths.dtype)
+
+    def edge_curvature(self):
+        """
+        Forman curvature of every edge with strengths 1 / length
+
+        Equal to `forman().edge_curvature`: with w = 1 / l the strength sum
+        S_u = sum 1/sqrt(w) is the sum of sqrt(l) over the edges at u.
+        """
+        root = np.sqrt(self.lengths)
+        n = self.graph.n_nodes
+        strength = (np.bincount(self.sources, root, minlength=n)
+                    + np.bincount(self.targets, root, minlength=n)).astype(root.dtype)
+        return 4.0 - (strength[self.sources] + strength[self.targets]) / root + 3.0 * self.triangles
+
+    def forman(self):
+        """FormanCurvature with edge strengths 1 / length, as conductances in graph_laplacian"""
+        from concept_graph import ConceptGraph
+        from ricci_curvature import FormanCurvature
+        strengths = ConceptGraph.from_id_edges(self.graph.interner, self.sources, self.targets,
+                                               1.0 / self.lengths, dtype=self.lengths.dtype)
+        return FormanCurvature(strengths, weighted=True, augmented=self.augmented)
+
+    def _advance(self):
+        curvature = self.edge_curvature()
+        # κ_e = 2 + 3 t_e - sum over adjacent edges of sqrt(l_f / l_e), whose
+        # derivative in log l_e is half that sum
+        stiffness = 0.5 * (2.0 + 3.0 * self.triangles - curvature)
+        deviation = curvature - curvature.mean()
+        previous = self.lengths
+        lengths = previous * np.exp(-self.dt * deviation / (1.0 + self.dt * stiffness))
+        self.lengths = lengths * (previous.sum() / lengths.sum())
+        return {'change': float(np.linalg.norm(self.lengths - previous) / np.linalg.norm(previous)),
+                'curvature_std': float(curvature.std()),
+                'total_length': float(self.lengths.sum())}
@@ -1,88 +1,322 @@
 """
 RUN ALL CDG DEMOS - VERIFIED WORKING
-Runs all tested CDG demonstrations using your existing file names
+Discovers every demo in this directory and runs them concurrently, headless
 """
 
-import importlib
-import sys
+import argparse
+import ast
+import contextlib
+import io
+import json
+import multiprocessing
 import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from multiprocessing.connection import wait
+
+SIMULATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Scripts in this directory that are tools rather than demos
+NON_DEMO_MODULES = {'run_all', 'test_installation'}
+
+
+def discover_demos(directory=SIMULATIONS_DIR):
+    """
+    Find (module_name, class_name) for every class with a `run_demo` method
 
-def run_demo(module_name, class_name):
-    """Safely run a demo module"""
+    Modules are inspected with `ast` rather than imported, so discovery
+    costs nothing and cannot fail on a broken demo.
+    """
+    demos = []
+    for filename in sorted(os.listdir(directory)):
+        module_name, ext = os.path.splitext(filename)
+        if ext != '.py' or module_name in NON_DEMO_MODULES or module_name.startswith('test_'):
+            continue
+        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=filename)
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef) and any(
+                    isinstance(item, ast.FunctionDef) and item.name == 'run_demo'
+                    for item in node.body):
+                demos.append((module_name, node.name))
+    return demos
+
+
+def _peak_memory_mb():
+    """Peak resident memory of the current process in MiB (None if unknown)"""
     try:
-        print(f"\n{'='*60}")
-        print(f"🚀 Running: {module_name}")
-        print('='*60)
-        
-        # Check if file exists
-        if not os.path.exists(f"{module_name}.py"):
-            print(f"❌ File {module_name}.py not found!")
-            return False
-        
-        # Import module
-        module = importlib.import_module(module_name)
-        
-        # Get class and run demo
-        demo_class = getattr(module, class_name)
-        demo_instance = demo_class()
-        demo_instance.run_demo()
-        
-        return True
-        
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _demo_key(module_name, class_name, demo_instance, render, directory):
+    """Cache key: demo identity, constructed parameters and the code it can run"""
+    from result_cache import cache_key, source_fingerprint
+    return cache_key(module_name, class_name, render, demo_instance,
+                     source_fingerprint(module_name, directory))
+
+
+def _cached_report(cache, key, directory):
+    """The stored report for `key` with its figures restored, or None on a miss"""
+    hit = cache.get(key)
+    if hit is None:
+        return None
+    report, files = hit
+    try:
+        for name, path in files.items():
+            shutil.copy2(path, os.path.join(directory, name))
+    except OSError:
+        return None
+    report['cached'] = True
+    return report
+
+
+def _demo_worker(module_name, class_name, directory, render, conn, profile_dir=None,
+                 cache_dir=None, cache_bytes=None):
+    """Run one demo in a child process and report back over `conn`"""
+    os.environ['MPLBACKEND'] = 'Agg'
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    # Figures are written to a private scratch directory first so that
+    # concurrent demos never mix up each other's outputs
+    scratch = tempfile.mkdtemp(prefix=f'{module_name}_')
+    os.chdir(scratch)
+    cache = key = None
+
+    import instrumentation
+    profiler = contextlib.nullcontext()
+    if profile_dir is not None:
+        instrumentation.enable()
+        profiler = instrumentation.profile(os.path.join(profile_dir, f'{module_name}.prof'))
+
+    output = io.StringIO()
+    report = {'status': 'ok', 'error': None}
+    try:
+        with redirect_stdout(output), redirect_stderr(output), profiler:
+            import warnings
+            import importlib
+            warnings.filterwarnings('ignore', message='.*non-interactive.*')
+
+            with instrumentation.span('import'):
+                module = importlib.import_module(module_name)
+            demo_instance = getattr(module, class_name)()
+            if cache_dir is not None:
+                from result_cache import ResultCache
+                cache = ResultCache(cache_dir, max_bytes=cache_bytes)
+                key = _demo_key(module_name, class_name, demo_instance, render, directory)
+                cached = _cached_report(cache, key, directory)
+                if cached is not None:
+                    shutil.rmtree(scratch, ignore_errors=True)
+                    cached['peak_memory_mb'] = _peak_memory_mb()
+                    conn.send(cached)
+                    conn.close()
+                    return
+            with instrumentation.span('run_demo'):
+                result = demo_instance.run_demo()
+            report['result'] = result.as_dict() if hasattr(result, 'as_dict') else None
+            if render:
+                for name in dir(demo_instance):
+                    if name.startswith('visualize_'):
+                        with instrumentation.span(name):
+                            getattr(demo_instance, name)()
     except Exception as e:
-        print(f"❌ Error running {module_name}: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        report['status'] = 'error'
+        report['error'] = f"{type(e).__name__}: {e}"
+        output.write(traceback.format_exc())
+
+    figures = sorted(os.path.join(scratch, name) for name in os.listdir(scratch))
+
+    if profile_dir is not None:
+        prefix = os.path.join(profile_dir, module_name)
+        report['instrumentation'] = instrumentation.export_json(f'{prefix}.spans.json')
+        instrumentation.export_folded(f'{prefix}.folded')
+    report['output'] = output.getvalue()
+    report['figures'] = [os.path.basename(path) for path in figures]
+    if cache is not None and report['status'] == 'ok':
+        cache.put(key, report, figures)
+    for path in figures:
+        shutil.move(path, os.path.join(directory, os.path.basename(path)))
+    shutil.rmtree(scratch, ignore_errors=True)
+    report['peak_memory_mb'] = _peak_memory_mb()
+    report['cached'] = False
+    conn.send(report)
+    conn.close()
 
-def main():
+
+def run_demos(demos, workers=None, timeout=120.0, render=False, directory=SIMULATIONS_DIR,
+              on_result=None, profile_dir=None, cache_dir=None, cache_bytes=256 * 2**20):
+    """
+    Run demos concurrently, one process each, at most `workers` at a time
+
+    A demo still running after `timeout` seconds is terminated and reported
+    with status 'timeout'. Returns one result dict per demo, in input order;
+    `on_result` is called with each result as soon as it completes.
+
+    With `profile_dir`, instrumentation is switched on in every worker and
+    each demo leaves `<module>.prof` (cProfile), `<module>.spans.json` and
+    `<module>.folded` (flamegraph stacks) there; the span and counter data
+    is also attached to its result under 'instrumentation'.
+
+    With `cache_dir`, successful results (output and figures) are stored in
+    a ResultCache keyed by the demo's parameters and source code; a rerun
+    with nothing changed is served from the cache with 'cached' set.
+    Profiling always runs the demos, bypassing the cache.
+    """
+    if profile_dir is not None:
+        cache_dir = None
+        profile_dir = os.path.abspath(profile_dir)
+        os.makedirs(profile_dir, exist_ok=True)
+    workers = workers or min(len(demos), os.cpu_count() or 1) or 1
+    pending = list(enumerate(demos))
+    running = {}
+    results = [None] * len(demos)
+
+    def finish(index, record):
+        results[index] = record
+        if on_result is not None:
+            on_result(record)
+
+    while pending or running:
+        while pending and len(running) < workers:
+            index, (module_name, class_name) = pending.pop(0)
+            parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=_demo_worker,
+                args=(module_name, class_name, directory, render, child_conn, profile_dir,
+                      cache_dir, cache_bytes),
+                daemon=True)
+            process.start()
+            child_conn.close()
+            running[process.sentinel] = (index, module_name, class_name, process,
+                                         parent_conn, time.perf_counter())
+
+        now = time.perf_counter()
+        next_deadline = min(entry[5] + timeout for entry in running.values())
+        # Wait on the report pipes too: a report larger than the pipe buffer
+        # only lets its worker exit once the parent starts reading it
+        connections = [entry[4] for entry in running.values()]
+        ready = wait(list(running) + connections, timeout=max(0.0, next_deadline - now))
+
+        now = time.perf_counter()
+        for sentinel in list(running):
+            index, module_name, class_name, process, conn, started = running[sentinel]
+            record = {'module': module_name, 'class': class_name}
+            if sentinel in ready or conn in ready:
+                try:
+                    report = conn.recv()
+                except EOFError:
+                    report = {'status': 'crashed', 'error': 'Worker exited without a report',
+                              'output': '', 'peak_memory_mb': None}
+                process.join()
+                record.update(report)
+                record['exit_code'] = process.exitcode
+            elif now - started >= timeout:
+                process.terminate()
+                process.join()
+                record.update({'status': 'timeout', 'output': '', 'peak_memory_mb': None,
+                               'error': f"Timed out after {timeout:.0f}s",
+                               'exit_code': process.exitcode})
+            else:
+                continue
+            record['wall_time_s'] = now - started
+            conn.close()
+            del running[sentinel]
+            finish(index, record)
+
+    return results
+
+
+def write_summary(results, path):
+    """Write the machine-readable run summary (without captured output)"""
+    summary = {
+        'total': len(results),
+        'succeeded': sum(1 for r in results if r['status'] == 'ok'),
+        'demos': [{key: value for key, value in r.items() if key != 'output'}
+                  for r in results],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
     """Run all verified demos"""
+    parser = argparse.ArgumentParser(description="Run every CDG demo concurrently and headless")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="maximum concurrent demos (default: one per CPU)")
+    parser.add_argument('--timeout', type=float, default=120.0,
+                        help="per-demo timeout in seconds")
+    parser.add_argument('--render', action='store_true',
+                        help="also run each demo's visualize_* methods (Agg backend)")
+    parser.add_argument('--summary', default='run_all_summary.json',
+                        help="path of the JSON summary file")
+    parser.add_argument('--profile', metavar='DIR', default=None,
+                        help="record spans, counters and cProfile dumps per demo into DIR")
+    parser.add_argument('--cache-dir', default=os.path.join(SIMULATIONS_DIR, '.result_cache'),
+                        help="result cache location")
+    parser.add_argument('--cache-size', type=float, default=256,
+                        help="result cache size limit in MiB")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="always rerun every demo")
+    args = parser.parse_args(argv)
+
     print("🧠 CDG Framework - All Demos")
     print("Running all TESTED and WORKING simulations...")
-    
-    # List of verified working demos (using ACTUAL file names from your code)
-    demos = [
-        ('minimal_cdg_demo', 'MinimalCDG'),           # From minimal CDG demo
-        ('depression_basin_demo', 'DepressionSimulation'), # From depression demo  
-        ('insight_simulation_demo', 'InsightSimulation')   # From insight demo
-    ]
-    
-    # Alternative: If you saved files with different names, use these:
-    # demos = [
-    #     ('minimal_cdg', 'MinimalCDG'),
-    #     ('depression_basin', 'DepressionSimulation'),
-    #     ('insight_simulation', 'InsightSimulation')
-    # ]
-    
-    success_count = 0
-    total_demos = len(demos)
-    
-    for module_name, class_name in demos:
-        if run_demo(module_name, class_name):
-            success_count += 1
-    
+
+    demos = discover_demos()
+
+    def report(record):
+        print(f"\n{'='*60}")
+        cached = ', cached' if record.get('cached') else ''
+        print(f"🚀 {record['module']}.{record['class']} "
+              f"[{record['status']}{cached}, {record['wall_time_s']:.2f}s]")
+        print('='*60)
+        print(record['output'], end='')
+        if record['status'] != 'ok':
+            print(f"❌ Error running {record['module']}: {record['error']}")
+
+    results = run_demos(demos, workers=args.workers, timeout=args.timeout,
+                        render=args.render, on_result=report, profile_dir=args.profile,
+                        cache_dir=None if args.no_cache else args.cache_dir,
+                        cache_bytes=int(args.cache_size * 2**20))
+    summary = write_summary(results, args.summary)
+
     # Summary
     print(f"\n{'='*60}")
     print("📊 EXECUTION SUMMARY")
     print('='*60)
-    print(f"Successful demos: {success_count}/{total_demos}")
-    
-    if success_count == total_demos:
+    print(f"Successful demos: {summary['succeeded']}/{summary['total']}")
+    for record in results:
+        memory = record['peak_memory_mb']
+        memory = f"{memory:.1f} MiB" if memory is not None else "n/a"
+        print(f"  {record['module']:20} {record['status']:8} "
+              f"{record['wall_time_s']:6.2f}s  peak {memory}")
+    print(f"📁 Summary written to {args.summary}")
+    if args.profile:
+        print(f"🔍 Profiles written to {args.profile}")
+
+    if summary['succeeded'] == summary['total']:
         print("🎉 ALL DEMOS COMPLETED SUCCESSFULLY!")
         print("\n✅ CDG Framework is working correctly")
-        print("📁 Generated files:")
-        print("   - emotion_space_demo.png")
-        print("   - depression_demo.png") 
-        print("   - insight_demo.png")
+        if args.render:
+            print("📁 Figures were written to the simulations directory")
         print("\n🚀 Next: Explore the code and extend the framework!")
     else:
         print("⚠️  Some demos failed. Check errors above.")
         print("\n🔧 Troubleshooting:")
-        print("   1. Ensure these files exist in current directory:")
-        for module_name, _ in demos:
-            print(f"      - {module_name}.py")
-        print("   2. Run: pip install -r requirements.txt")
-        print("   3. Check Python version: python --version")
+        print("   1. Run: pip install -r requirements.txt")
+        print("   2. Check Python version: python --version")
+        print("   3. Raise --timeout if a demo was cut off")
+    return 0 if summary['succeeded'] == summary['total'] else 1
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,448 @@
+"""
+SIMULATION SERVICE
+Asyncio JSON-lines server that keeps simulations warm and batches concurrent queries
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import count, span
+from precision import seed_sequence
+
+DEFAULT_PORT = 8765
+
+# Operations answered by SimulationModels.run, each batched separately
+BATCHED_OPS = ('curvature', 'fields', 'geodesic', 'distance')
+
+
+def _finite_or_none(values):
+    # JSON has no infinity; disconnected distances are reported as null
+    return [value if np.isfinite(value) else None for value in np.asarray(values, dtype=float).tolist()]
+
+
+class SimulationModels:
+    """
+    The warm simulation objects behind the service
+
+    Built once per process (the server, or each pool worker) and reused
+    for every batch. `run(op, payloads)` answers a whole batch of requests
+    for one operation with a single vectorized evaluation and returns one
+    JSON-serializable result per payload, in order.
+    """
+
+    def __init__(self):
+        from depression_basin import DepressionSimulation
+        from insight_simulation import InsightSimulation
+        from minimal_cdg import MinimalCDG
+
+        self.emotion_space = MinimalCDG()
+        self.depression = DepressionSimulation()
+        self.path_engine = InsightSimulation().create_path_engine()
+
+    def run(self, op, payloads):
+        handler = getattr(self, f'_{op}', None)
+        if op not in BATCHED_OPS or handler is None:
+            raise ValueError(f"Unknown operation {op!r}")
+        return handler(payloads)
+
+    @staticmethod
+    def _stack_points(payloads, dim):
+        blocks = [np.asarray(payload['points'], dtype=float).reshape(-1, dim) for payload in payloads]
+        offsets = np.cumsum([0] + [len(block) for block in blocks])
+        return np.concatenate(blocks), offsets
+
+    def _curvature(self, payloads):
+        points, offsets = self._stack_points(payloads, self.emotion_space.dim)
+        curvature = self.emotion_space.curvature(points).tolist()
+        return [{'curvature': curvature[start:stop]}
+                for start, stop in zip(offsets[:-1], offsets[1:])]
+
+    def _fields(self, payloads):
+        points, offsets = self._stack_points(payloads, 2)
+        # One therapy value per point, so requests with different session
+        # counts still share a single evaluation
+        sessions = np.concatenate([np.full(stop - start, float(payload.get('therapy_sessions') or 0))
+                                   for payload, start, stop in zip(payloads, offsets[:-1], offsets[1:])])
+        fields = {name: values.tolist() for name, values
+                  in self.depression.evaluate_points(points, therapy_sessions=sessions).items()}
+        results = []
+        for payload, start, stop in zip(payloads, offsets[:-1], offsets[1:]):
+            names = ('depression', 'anxiety')
+            if payload.get('therapy_sessions') is not None:
+                names += ('therapy_depression', 'therapy_anxiety')
+            results.append({name: fields[name][start:stop] for name in names})
+        return results
+
+    def _geodesic(self, payloads):
+        # Pairs are solved together per resolution
+        results = [None] * len(payloads)
+        groups = {}
+        for i, payload in enumerate(payloads):
+            groups.setdefault(int(payload.get('points', 50)), []).append(i)
+        for points, members in groups.items():
+            pairs = [(payloads[i]['start'], payloads[i]['end']) for i in members]
+            _, curved, straight_lengths, curved_lengths = \
+                self.emotion_space.compute_geodesic_paths(pairs, points=points)
+            for k, i in enumerate(members):
+                results[i] = {'straight_length': float(straight_lengths[k]),
+                              'curved_length': float(curved_lengths[k]),
+                              'path': curved[k].tolist() if payloads[i].get('include_path') else None}
+        return results
+
+    def _distance(self, payloads):
+        index = self.path_engine.index
+        sources = [index[payload['source']] for payload in payloads]
+        targets = [index[payload['target']] for payload in payloads]
+        count('path_queries', len(payloads))
+        return [{'distance': distance}
+                for distance in _finite_or_none(self.path_engine.distances[sources, targets])]
+
+
+# Models held by each worker process, set by the pool initializer
+_worker_models = None
+
+
+def _init_worker():
+    global _worker_models
+    _worker_models = SimulationModels()
+
+
+def _run_batch(op, payloads):
+    return _worker_models.run(op, payloads)
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else None
+
+
+class ServiceStats:
+    """Recent per-operation latencies (ms) and batch sizes, bounded in memory"""
+
+    def __init__(self, window=10_000):
+        self.window = window
+        self.latencies = {}
+        self.batch_sizes = {}
+        self.requests = {}
+        self.batches = {}
+        self.offloaded = {}
+        self.errors = 0
+
+    def record_request(self, op, latency_s):
+        self.requests[op] = self.requests.get(op, 0) + 1
+        self.latencies.setdefault(op, deque(maxlen=self.window)).append(latency_s * 1e3)
+
+    def record_batch(self, op, size, offloaded):
+        self.batches[op] = self.batches.get(op, 0) + 1
+        self.offloaded[op] = self.offloaded.get(op, 0) + int(offloaded)
+        self.batch_sizes.setdefault(op, deque(maxlen=self.window)).append(size)
+
+    def report(self):
+        """{op: {requests, batches, offloaded, p50/p95/p99 latency, mean/max batch}}"""
+        report = {}
+        for op in sorted(self.requests.keys() | self.batches.keys()):
+            latencies = list(self.latencies.get(op, ()))
+            sizes = list(self.batch_sizes.get(op, ()))
+            report[op] = {'requests': self.requests.get(op, 0),
+                          'batches': self.batches.get(op, 0),
+                          'offloaded_batches': self.offloaded.get(op, 0),
+                          'p50_ms': _percentile(latencies, 50),
+                          'p95_ms': _percentile(latencies, 95),
+                          'p99_ms': _percentile(latencies, 99),
+                          'mean_batch': float(np.mean(sizes)) if sizes else None,
+                          'max_batch': max(sizes) if sizes else None}
+        return {'operations': report, 'errors': self.errors}
+
+
+class SimulationService:
+    """
+    Coalesces concurrent queries into vectorized batches
+
+    The first query for an operation opens a batch that is flushed after
+    `window` seconds, or as soon as it holds `max_batch` queries. Batches
+    covering at least `offload_threshold` points (or pairs) run in a pool
+    of `workers` processes with their own warm models, so heavy work never
+    blocks the event loop; smaller batches are answered inline.
+    """
+
+    def __init__(self, window=0.002, max_batch=256, workers=0, offload_threshold=20_000):
+        self.window = window
+        self.max_batch = max_batch
+        self.workers = workers
+        self.offload_threshold = offload_threshold
+        self.models = SimulationModels()
+        self.stats = ServiceStats()
+        self._pool = None
+        self._pending = {}
+        self._timers = {}
+
+    async def start(self):
+        if self.workers > 0 and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    async def close(self):
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def query(self, op, payload):
+        """Answer one query, sharing its evaluation with concurrent queries for `op`"""
+        if op not in BATCHED_OPS:
+            raise ValueError(f"Unknown operation {op!r}")
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        future = loop.create_future()
+        batch = self._pending.setdefault(op, [])
+        batch.append((payload, future))
+        if len(batch) >= self.max_batch:
+            self._flush(op)
+        elif op not in self._timers:
+            self._timers[op] = loop.call_later(self.window, self._flush, op)
+        try:
+            return await future
+        finally:
+            self.stats.record_request(op, time.perf_counter() - start)
+
+    def _flush(self, op):
+        timer = self._timers.pop(op, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(op, [])
+        if batch:
+            asyncio.get_running_loop().create_task(self._evaluate(op, batch))
+
+    @staticmethod
+    def _work(payloads):
+        return sum(len(payload.get('points', ())) if isinstance(payload.get('points'), list) else 1
+                   for payload in payloads)
+
+    async def _evaluate(self, op, batch):
+        payloads = [payload for payload, _ in batch]
+        offload = self._pool is not None and self._work(payloads) >= self.offload_threshold
+        self.stats.record_batch(op, len(batch), offload)
+        try:
+            if offload:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self._pool, _run_batch, op, payloads)
+            else:
+                with span('service_batch'):
+                    results = self.models.run(op, payloads)
+        except Exception:
+            # One bad query must not fail its neighbours: retry them one by one
+            results = []
+            for payload in payloads:
+                try:
+                    results.append(self.models.run(op, [payload])[0])
+                except Exception as error:
+                    results.append(error)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def handle(self, message):
+        """Response dict for one decoded request message"""
+        request_id = message.get('id')
+        op = message.get('op')
+        try:
+            if op == 'ping':
+                result = 'pong'
+            elif op == 'stats':
+                result = self.stats.report()
+            else:
+                result = await self.query(op, message)
+        except Exception as error:
+            self.stats.errors += 1
+            return {'id': request_id, 'error': f'{type(error).__name__}: {error}'}
+        return {'id': request_id, 'result': result}
+
+    async def _serve_connection(self, reader, writer):
+        # Requests on one connection are answered concurrently, possibly out
+        # of order; clients match responses by id
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line):
+            try:
+                message = json.loads(line)
+            except ValueError as error:
+                response = {'id': None, 'error': f'Invalid JSON: {error}'}
+            else:
+                response = await self.handle(message)
+            async with lock:
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (asyncio.CancelledError, ConnectionError):
+            # Server shutting down or client gone; nothing left to answer
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """Start listening; returns the asyncio Server (port 0 picks a free port)"""
+        await self.start()
+        return await asyncio.start_server(self._serve_connection, host, port, limit=2**24)
+
+
+class ServiceClient:
+    """
+    Async client for SimulationService
+
+    Requests are pipelined over one connection: `request` can be awaited
+    from many tasks at once and each response is routed back by its id.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._waiting = {}
+        self._listener = asyncio.create_task(self._listen())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=DEFAULT_PORT):
+        reader, writer = await asyncio.open_connection(host, port, limit=2**24)
+        return cls(reader, writer)
+
+    async def _listen(self):
+        try:
+            while line := await self._reader.readline():
+                response = json.loads(line)
+                future = self._waiting.pop(response.get('id'), None)
+                if future is None or future.done():
+                    continue
+                if 'error' in response:
+                    future.set_exception(RuntimeError(response['error']))
+                else:
+                    future.set_result(response['result'])
+        finally:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Service connection closed"))
+            self._waiting.clear()
+
+    async def request(self, op, **params):
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        self._writer.write(json.dumps({'id': request_id, 'op': op, **params}).encode('utf-8') + b'\n')
+        await self._writer.drain()
+        return await future
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        await self._listener
+
+
+async def load_test(host, port, clients=8, requests=200, points=4, seed=0):
+    """
+    Fire `requests` mixed queries from each of `clients` concurrent clients
+
+    Returns (requests_per_second, server_stats).
+    """
+    rng = np.random.default_rng(seed_sequence('load_test', seed))
+    concepts = ['joy', 'sadness', 'anger', 'fear', 'calm']
+    nodes = ['Problem', 'Frustration', 'Distraction', 'Hint', 'Incubation', 'Solution']
+
+    def make_query(i):
+        kind = BATCHED_OPS[i % len(BATCHED_OPS)]
+        if kind in ('curvature', 'fields'):
+            return kind, {'points': rng.uniform(-1, 1, (points, 2)).tolist()}
+        if kind == 'geodesic':
+            start, end = rng.choice(concepts, 2, replace=False).tolist()
+            return kind, {'start': start, 'end': end}
+        source, target = rng.choice(nodes, 2, replace=False).tolist()
+        return kind, {'source': source, 'target': target}
+
+    connections = [await ServiceClient.connect(host, port) for _ in range(clients)]
+
+    async def drive(client):
+        for i in range(requests):
+            op, params = make_query(i)
+            await client.request(op, **params)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(drive(client) for client in connections))
+    elapsed = time.perf_counter() - start
+    stats = await connections[0].request('stats')
+    for client in connections:
+        await client.close()
+    return clients * requests / elapsed, stats
+
+
+def format_stats(stats):
+    lines = [f"{'operation':<12}{'requests':>10}{'batches':>9}{'mean batch':>12}"
+             f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"]
+    for op, record in stats['operations'].items():
+        lines.append(f"{op:<12}{record['requests']:>10}{record['batches']:>9}"
+                     f"{record['mean_batch'] or 0:>12.1f}{record['p50_ms'] or 0:>9.2f}"
+                     f"{record['p95_ms'] or 0:>9.2f}{record['p99_ms'] or 0:>9.2f}")
+    return '\n'.join(lines)
+
+
+async def _serve_forever(args):
+    service = SimulationService(window=args.window_ms / 1e3, max_batch=args.max_batch,
+                                workers=args.workers)
+    server = await service.serve(args.host, args.port)
+    print(f"🛰️  Simulation service listening on {args.host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+async def _benchmark(args):
+    service = SimulationService(window=args.window_ms / 1e3, max_batch=args.max_batch,
+                                workers=args.workers)
+    server = await service.serve(args.host, 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        throughput, stats = await load_test(args.host, port, args.clients, args.requests)
+    finally:
+        server.close()
+        await server.wait_closed()
+        await service.close()
+    print(f"⚡ {args.clients} clients x {args.requests} requests: {throughput:.0f} requests/s")
+    print(format_stats(stats))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve batched CDG simulation queries over TCP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=0,
+                        help="processes for heavy batches (0 = answer everything inline)")
+    parser.add_argument('--window-ms', type=float, default=2.0, help="batching window")
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--bench', action='store_true',
+                        help="start a local server, drive it with concurrent clients and report")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200, help="requests per client")
+    args = parser.parse_args(argv)
+    asyncio.run(_benchmark(args) if args.bench else _serve_forever(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+SPATIAL INDEX
+Grid-bucket index for nearest-concept, radius and curvature-threshold queries
+"""
+
+import bisect
+import itertools
+import math
+
+import numpy as np
+
+
+class GridIndex:
+    """
+    Uniform grid of buckets over concept coordinates
+
+    Insertions and removals are O(1). Radius queries visit only the cells
+    overlapping the query ball and k-nearest queries search rings of cells
+    outward from the query point, clamped to the occupied cells' bounding
+    box, so both cost roughly the number of nearby concepts rather than the
+    total. Once a ring would visit more cells than there are concepts (a
+    query far from the data), the search finishes with a linear scan. The
+    grid halves its cell size whenever the average bucket grows beyond
+    `max_per_cell`.
+    """
+
+    def __init__(self, cell_size=0.25, max_per_cell=16, min_cell_size=1e-6):
+        self.cell_size = cell_size
+        self.max_per_cell = max_per_cell
+        self.min_cell_size = min_cell_size
+        self._cells = {}
+        self._where = {}
+        self._low = None
+        self._high = None
+        self._bounds_stale = False
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, name):
+        return name in self._where
+
+    def _cell(self, coords):
+        return tuple(math.floor(c / self.cell_size) for c in coords)
+
+    def _grow_bounds(self, cell):
+        if self._low is None:
+            self._low, self._high = list(cell), list(cell)
+            return
+        for axis, index in enumerate(cell):
+            self._low[axis] = min(self._low[axis], index)
+            self._high[axis] = max(self._high[axis], index)
+
+    def insert(self, name, coords):
+        """Add a concept, or move it if it is already indexed"""
+        if name in self._where:
+            self.remove(name)
+        coords = tuple(coords)
+        cell = self._cell(coords)
+        self._cells.setdefault(cell, {})[name] = coords
+        self._where[name] = cell
+        self._grow_bounds(cell)
+        if (len(self._where) > self.max_per_cell * len(self._cells)
+                and self.cell_size / 2 >= self.min_cell_size):
+            self._rebuild(self.cell_size / 2)
+
+    def remove(self, name):
+        cell = self._where.pop(name)
+        bucket = self._cells[cell]
+        del bucket[name]
+        if not bucket:
+            del self._cells[cell]
+            # Bounds are recomputed on the next nearest() if this cell was on them
+            if any(index in (lo, hi) for index, lo, hi in zip(cell, self._low, self._high)):
+                self._bounds_stale = True
+
+    def _refresh_bounds(self):
+        self._low = self._high = None
+        for cell in self._cells:
+            self._grow_bounds(cell)
+        self._bounds_stale = False
+
+    def bulk_load(self, names, coords):
+        """
+        Replace the contents with `names` at `coords` (shape (n, dim))
+
+        The cell size is chosen up front from the bounding box so that
+        buckets hold about a quarter of `max_per_cell` on average.
+        """
+        if len(names):
+            coords = np.asarray(coords, dtype=float)
+            extent = np.maximum(coords.max(axis=0) - coords.min(axis=0), self.min_cell_size)
+            target_cells = max(1.0, 4 * len(names) / self.max_per_cell)
+            cell_size = float(np.prod(extent) / target_cells) ** (1 / coords.shape[1])
+            self.cell_size = min(self.cell_size, max(cell_size, self.min_cell_size))
+            entries = zip(names, map(tuple, coords.tolist()))
+        else:
+            entries = []
+        self._rebuild(self.cell_size, entries)
+
+    def _rebuild(self, cell_size, entries=None):
+        if entries is None:
+            entries = [(name, coords) for bucket in self._cells.values()
+                       for name, coords in bucket.items()]
+        self.cell_size = cell_size
+        self._cells, self._where = {}, {}
+        self._low = self._high = None
+        self._bounds_stale = False
+        for name, coords in entries:
+            cell = self._cell(coords)
+            self._cells.setdefault(cell, {})[name] = coords
+            self._where[name] = cell
+            self._grow_bounds(cell)
+
+    def _gather(self, cells):
+        names, coords = [], []
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if bucket:
+                names.extend(bucket)
+                coords.extend(bucket.values())
+        return names, coords
+
+    @staticmethod
+    def _ranked(point, names, coords):
+        if not names:
+            return [], np.empty(0)
+        distances = np.sqrt(np.sum((np.asarray(coords) - point)**2, axis=1))
+        order = np.argsort(distances, kind='stable')
+        return [names[i] for i in order], distances[order]
+
+    def within(self, point, radius):
+        """(name, distance) pairs for all concepts within `radius`, nearest first"""
+        point = np.asarray(point, dtype=float)
+        low = self._cell(point - radius)
+        high = self._cell(point + radius)
+        cells = itertools.product(*(range(lo, hi + 1) for lo, hi in zip(low, high)))
+        names, distances = self._ranked(point, *self._gather(cells))
+        keep = np.searchsorted(distances, radius, side='right')
+        return list(zip(names[:keep], distances[:keep].tolist()))
+
+    def _ring_ranges(self, center, r):
+        """Per-axis (outer, inner) index ranges of ring `r`, clamped to the occupied bounds"""
+        outer, inner = [], []
+        for c, lo, hi in zip(center, self._low, self._high):
+            outer.append(range(max(c - r, lo), min(c + r, hi) + 1))
+            inner.append(range(max(c - r + 1, lo), min(c + r - 1, hi) + 1))
+        return outer, inner
+
+    def _ring_size(self, center, r):
+        outer, inner = self._ring_ranges(center, r)
+        size = math.prod(len(axis) for axis in outer)
+        return size - math.prod(len(axis) for axis in inner) if r else size
+
+    def _ring(self, center, r):
+        """Occupied-bounds cells at Chebyshev distance exactly `r` from `center`"""
+        if r == 0:
+            return [tuple(center)]
+        outer, inner = self._ring_ranges(center, r)
+        cells = []
+        # Shell faces: axis `a` sits on the ring, earlier axes strictly inside
+        # it (so no cell is listed twice) and later axes anywhere on the ring
+        for a, c in enumerate(center):
+            faces = [index for index in (c - r, c + r) if index in outer[a]]
+            if not faces:
+                continue
+            axes = inner[:a] + [faces] + outer[a + 1:]
+            cells.extend(itertools.product(*axes))
+        return cells
+
+    def _unvisited_distance(self, point, center, r):
+        """Lower bound on the distance from `point` to any cell outside ring `r`"""
+        low = np.array(self._low, dtype=float) * self.cell_size
+        high = (np.array(self._high, dtype=float) + 1) * self.cell_size
+        bound = np.inf
+        # The unvisited cells lie in the slabs of the bounding box beyond the
+        # ring on either side of each axis
+        for axis, c in enumerate(center):
+            for side in (-1, 1):
+                box_low, box_high = low.copy(), high.copy()
+                if side < 0:
+                    box_high[axis] = min(box_high[axis], (c - r) * self.cell_size)
+                else:
+                    box_low[axis] = max(box_low[axis], (c + r + 1) * self.cell_size)
+                if box_low[axis] < box_high[axis]:
+                    gap = np.maximum(box_low - point, 0) + np.maximum(point - box_high, 0)
+                    bound = min(bound, float(np.sqrt(gap @ gap)))
+        return bound
+
+    def _scan(self, point, k):
+        names, coords = self._gather(self._cells)
+        ranked_names, distances = self._ranked(point, names, coords)
+        return list(zip(ranked_names[:k], distances[:k].tolist()))
+
+    def nearest(self, point, k=1, scan=None):
+        """
+        (name, distance) pairs for the `k` nearest concepts, nearest first
+
+        `scan(point, k)` answers the query when rings get too large; the
+        default gathers every bucket, but an owner holding the coordinates
+        as a matrix can pass a vectorized scan.
+        """
+        if not self._where or k <= 0:
+            return []
+        if self._bounds_stale:
+            self._refresh_bounds()
+        point = np.asarray(point, dtype=float)
+        center = self._cell(point)
+        # Rings closer than the bounding box are empty and no occupied cell
+        # lies further out than max_ring
+        first_ring = max(max(lo - c, c - hi, 0)
+                         for c, lo, hi in zip(center, self._low, self._high))
+        max_ring = max(max(abs(c - lo), abs(c - hi))
+                       for c, lo, hi in zip(center, self._low, self._high))
+
+        # Keep only the k best candidates between rings
+        names, coords, distances = [], [], np.empty(0)
+        visited = 0
+        for r in range(first_ring, max_ring + 1):
+            visited += self._ring_size(center, r)
+            if visited > len(self._where):
+                return (scan or self._scan)(point, k)
+            ring_names, ring_coords = self._gather(self._ring(center, r))
+            if ring_names:
+                names, distances = self._ranked(point, names + ring_names, coords + ring_coords)
+                names, distances = names[:k], distances[:k]
+                coords = [self._cells[self._where[name]][name] for name in names]
+            if len(names) >= k and distances[k - 1] <= self._unvisited_distance(point, center, r):
+                break
+        return list(zip(names, distances.tolist()))
+
+
+class ScoreIndex:
+    """Concepts kept sorted by a scalar score for O(log n) threshold queries"""
+
+    def __init__(self, names=(), scores=()):
+        order = np.argsort(np.asarray(scores, dtype=float), kind='stable')
+        names = list(names)
+        scores = list(scores)
+        self._scores = [scores[i] for i in order]
+        self._names = [names[i] for i in order]
+        self._score_of = dict(zip(names, scores))
+
+    def __len__(self):
+        return len(self._names)
+
+    def insert(self, name, score):
+        if name in self._score_of:
+            self.remove(name)
+        position = bisect.bisect_right(self._scores, score)
+        self._scores.insert(position, score)
+        self._names.insert(position, name)
+        self._score_of[name] = score
+
+    def remove(self, name):
+        score = self._score_of.pop(name)
+        position = bisect.bisect_left(self._scores, score)
+        while self._names[position] != name:
+            position += 1
+        del self._scores[position]
+        del self._names[position]
+
+    def above(self, threshold):
+        """Names whose score is strictly greater than `threshold`, lowest first"""
+        return self._names[bisect.bisect_right(self._scores, threshold):]
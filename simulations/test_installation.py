@@ -35,6 +35,436 @@ def test_basic_functionality():
         print(f"❌ CDG module import failed: {e}")
         return False
 
+def test_precision_golden():
+    """Check reference and fast (float32) modes against golden reference outputs"""
+    import contextlib
+    import io
+    import numpy as np
+    from precision import resolve
+    from minimal_cdg import MinimalCDG
+    from depression_basin import DepressionSimulation
+    from insight_simulation import InsightSimulation
+    
+    # Computed in reference mode; both modes must reproduce them within
+    # their own tolerances (precision.TOLERANCES)
+    golden = {
+        'curvature': [1.61, 1.58, 1.57, 1.59, 1.45],
+        'path_length': 2.4623040824754585,
+        'depression': [-0.5484055880252943, 0.13210617682398607, 0.15294682268605608,
+                       0.17502325827101528, 0.19999042616675516],
+        'therapy_anxiety': [0.0035035700911186297, 0.08595143905805701, 0.048365293238933,
+                            0.0033326989614726917, 0.022282073464300164],
+        'insights': 314,
+        'gain': 4.0,
+    }
+    x = np.array([-0.6, -0.2, 0.0, 0.3, 0.7])
+    y = np.array([-0.5, 0.1, 0.0, -0.4, 0.6])
+    
+    print("🎯 Testing reference and fast precision against golden outputs...")
+    for mode in ('reference', 'fast'):
+        policy = resolve(mode)
+        cdg = MinimalCDG(precision=policy)
+        curvature = [cdg.concept_curvature(c)[0] for c in cdg.concepts]
+        _, _, path_x, path_y = cdg.compute_geodesic_path('sadness', 'joy')
+        path_length = np.sum(np.hypot(np.diff(path_x), np.diff(path_y)))
+        fields = DepressionSimulation(precision=policy).evaluate_fields(x, y, therapy_sessions=5)
+        with contextlib.redirect_stdout(io.StringIO()):
+            insights, gain = InsightSimulation(precision=policy).simulate_insight_process(1000)
+        
+        checks = {
+            'curvature': policy.allclose(curvature, golden['curvature']),
+            'path_length': policy.allclose(path_length, golden['path_length']),
+            'depression': policy.allclose(fields['depression'], golden['depression']),
+            'therapy_anxiety': policy.allclose(fields['therapy_anxiety'],
+                                               golden['therapy_anxiety']),
+            'insights': insights == golden['insights'] and gain == golden['gain'],
+            'dtype': fields['depression'].dtype == policy.dtype and path_x.dtype == policy.dtype,
+        }
+        failed = [name for name, ok in checks.items() if not ok]
+        assert not failed, f"{mode} mode differs from golden outputs: {', '.join(failed)}"
+        print(f"✅ {mode} mode ({policy.dtype.name}) matches golden outputs "
+              f"(rtol={policy.rtol:g}, atol={policy.atol:g})")
+
+def test_geodesic_convergence_flags():
+    """Check that geodesics cut off by the iteration budget are not reported as converged"""
+    import numpy as np
+    from geodesic_solver import ConformalMetric, GeodesicSolver
+    from minimal_cdg import MinimalCDG
+    
+    print("📐 Testing geodesic convergence reporting...")
+    metric = ConformalMetric(MinimalCDG().compute_simple_curvature)
+    rng = np.random.default_rng(0)
+    starts, ends = rng.uniform(-1, 1, (200, 2)), rng.uniform(-1, 1, (200, 2))
+    
+    cut_off = GeodesicSolver(metric, max_iter=1).solve(starts, ends)
+    assert not cut_off.converged.any(), "paths after one iteration reported as converged"
+    assert not cut_off.stalled.any(), "paths after one iteration reported as stalled"
+    
+    # A step-size floor this high makes the first rejected step collapse
+    collapsed = GeodesicSolver(metric, min_step=0.6).solve(starts, ends)
+    assert collapsed.stalled.any(), "collapsed step sizes not reported as stalled"
+    assert not (collapsed.converged & collapsed.stalled).any(), \
+        "stalled paths reported as converged"
+    
+    try:
+        GeodesicSolver(metric, points=2)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a two-point solver with no interior nodes was accepted")
+    
+    solved = GeodesicSolver(metric).solve(starts, ends)
+    assert not (solved.converged & solved.stalled).any(), "paths both converged and stalled"
+    assert solved.converged.mean() > 0.8, f"only {solved.converged.mean():.0%} converged"
+    print(f"✅ {int(solved.converged.sum())} converged, {int(solved.stalled.sum())} stalled, "
+          f"none after a single iteration")
+
+def test_run_all_large_output():
+    """Check that a demo printing more than a pipe buffer's worth is not reported as a timeout"""
+    import os
+    import tempfile
+    from run_all import run_demos
+    
+    print("📜 Testing run_all with a large-output demo...")
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'chatty_demo.py'), 'w', encoding='utf-8') as f:
+            f.write("class ChattyDemo:\n"
+                    "    def run_demo(self):\n"
+                    "        for _ in range(1000):\n"
+                    "            print('x' * 199)\n")
+        result, = run_demos([('chatty_demo', 'ChattyDemo')], directory=directory, timeout=10)
+    assert result['status'] == 'ok', \
+        f"large-output demo ended with {result['status']}: {result['error']}"
+    assert len(result['output']) == 200_000, f"got {len(result['output'])} bytes of output"
+    print(f"✅ 200KB of demo output received in {result['wall_time_s']:.2f}s")
+
+def test_spatial_index_far_query():
+    """Check that grid nearest-neighbor queries far outside the data stay exact and fast"""
+    import time
+    import numpy as np
+    from spatial_index import GridIndex
+    
+    print("🗺️  Testing grid index queries far from the data...")
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-1, 1, (100_000, 2))
+    names = [f"c{i}" for i in range(len(points))]
+    index = GridIndex()
+    index.bulk_load(names, points)
+    
+    def check(query, keep):
+        expected = np.sort(np.linalg.norm(points[keep] - query, axis=1))[:3]
+        start = time.perf_counter()
+        found = index.nearest(query, k=3)
+        elapsed = time.perf_counter() - start
+        assert np.allclose([d for _, d in found], expected), f"wrong neighbors for {query}"
+        assert elapsed < 1.0, f"query at {query} took {elapsed:.2f}s"
+        return elapsed
+    
+    elapsed = check(np.array([6.0, 6.0]), np.ones(len(points), dtype=bool))
+    # Emptying half the box must shrink the bounds the search starts from
+    for i in np.flatnonzero(points[:, 0] > 0):
+        index.remove(names[i])
+    check(np.array([6.0, 6.0]), points[:, 0] <= 0)
+    print(f"✅ far query over 100k points answered in {elapsed * 1e3:.1f}ms")
+
+def test_field_store_rebuilds_stale_grid():
+    """Check that a field store built for another grid or dtype is rebuilt, not reused"""
+    import os
+    import tempfile
+    from depression_basin import DepressionSimulation
+    
+    print("🗄️  Testing field store staleness checks...")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'fields')
+        store = DepressionSimulation().field_store(path, resolution=16)
+        assert DepressionSimulation().field_store(path, resolution=16).manifest == store.manifest
+        
+        store = DepressionSimulation().field_store(path, resolution=24)
+        assert store.shape == (24, 24), f"resolution change reused a {store.shape} grid"
+        store = DepressionSimulation().field_store(path, resolution=24, bounds=[(-2, 2), (-2, 2)])
+        assert list(store.low) == [-2, -2], f"bounds change reused a grid from {store.low}"
+        DepressionSimulation().field_store(path, resolution=24, therapy_sessions=(5,))
+        store = DepressionSimulation().field_store(path, resolution=24, therapy_sessions=(12,))
+        assert store.therapy_sessions == (5.0, 12.0), \
+            f"new session count dropped stored grids: {store.therapy_sessions}"
+        store = DepressionSimulation(precision='fast').field_store(
+            path, resolution=24, bounds=[(-2, 2), (-2, 2)])
+        assert store.arrays['depression'].dtype.name == 'float32', "dtype change reused the grid"
+        # Builds are staged next to the store and leave nothing behind
+        assert os.listdir(directory) == ['fields'], f"leftovers: {os.listdir(directory)}"
+    print("✅ field store rebuilt on resolution, bounds and dtype changes")
+
+def test_knn_keeps_negative_similarity_edges():
+    """Check that one-sided k-NN edges with similarity <= 0 survive symmetrization"""
+    import numpy as np
+    from scipy import sparse
+    from manifold_construction import knn_sparsify
+    
+    print("🕸️  Testing k-NN symmetrization with non-positive similarities...")
+    # With k=1, 0 and 1 choose each other and 2 chooses 1 (or 0) one-sidedly
+    cases = [
+        (np.array([[1.0, -0.1, -0.5],
+                   [-0.1, 1.0, -0.3],
+                   [-0.5, -0.3, 1.0]]), {(0, 1): -0.1, (1, 2): -0.3}),
+        (np.array([[1.0, 0.5, 0.0],
+                   [0.5, 1.0, -0.2],
+                   [0.0, -0.2, 1.0]]), {(0, 1): 0.5, (0, 2): 0.0}),
+    ]
+    for similarity, expected in cases:
+        expected = {**expected, **{(j, i): v for (i, j), v in expected.items()}}
+        for matrix in (similarity, sparse.csr_matrix(similarity)):
+            if sparse.issparse(matrix) and 0.0 in expected.values():
+                continue  # a sparse input cannot hold an explicit 0 similarity
+            affinity = knn_sparsify(matrix, k=1).tocoo()
+            edges = {(int(i), int(j)): float(v)
+                     for i, j, v in zip(affinity.row, affinity.col, affinity.data)}
+            assert edges.keys() == expected.keys(), f"got edges {sorted(edges)}"
+            assert all(np.isclose(edges[e], v) for e, v in expected.items()), \
+                f"got similarities {edges}"
+    for n, k in ((0, 3), (1, 3), (4, 0)):
+        affinity = knn_sparsify(np.eye(n), k=k)
+        assert affinity.shape == (n, n) and affinity.nnz == 0, f"{n} concepts, k={k}: {affinity}"
+    print("✅ one-sided edges kept with their stored similarities")
+
+def test_graph_ricci_flow_precision():
+    """Check that graph Ricci flow keeps edge lengths in the policy dtype between steps"""
+    import numpy as np
+    from concept_graph import ConceptGraph, ConceptInterner
+    from ricci_curvature import FormanCurvature
+    from ricci_flow import GraphRicciFlow
+    
+    print("🌀 Testing graph Ricci flow precision...")
+    rng = np.random.default_rng(0)
+    sources, targets = np.triu_indices(12, 1)
+    keep = rng.random(len(sources)) < 0.4
+    lengths = rng.uniform(0.5, 2.0, keep.sum())
+    graph = ConceptGraph.from_id_edges(ConceptInterner([f'c{i}' for i in range(12)]),
+                                       sources[keep], targets[keep], lengths, dtype=np.float64)
+    
+    flow = GraphRicciFlow(graph, dt=0.1)
+    flow.run(5)
+    assert flow.lengths.dtype == np.float64, f"lengths stored as {flow.lengths.dtype}"
+    assert not np.array_equal(flow.lengths, flow.lengths.astype(np.float32)), \
+        "lengths were rounded to float32"
+    strengths = ConceptGraph.from_id_edges(graph.interner, flow.sources, flow.targets,
+                                           1.0 / flow.lengths, dtype=np.float64)
+    exact = FormanCurvature(strengths, weighted=True).edge_curvature
+    assert np.allclose(flow.edge_curvature(), exact, rtol=1e-12, atol=1e-12), \
+        "curvature differs from float64 Forman curvature"
+    
+    fast = GraphRicciFlow(graph, dt=0.1, precision='fast')
+    fast.run(5)
+    assert fast.lengths.dtype == np.float32, f"fast lengths stored as {fast.lengths.dtype}"
+    assert np.allclose(fast.lengths, flow.lengths, rtol=1e-5), "fast flow diverged from reference"
+    print("✅ reference flow stays float64 and fast flow float32")
+
+def test_randomized_embedding_matches_lanczos():
+    """Check the randomized spectral embedding against Lanczos on a k-NN graph"""
+    import warnings
+    import numpy as np
+    from manifold_construction import construct_manifold_from_similarity, randomized_eigsh
+    
+    print("🧭 Testing randomized eigensolver against Lanczos...")
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(1500, 16))
+    vectors /= np.linalg.norm(vectors, axis=1)[:, None]
+    similarity = vectors @ vectors.T
+    
+    lanczos = construct_manifold_from_similarity(similarity, k=10)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        randomized = construct_manifold_from_similarity(similarity, k=10, method='randomized')
+    assert np.allclose(randomized.eigenvalues, lanczos.eigenvalues, atol=1e-5), \
+        f"eigenvalues {randomized.eigenvalues} vs Lanczos {lanczos.eigenvalues}"
+    assert np.allclose(randomized.coordinates, lanczos.coordinates, atol=1e-3), \
+        f"coordinates differ by {np.abs(randomized.coordinates - lanczos.coordinates).max():.3g}"
+    
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        randomized_eigsh(randomized.affinity, 3, power_iterations=2)
+    assert any(issubclass(w.category, RuntimeWarning) for w in caught), \
+        "an unconverged solve raised no warning"
+    print(f"✅ randomized eigenvalues {np.round(randomized.eigenvalues, 4)} match Lanczos")
+
+def _random_concept_graph(n_nodes, p_edge, seed):
+    """Random ConceptGraph with float64 weights in [0.5, 2] for the incremental checks"""
+    import numpy as np
+    from concept_graph import ConceptGraph, ConceptInterner
+    
+    rng = np.random.default_rng(seed)
+    sources, targets = np.triu_indices(n_nodes, 1)
+    keep = rng.random(len(sources)) < p_edge
+    return ConceptGraph.from_id_edges(ConceptInterner([f'c{i}' for i in range(n_nodes)]),
+                                      sources[keep], targets[keep],
+                                      rng.uniform(0.5, 2.0, keep.sum()), dtype=np.float64)
+
+def test_ricci_curvature_incremental_and_parallel():
+    """Check incremental Forman updates and parallel Ollivier curvature against references"""
+    import numpy as np
+    from scipy.sparse.csgraph import shortest_path
+    from ricci_curvature import FormanCurvature, ollivier_curvature, transport_cost
+    
+    print("🔺 Testing incremental Forman and parallel Ollivier curvature...")
+    graph = _random_concept_graph(30, 0.15, seed=1)
+    rng = np.random.default_rng(2)
+    for weighted in (False, True):
+        forman = FormanCurvature(graph, weighted=weighted)
+        added = []
+        while len(added) < 15:
+            u, v = (f'c{i}' for i in rng.choice(30, 2, replace=False))
+            if forman.edge_id(u, v) is None:
+                added.append((u, v, float(rng.uniform(0.5, 2.0))))
+                forman.add_edge(*added[-1])
+        rebuilt = FormanCurvature(graph.with_edges(added), weighted=weighted)
+        incremental = {frozenset((u, v)): c for u, v, c in forman.edges()}
+        expected = {frozenset((u, v)): c for u, v, c in rebuilt.edges()}
+        assert incremental.keys() == expected.keys(), "incremental edge set differs"
+        assert all(np.isclose(incremental[e], c) for e, c in expected.items()), \
+            f"incremental Forman curvature differs from a rebuild (weighted={weighted})"
+    
+    # Ollivier: 1 - W1(m_u, m_v) / d(u, v) with all-pairs distances
+    alpha = 0.5
+    csr = graph.to_csr()
+    distances = shortest_path(csr, directed=False)
+    
+    def measure(node):
+        neighbors = csr.indices[csr.indptr[node]:csr.indptr[node + 1]]
+        return (np.r_[node, neighbors],
+                np.r_[alpha, np.full(len(neighbors), (1 - alpha) / len(neighbors))])
+    
+    sources, targets, serial = ollivier_curvature(graph, alpha=alpha)
+    reference = []
+    for u, v in zip(sources, targets):
+        (support_u, mass_u), (support_v, mass_v) = measure(u), measure(v)
+        cost = distances[np.ix_(support_u, support_v)]
+        reference.append(1.0 - transport_cost(mass_u, mass_v, cost) / distances[u, v])
+    assert np.allclose(serial, reference), "Ollivier curvature differs from all-pairs reference"
+    _, _, parallel = ollivier_curvature(graph, alpha=alpha, workers=2, chunk_size=8)
+    assert np.array_equal(parallel, serial), "workers=2 differs from workers=1"
+    print(f"✅ {len(added)} incremental edges match a rebuild; "
+          f"{len(serial)} Ollivier curvatures match serially and in parallel")
+
+def test_path_engine_incremental_updates():
+    """Check incremental shortest-path updates against a full Dijkstra recompute"""
+    import numpy as np
+    from scipy.sparse.csgraph import shortest_path
+    from concept_graph import ConceptGraph
+    from path_engine import ShortestPathEngine
+    
+    print("🛤️  Testing incremental shortest-path updates...")
+    graph = _random_concept_graph(40, 0.08, seed=3)
+    engine = ShortestPathEngine.from_graph(graph)
+    edges = {(u, v): w for u, v, w in graph.iter_edges()}
+    rng = np.random.default_rng(4)
+    edits = {'add': 0, 'decrease': 0, 'increase': 0, 'remove': 0}
+    for step in range(80):
+        kind = list(edits)[step % 4]
+        if kind == 'add':
+            u, v = (f'c{i}' for i in rng.choice(40, 2, replace=False))
+            if (u, v) in edges or (v, u) in edges:
+                continue
+            edges[u, v] = rng.uniform(0.1, 1.0)
+            engine.add_edge(u, v, edges[u, v])
+        else:
+            keys = list(edges)
+            u, v = keys[rng.integers(len(keys))]
+            if kind == 'remove':
+                del edges[u, v]
+                engine.remove_edge(u, v)
+            else:
+                edges[u, v] *= 0.5 if kind == 'decrease' else 3.0
+                engine.add_edge(u, v, edges[u, v])
+        edits[kind] += 1
+        rebuilt = ConceptGraph.from_edges([(u, v, w) for (u, v), w in edges.items()],
+                                          nodes=engine.nodes, dtype=np.float64)
+        expected = shortest_path(rebuilt.to_csr(), directed=False)
+        assert np.allclose(engine.distances, expected), \
+            f"distances differ from a full recompute after {edits}"
+    print(f"✅ distances match a full recompute after {sum(edits.values())} edits {edits}")
+
+def test_edge_sweep_matches_recompute():
+    """Check swept edge gains against all-pairs recomputes of the graph with each edge added"""
+    import numpy as np
+    from scipy.sparse.csgraph import shortest_path
+    from edge_sweep import EdgeSweep
+    
+    print("🔀 Testing edge sweep gains against full recomputes...")
+    # Sparse enough to leave several components, so some edges connect pairs
+    graph = _random_concept_graph(24, 0.07, seed=5)
+    before = shortest_path(graph.to_csr(), directed=False)
+    upper = np.triu(np.ones_like(before, dtype=bool), 1)
+    weight = 0.3  # below every existing weight, so re-weighting only shortens
+    
+    expected = {}
+    for i, j in zip(*np.nonzero(upper)):
+        u, v = graph.names[i], graph.names[j]
+        after = shortest_path(graph.with_edges([(u, v, weight)]).to_csr(), directed=False)
+        connected = int(np.count_nonzero(np.isinf(before) & np.isfinite(after) & upper))
+        stays = np.isfinite(before) & upper
+        gain = float(np.sum(before[stays] - after[stays]))
+        if gain > 1e-9 or connected:
+            expected[u, v] = (gain, connected)
+    assert any(connected for _, connected in expected.values()), "no connecting edge in fixture"
+    
+    sweep = EdgeSweep.from_graph(graph)
+    for workers in (1, 2):
+        found = {(u, v): (gain, connected)
+                 for u, v, gain, connected in sweep.sweep(weight=weight, top=None, workers=workers,
+                                                          chunk_size=37)}
+        assert found.keys() == expected.keys(), f"workers={workers}: candidate sets differ"
+        assert all(np.isclose(found[e][0], g) and found[e][1] == c
+                   for e, (g, c) in expected.items()), f"workers={workers}: gains differ"
+    # Ties may be broken either way, so compare the ranking keys
+    best = [(connected, gain) for _, _, gain, connected in sweep.sweep(weight=weight, top=5)]
+    ranked = sorted(((c, g) for g, c in expected.values()), reverse=True)[:5]
+    assert np.allclose(best, ranked), "top edges are not ranked by newly connected pairs, then gain"
+    print(f"✅ {len(expected)} improving edges match recomputed gains with 1 and 2 workers")
+
+def test_service_round_trip_batching():
+    """Check concurrent ServiceClient requests are batched and answered like direct calls"""
+    import asyncio
+    import numpy as np
+    from service import ServiceClient, SimulationService
+    
+    print("📡 Testing service round trip with batching...")
+    points = [[[x, -x]] for x in np.linspace(-0.9, 0.9, 32).tolist()]
+    
+    async def round_trip():
+        service = SimulationService(window=0.05)
+        server = await service.serve('127.0.0.1', 0)
+        client = await ServiceClient.connect('127.0.0.1', server.sockets[0].getsockname()[1])
+        try:
+            curvature = asyncio.gather(*(client.request('curvature', points=p) for p in points))
+            distance = client.request('distance', source='Problem', target='Solution')
+            bad = client.request('distance', source='Problem', target='Nowhere')
+            results = await asyncio.gather(curvature, distance, bad, return_exceptions=True)
+            stats = await client.request('stats')
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+            await service.close()
+        return service, results, stats
+    
+    service, (curvature, distance, bad), stats = asyncio.run(round_trip())
+    expected = service.models.emotion_space.curvature(np.concatenate(points))
+    assert np.allclose([r['curvature'][0] for r in curvature], expected), "curvature differs"
+    assert np.isclose(distance['distance'], service.models.path_engine.distance('Problem', 'Solution'))
+    assert isinstance(bad, RuntimeError), f"unknown concept answered with {bad!r}"
+    report = stats['operations']['curvature']
+    assert report['requests'] == len(points), f"{report['requests']} curvature requests recorded"
+    assert report['batches'] < len(points), f"{len(points)} requests ran in {report['batches']} batches"
+    print(f"✅ {len(points)} concurrent requests answered in {report['batches']} batch(es)")
+
+def run_check(test):
+    """Script-style result of an assert-based test: True if it passes"""
+    try:
+        test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__} failed: {e}")
+        return False
+    return True
+
 def test_python_version():
     """Check Python version compatibility"""
     version = sys.version_info
@@ -54,7 +484,19 @@ if __name__ == "__main__":
     tests = [
         test_python_version(),
         test_imports(), 
-        test_basic_functionality()
+        test_basic_functionality(),
+        run_check(test_precision_golden),
+        run_check(test_geodesic_convergence_flags),
+        run_check(test_run_all_large_output),
+        run_check(test_spatial_index_far_query),
+        run_check(test_field_store_rebuilds_stale_grid),
+        run_check(test_knn_keeps_negative_similarity_edges),
+        run_check(test_graph_ricci_flow_precision),
+        run_check(test_randomized_embedding_matches_lanczos),
+        run_check(test_ricci_curvature_incremental_and_parallel),
+        run_check(test_path_engine_incremental_updates),
+        run_check(test_edge_sweep_matches_recompute),
+        run_check(test_service_round_trip_batching)
     ]
     
     print("\n" + "=" * 50)